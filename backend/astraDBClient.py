@@ -1,55 +1,311 @@
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
+import os
 import sys
 import json
+import argparse
+import connection_pool
+from query_cache import invalidate_documents
 
 ASTRA_DB_SECURE_CONNECT_BUNDLE = "path_to_your_secure_connect_bundle.json"
 ASTRA_KEYSPACE = "default_keyspace"
 
+# Vector search expects `embedding` to be a vector column with an ANN (SAI) index:
+#   CREATE TABLE uploads (document_id text PRIMARY KEY, text text, embedding vector<float, 384>);
+#   CREATE CUSTOM INDEX uploads_embedding ON uploads (embedding) USING 'StorageAttachedIndex'
+#       WITH OPTIONS = {'similarity_function': 'cosine'};
+#
+# Tables created before vector search store `embedding` as JSON text. store keeps writing JSON
+# to such a table and `query` (substring mode, the default) works as before; --mode vector
+# reports that the table needs migrating. A column's type cannot be changed in place, so the
+# migration is: create a table with the schema above (and its index), store the uploads into
+# it again, then swap it in for the old one.
+
+DEFAULT_TOP_K = 5
+# Inserts in flight at once for store-batch
+DEFAULT_WRITE_CONCURRENCY = 32
+
+# When set, uploads are stored in and queried from a local vector index instead of AstraDB
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH")
+# Optional quantized first pass for local search ("int8" or "binary") and its oversample factor
+LOCAL_VECTOR_QUANTIZATION = os.getenv("LOCAL_VECTOR_QUANTIZATION") or None
+LOCAL_VECTOR_OVERSAMPLE = int(os.getenv("LOCAL_VECTOR_OVERSAMPLE", 4))
+# Share of BM25 in hybrid ranking, 0 (vector only) to 1 (keywords only)
+LOCAL_LEXICAL_WEIGHT = float(os.getenv("LOCAL_LEXICAL_WEIGHT", 0.3))
+# When set, question embeddings and query results are cached in this file (see query_cache.py)
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")
+
+_query_model = None
+_embedding_is_vector = None
+
 def connect_to_astra():
-    cloud_config = {'secure_connect_bundle': ASTRA_DB_SECURE_CONNECT_BUNDLE}
-    cluster = Cluster(cloud=cloud_config)
-    session = cluster.connect()
-    session.set_keyspace(ASTRA_KEYSPACE)
-    return session
+    """Return the process-wide session, connecting on first use"""
+    return connection_pool.get_session(ASTRA_DB_SECURE_CONNECT_BUNDLE, keyspace=ASTRA_KEYSPACE)
+
+def local_store():
+    """Return the local vector store when running without AstraDB, else None"""
+    if not LOCAL_VECTOR_STORE_PATH:
+        return None
+    return connection_pool.local_store(LOCAL_VECTOR_STORE_PATH)
+
+def prepared(query):
+    """Prepare a statement once per process"""
+    return connection_pool.prepare(connect_to_astra(), query)
+
+def embed_query(text):
+    """Embed a question with the same model that embedded the uploads"""
+    global _query_model
+    if _query_model is None:
+        from embedding_generator import MODEL_NAME, load_model
+        _query_model = load_model(MODEL_NAME, os.getenv("EMBEDDING_WARM_CACHE"))
+    return [float(x) for x in _query_model.encode(text)]
+
+def cached_query(parameters, query, search, needs_vector=True):
+    """
+    search(query_vector) through the query cache when one is configured: a repeated question
+    skips the search, and the embedding unless the cache missed. parameters names the search
+    (mode and options) and is combined with the storage it runs against
+    """
+    if not QUERY_CACHE_PATH:
+        return search(embed_query(query) if needs_vector else None)
+    from embedding_generator import MODEL_NAME
+    cache = connection_pool.query_cache(QUERY_CACHE_PATH)
+    embed = (lambda question: cache.embedding(MODEL_NAME, question, embed_query)) if needs_vector else None
+    storage = f"local:{os.path.abspath(LOCAL_VECTOR_STORE_PATH)}" if LOCAL_VECTOR_STORE_PATH else "astra"
+    # Queries run over every upload, so they are scoped to the whole collection
+    return cache.search("", f"{storage} {parameters}", query, search, embed)
+
+def embedding_column_is_vector():
+    """Whether uploads.embedding is a vector column rather than the older JSON text"""
+    global _embedding_is_vector
+    if _embedding_is_vector is None:
+        session = connect_to_astra()
+        try:
+            column = session.cluster.metadata.keyspaces[session.keyspace].tables["uploads"].columns["embedding"]
+            _embedding_is_vector = not column.cql_type.startswith(("text", "varchar"))
+        except (AttributeError, KeyError):
+            # No schema metadata to go by: assume the current schema
+            _embedding_is_vector = True
+    return _embedding_is_vector
+
+def embedding_value(embedding):
+    """An embedding as the uploads table stores it: a list of floats, or JSON text in old tables"""
+    embedding = [float(x) for x in embedding]
+    return embedding if embedding_column_is_vector() else json.dumps(embedding)
 
 def store_embedding(document_id, text, embedding):
+    if local_store() is not None:
+        local_store().add([embedding], [text], document_ids=[document_id])
+        invalidate_documents([document_id])
+        print("Stored embedding successfully!")
+        return
+
     session = connect_to_astra()
-    session.execute("""
-        INSERT INTO uploads (document_id, text, embedding) VALUES (%s, %s, %s)
-    """, (document_id, text, json.dumps(embedding)))
+    session.execute(
+        prepared("INSERT INTO uploads (document_id, text, embedding) VALUES (?, ?, ?)"),
+        (document_id, text, embedding_value(embedding))
+    )
+    invalidate_documents([document_id])
 
     print("Stored embedding successfully!")
 
+def store_embeddings(records, vectors, concurrency=DEFAULT_WRITE_CONCURRENCY):
+    """
+    Store many (document_id, text) records with one vector each, in a single local append
+    or as concurrent prepared inserts; returns the number of records that failed
+    """
+    if len(records) != len(vectors):
+        raise ValueError(f"Got {len(vectors)} vectors for {len(records)} records")
+    if local_store() is not None:
+        local_store().add(vectors, [record["text"] for record in records],
+                          document_ids=[record["document_id"] for record in records])
+        invalidate_documents([record["document_id"] for record in records])
+        return 0
+
+    from astra_writer import execute_windowed
+    from rate_limiter import RateLimiter
+    session = connect_to_astra()
+    # Timeouts and overload errors are retried with backoff, and the window shrinks while the
+    # cluster pushes back; ASTRA_WRITES_PER_SECOND also caps the write rate
+    limiter = RateLimiter("astra_writes", requests_per_second=float(os.getenv("ASTRA_WRITES_PER_SECOND", 0)) or None,
+                          max_concurrency=concurrency)
+    _, failures = execute_windowed(
+        session,
+        prepared("INSERT INTO uploads (document_id, text, embedding) VALUES (?, ?, ?)"),
+        ((record["document_id"], record["text"], embedding_value(vector)) for record, vector in zip(records, vectors)),
+        concurrency, limiter
+    )
+    invalidate_documents([record["document_id"] for record in records])
+    for index, error in failures:
+        print(f"Error storing {records[index]['document_id']}: {error}", file=sys.stderr)
+    return len(failures)
+
+def fetch_similar(query, k=DEFAULT_TOP_K, threshold=None):
+    """Return the top-k uploads by cosine similarity to the question, best first"""
+    parameters = (f"vector k={k} threshold={threshold} quantization={LOCAL_VECTOR_QUANTIZATION} "
+                  f"oversample={LOCAL_VECTOR_OVERSAMPLE}")
+    return cached_query(parameters, query, lambda query_vector: search_similar(query_vector, k, threshold))
+
+def search_similar(query_vector, k=DEFAULT_TOP_K, threshold=None):
+    if local_store() is not None:
+        return [
+            {"document_id": row["document_id"], "text": row["text"], "score": row["score"]}
+            for row in local_store().search(query_vector, k=k, threshold=threshold,
+                                            quantization=LOCAL_VECTOR_QUANTIZATION,
+                                            oversample=LOCAL_VECTOR_OVERSAMPLE)
+        ]
+
+    if not embedding_column_is_vector():
+        raise RuntimeError("uploads.embedding is JSON text; vector search needs the vector column "
+                           "described at the top of astraDBClient.py")
+    session = connect_to_astra()
+    rows = session.execute(
+        prepared("""
+            SELECT document_id, text, similarity_cosine(embedding, ?) AS score
+            FROM uploads ORDER BY embedding ANN OF ? LIMIT ?
+        """),
+        (list(map(float, query_vector)), list(map(float, query_vector)), k)
+    )
+
+    results = []
+    for row in rows:
+        if threshold is not None and row.score < threshold:
+            continue
+        results.append({"document_id": row.document_id, "text": row.text, "score": row.score})
+    return results
+
+def fetch_keyword_matches(query, k=DEFAULT_TOP_K):
+    """Return the top-k uploads by BM25 score for the question's terms, best first"""
+    if not LOCAL_VECTOR_STORE_PATH:
+        raise RuntimeError("Keyword search needs a local vector store (its lexical index)")
+    return cached_query(f"lexical k={k}", query, lambda _: [
+        {"document_id": row["document_id"], "text": row["text"], "score": row["score"]}
+        for row in local_store().lexical_search(query, k=k)
+    ], needs_vector=False)
+
+def fetch_hybrid(query, k=DEFAULT_TOP_K, lexical_weight=None):
+    """Return the top-k uploads by combined BM25 and cosine score, best first"""
+    if not LOCAL_VECTOR_STORE_PATH:
+        raise RuntimeError("Hybrid search needs a local vector store (its lexical index)")
+    lexical_weight = LOCAL_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+
+    def search(query_vector):
+        rows = local_store().hybrid_search(query, query_vector, k=k, lexical_weight=lexical_weight,
+                                           quantization=LOCAL_VECTOR_QUANTIZATION,
+                                           oversample=LOCAL_VECTOR_OVERSAMPLE)
+        return [
+            {"document_id": row["document_id"], "text": row["text"], "score": row["score"],
+             "lexical_score": row["lexical_score"], "vector_score": row["vector_score"]}
+            for row in rows
+        ]
+
+    parameters = (f"hybrid k={k} lexical_weight={lexical_weight} quantization={LOCAL_VECTOR_QUANTIZATION} "
+                  f"oversample={LOCAL_VECTOR_OVERSAMPLE}")
+    return cached_query(parameters, query, search)
+
 def fetch_relevant_embedding(query):
+    """The first upload whose text contains the query (case-insensitive) with its embedding, or None"""
+    return cached_query("substring", query, lambda _: find_relevant_embedding(query), needs_vector=False)
+
+def find_relevant_embedding(query):
+    # A literal substring scan in both backends, linear in the number of chunks; the BM25 index
+    # only backs --mode lexical and hybrid on the local store, and AstraDB has no keyword index
+    if local_store() is not None:
+        row = local_store().find_containing(query)
+        return {"text": row["text"], "embedding": row["embedding"]} if row else None
+
     session = connect_to_astra()
     result = session.execute("SELECT text, embedding FROM uploads")
-    
+
     # Find the most relevant document (placeholder logic)
     relevant_doc = None
     for row in result:
         if query.lower() in row.text.lower():
             relevant_doc = row
             break
-    
+
     if relevant_doc:
-        return {"text": relevant_doc.text, "embedding": json.loads(relevant_doc.embedding)}
+        embedding = relevant_doc.embedding
+        if isinstance(embedding, str):
+            # Rows written before the vector column stored embeddings as JSON text
+            embedding = json.loads(embedding)
+        return {"text": relevant_doc.text, "embedding": list(embedding)}
     else:
         return None
 
 if __name__ == "__main__":
-    command = sys.argv[1]
-    
-    if command == "store":
-        document_id = sys.argv[2]
-        text = sys.argv[3]
-        embedding = json.loads(sys.argv[4])
-        store_embedding(document_id, text, embedding)
-    
-    elif command == "query":
-        query = sys.argv[2]
-        result = fetch_relevant_embedding(query)
-        if result:
-            print(json.dumps(result))
+    parser = argparse.ArgumentParser(description="Store and query paper embeddings in AstraDB")
+    parser.add_argument("--local-store", default=None,
+                        help="Use a local vector store directory instead of AstraDB")
+    parser.add_argument("--quantization", choices=["int8", "binary"], default=None,
+                        help="Quantized first pass for local vector search, rescored exactly")
+    parser.add_argument("--oversample", type=int, default=None,
+                        help="Candidates per requested result in the quantized pass")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    store_parser = commands.add_parser("store")
+    store_parser.add_argument("document_id")
+    store_parser.add_argument("text")
+    store_parser.add_argument("embedding", help="Embedding as a JSON list")
+
+    # Binary transport: vectors in a raw float32 or .npy file (or pipe), metadata on stdin as
+    # {"dimensions": 384, "records": [{"document_id": ..., "text": ...}, ...]} (see vector_io.py)
+    batch_parser = commands.add_parser("store-batch")
+    batch_parser.add_argument("--vectors", required=True, help="Raw float32 or .npy file, one row per record")
+    batch_parser.add_argument("--concurrency", type=int, default=DEFAULT_WRITE_CONCURRENCY,
+                              help="Inserts in flight at once (AstraDB)")
+
+    query_parser = commands.add_parser("query")
+    query_parser.add_argument("query")
+    # substring stays the default so existing callers keep its output, {"text", "embedding"};
+    # the other modes print {"results": [...]}
+    query_parser.add_argument("--mode", choices=["substring", "vector", "lexical", "hybrid"], default="substring",
+                              help="lexical and hybrid (BM25) need --local-store; substring is a linear scan "
+                                   "for the first chunk containing the query")
+    query_parser.add_argument("--k", type=int, default=DEFAULT_TOP_K, help="Number of results")
+    query_parser.add_argument("--threshold", type=float, default=None,
+                              help="Minimum cosine similarity (vector mode)")
+    query_parser.add_argument("--lexical-weight", type=float, default=None,
+                              help="Share of BM25 in the hybrid score, 0 to 1")
+
+    args = parser.parse_args()
+    if args.local_store:
+        LOCAL_VECTOR_STORE_PATH = args.local_store
+    if args.quantization:
+        LOCAL_VECTOR_QUANTIZATION = args.quantization
+    if args.oversample:
+        LOCAL_VECTOR_OVERSAMPLE = args.oversample
+
+    if args.command == "store":
+        embedding = json.loads(args.embedding)
+        store_embedding(args.document_id, args.text, embedding)
+
+    elif args.command == "store-batch":
+        from vector_io import read_vectors, read_metadata
+        metadata = read_metadata()
+        vectors = read_vectors(args.vectors, metadata.get("dimensions"))
+        failed = store_embeddings(metadata["records"], vectors, args.concurrency)
+        print(json.dumps({"stored": len(vectors) - failed, "failed": failed}))
+        if failed:
+            sys.exit(1)
+
+    elif args.command == "query":
+        if args.mode != "substring":
+            try:
+                if args.mode == "vector":
+                    results = fetch_similar(args.query, k=args.k, threshold=args.threshold)
+                elif args.mode == "lexical":
+                    results = fetch_keyword_matches(args.query, k=args.k)
+                else:
+                    results = fetch_hybrid(args.query, k=args.k, lexical_weight=args.lexical_weight)
+            except RuntimeError as e:
+                print(json.dumps({"error": str(e)}))
+                sys.exit(1)
+            if results:
+                print(json.dumps({"results": results}))
+            else:
+                print(json.dumps({"error": "No relevant document found"}))
         else:
-            print(json.dumps({"error": "No relevant document found"}))
+            result = fetch_relevant_embedding(args.query)
+            if result:
+                print(json.dumps(result))
+            else:
+                print(json.dumps({"error": "No relevant document found"}))
@@ -0,0 +1,187 @@
+# astra_writer.py
+# Windowed concurrent execution on top of the Cassandra driver's execute_async
+#
+# With a RateLimiter (rate_limiter.py) the window follows the limiter's adaptive concurrency,
+# each request waits for its write budget, and timeouts and overload errors are retried after
+# a jittered backoff instead of being returned as failures straight away.
+
+import time
+import heapq
+import asyncio
+from collections import deque
+
+
+def retryable_write_errors():
+    """Driver errors that mean the cluster was busy rather than that the write is invalid"""
+    from cassandra import WriteTimeout, Unavailable, OperationTimedOut
+    from cassandra.cluster import NoHostAvailable
+    from cassandra.protocol import OverloadedErrorMessage
+    return (WriteTimeout, Unavailable, OperationTimedOut, NoHostAvailable, OverloadedErrorMessage)
+
+
+def execute_windowed(session, statement, parameters, concurrency=32, limiter=None, on_retry=None):
+    """
+    Execute a (prepared) statement once per parameter tuple, keeping at most
+    `concurrency` requests in flight.
+
+    Returns (succeeded, failures) where failures is a list of (index, exception)
+    pairs in input order. With a limiter, failures are the writes that ran out of retries;
+    on_retry(error, attempt) runs for each retry.
+    """
+    if limiter is not None:
+        return execute_limited(session, statement, parameters, concurrency, limiter, on_retry)
+    in_flight = deque()
+    failures = []
+    succeeded = 0
+
+    def wait_oldest():
+        nonlocal succeeded
+        index, future = in_flight.popleft()
+        try:
+            future.result()
+            succeeded += 1
+        except Exception as e:
+            failures.append((index, e))
+
+    for index, params in enumerate(parameters):
+        if len(in_flight) >= concurrency:
+            wait_oldest()
+        try:
+            in_flight.append((index, session.execute_async(statement, params)))
+        except Exception as e:
+            failures.append((index, e))
+
+    while in_flight:
+        wait_oldest()
+
+    failures.sort(key=lambda failure: failure[0])
+    return succeeded, failures
+
+
+def execute_limited(session, statement, parameters, concurrency, limiter, on_retry=None):
+    """execute_windowed under a RateLimiter, retrying busy-cluster errors"""
+    retryable = retryable_write_errors()
+    in_flight = deque()
+    # (ready_at, index, attempt, params) of writes waiting to be retried
+    retries = []
+    failures = []
+    succeeded = 0
+    pending = enumerate(parameters)
+    exhausted = False
+
+    def submit(index, params, attempt):
+        time.sleep(limiter.admission_delay())
+        try:
+            in_flight.append((index, params, attempt, time.monotonic(),
+                              session.execute_async(statement, params)))
+        except Exception as e:
+            limiter.concurrency.release()
+            failures.append((index, e))
+
+    def wait_oldest():
+        nonlocal succeeded
+        index, params, attempt, started, future = in_flight.popleft()
+        try:
+            future.result()
+        except Exception as e:
+            limiter.concurrency.release()
+            limiter.record_failure(e, started, retryable)
+            if isinstance(e, retryable) and attempt < limiter.max_retries:
+                if on_retry is not None:
+                    on_retry(e, attempt)
+                heapq.heappush(retries, (time.monotonic() + limiter.retry_delay(e, attempt), index, attempt + 1, params))
+            else:
+                failures.append((index, e))
+            return
+        limiter.concurrency.release()
+        # Waiting on the oldest request first overstates later ones' latency, so only
+        # throttling drives the limit here
+        limiter.concurrency.on_success()
+        succeeded += 1
+
+    while True:
+        if len(in_flight) >= concurrency or (in_flight and not limiter.concurrency.try_acquire()):
+            wait_oldest()
+            continue
+        if not in_flight:
+            # Blocks while other writers hold every slot
+            limiter.concurrency.acquire()
+        # A slot is held from here on
+        if retries and retries[0][0] <= time.monotonic():
+            _, index, attempt, params = heapq.heappop(retries)
+            submit(index, params, attempt)
+            continue
+        if not exhausted:
+            item = next(pending, None)
+            if item is not None:
+                submit(item[0], item[1], 0)
+                continue
+            exhausted = True
+        limiter.concurrency.release()
+        if in_flight:
+            wait_oldest()
+        elif retries:
+            time.sleep(max(0.0, retries[0][0] - time.monotonic()))
+        else:
+            break
+
+    failures.sort(key=lambda failure: failure[0])
+    return succeeded, failures
+
+
+def wrap_response_future(response_future, loop):
+    """asyncio future that resolves with a driver ResponseFuture (or a concurrent.futures.Future)"""
+    if not hasattr(response_future, 'add_callbacks'):
+        return asyncio.wrap_future(response_future, loop=loop)
+
+    future = loop.create_future()
+
+    def set_result(rows):
+        if not future.done():
+            future.set_result(rows)
+
+    def set_exception(exc):
+        if not future.done():
+            future.set_exception(exc)
+
+    # Driver callbacks run on its event thread
+    response_future.add_callbacks(
+        lambda rows: loop.call_soon_threadsafe(set_result, rows),
+        lambda exc: loop.call_soon_threadsafe(set_exception, exc)
+    )
+    return future
+
+
+async def execute_windowed_async(session, statement, parameters, concurrency=32, limiter=None, on_retry=None):
+    """
+    asyncio counterpart of execute_windowed: same window, limiter and return value,
+    but waiting for responses yields to the event loop instead of blocking
+    """
+    loop = asyncio.get_running_loop()
+    window = asyncio.Semaphore(concurrency)
+    failures = []
+    retryable = retryable_write_errors() if limiter is not None else ()
+
+    async def execute(index, params):
+        try:
+            if limiter is None:
+                await wrap_response_future(session.execute_async(statement, params), loop)
+            else:
+                await limiter.call_async(
+                    lambda: wrap_response_future(session.execute_async(statement, params), loop),
+                    retryable=retryable, on_retry=on_retry)
+            return True
+        except Exception as e:
+            failures.append((index, e))
+            return False
+        finally:
+            window.release()
+
+    tasks = []
+    for index, params in enumerate(parameters):
+        await window.acquire()
+        tasks.append(asyncio.ensure_future(execute(index, params)))
+
+    succeeded = sum(await asyncio.gather(*tasks))
+    failures.sort(key=lambda failure: failure[0])
+    return succeeded, failures
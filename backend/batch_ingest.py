@@ -0,0 +1,174 @@
+# batch_ingest.py
+# Concurrent, resumable ingestion of many PDFs through one PDFProcessingPipeline.
+#
+# Progress is appended to a JSON-lines checkpoint file, one record per finished PDF:
+#   {"path": ..., "size": ..., "mtime": ..., "status": "done" | "partial" | "failed", ...counts or error}
+# Only a PDF recorded as done with the same size and modification time is skipped on the next
+# run, so a crashed or interrupted run resumes where it stopped. A PDF whose ingest finished with
+# some chunks failing to embed or store is recorded as "partial", and ingested again, only with
+# retry_partial (incremental ingestion, which re-embeds just the chunks not stored yet). A full
+# ingest would write every stored chunk again under new row ids, so without it the PDF is
+# recorded as done with "complete": false and its failed chunks are left to dead-letter replay
+# (`python mpl.py replay`, with DEAD_LETTER_PATH set).
+
+import os
+import glob
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def collect_pdf_paths(inputs, manifest=None):
+    """Expand files, directories (recursively) and glob patterns into a sorted list of PDF paths"""
+    candidates = list(inputs)
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            candidates.extend(line.strip() for line in f
+                              if line.strip() and not line.lstrip().startswith('#'))
+
+    paths = set()
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            matches = glob.glob(os.path.join(candidate, '**', '*.pdf'), recursive=True)
+        elif glob.has_magic(candidate):
+            matches = glob.glob(candidate, recursive=True)
+        else:
+            matches = [candidate]
+        paths.update(os.path.abspath(path) for path in matches
+                     if path.lower().endswith('.pdf') and os.path.isfile(path))
+    return sorted(paths)
+
+
+def is_complete(result):
+    """Whether an ingest stored every chunk (reused chunks of an incremental ingest count as stored)"""
+    return not result['failures'] and result['embeddings'] + result.get('reused', 0) >= result['chunks']
+
+
+def file_identity(path):
+    stat = os.stat(path)
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+class Checkpoint:
+    """Append-only record of finished PDFs"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a torn last line
+                        continue
+                    if record.get('status') == 'done':
+                        self.done[record['path']] = (record['size'], record['mtime'])
+                    else:
+                        self.done.pop(record['path'], None)
+
+    def is_done(self, identity):
+        return self.done.get(identity['path']) == (identity['size'], identity['mtime'])
+
+    def record(self, record):
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class Throughput:
+    """Running totals and rates across the batch"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.totals = {'files': 0, 'failed': 0, 'partial': 0, 'pages': 0, 'chunks': 0, 'embeddings': 0,
+                       'stored': 0}
+
+    def add(self, result=None):
+        with self.lock:
+            self.totals['files'] += 1
+            if result is None:
+                self.totals['failed'] += 1
+            else:
+                if not is_complete(result):
+                    self.totals['partial'] += 1
+                for key in ('pages', 'chunks', 'embeddings', 'stored'):
+                    self.totals[key] += result[key]
+
+    def rates(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        with self.lock:
+            return {
+                'pages_per_s': self.totals['pages'] / elapsed,
+                'chunks_per_s': self.totals['chunks'] / elapsed,
+                'embeddings_per_s': self.totals['embeddings'] / elapsed,
+            }
+
+    def line(self):
+        rates = self.rates()
+        return (f"{rates['pages_per_s']:.1f} pages/s, {rates['chunks_per_s']:.1f} chunks/s, "
+                f"{rates['embeddings_per_s']:.1f} embeddings/s")
+
+
+def run_batch(ingest, paths, checkpoint_path, concurrency=4, retry_partial=False):
+    """
+    Run ingest(path) -> counts dict for every path not yet checkpointed,
+    concurrently, printing progress and throughput as files finish.
+    Partly failed PDFs are retried on the next run only with retry_partial (see the module comment).
+    Returns the batch totals.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = []
+    for path in paths:
+        identity = file_identity(path)
+        if not checkpoint.is_done(identity):
+            pending.append(identity)
+
+    skipped = len(paths) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} PDFs already ingested according to {checkpoint_path}")
+
+    throughput = Throughput()
+
+    def process(identity):
+        started = time.perf_counter()
+        try:
+            result = ingest(identity['path'])
+        except Exception as e:
+            checkpoint.record(dict(identity, status='failed', error=str(e)))
+            throughput.add(None)
+            return identity, None, e
+        complete = is_complete(result)
+        record = dict(identity, status='done' if complete or not retry_partial else 'partial', complete=complete,
+                      seconds=round(time.perf_counter() - started, 3),
+                      pages=result['pages'], chunks=result['chunks'],
+                      embeddings=result['embeddings'], stored=result['stored'],
+                      store_failures=len(result['failures']))
+        checkpoint.record(record)
+        throughput.add(result)
+        return identity, result, None
+
+    partial_note = ' (PARTIAL, retried next run)' if retry_partial else ' (PARTIAL, see dead-letter replay)'
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(process, identity) for identity in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            identity, result, error = future.result()
+            name = os.path.basename(identity['path'])
+            if error is not None:
+                print(f"[{finished}/{len(pending)}] {name}: FAILED ({error})")
+            else:
+                print(f"[{finished}/{len(pending)}] {name}: {result['pages']} pages, "
+                      f"{result['chunks']} chunks, {result['stored']} stored"
+                      f"{'' if is_complete(result) else partial_note} | {throughput.line()}")
+
+    totals = dict(throughput.totals, skipped=skipped)
+    print(f"Ingested {totals['files'] - totals['failed']} PDFs ({totals['failed']} failed, "
+          f"{totals['partial']} partial, {skipped} skipped): {totals['pages']} pages, {totals['chunks']} chunks, "
+          f"{totals['stored']} embeddings stored | {throughput.line()}")
+    return totals
@@ -0,0 +1,75 @@
+# bench_astra_writes.py
+# Compares row-at-a-time writes with windowed concurrent writes against the local session stand-in.
+#
+#   python benchmarks/bench_astra_writes.py --rows 2000 --latency-ms 2
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from astra_writer import execute_windowed
+from local_cassandra import LocalSession
+
+INSERT = """
+    INSERT INTO metadata (key, query_vector_value, tx_id, vector_id, content)
+    VALUES ((?, ?), ?, now(), ?, ?)
+"""
+
+
+def make_rows(count, dimensions=768):
+    vectors = np.random.default_rng(0).standard_normal((count, dimensions)).astype(np.float32)
+    rows = []
+    for i in range(count):
+        doc_id = str(uuid.uuid4())
+        rows.append((1, doc_id, vectors[i].tolist(), doc_id, f"chunk {i}"))
+    return rows
+
+
+def run_serial(session, rows):
+    start = time.perf_counter()
+    stored = 0
+    for params in rows:
+        try:
+            session.execute(INSERT, params)
+            stored += 1
+        except Exception:
+            pass
+    return stored, time.perf_counter() - start
+
+
+def run_windowed(session, rows, concurrency):
+    start = time.perf_counter()
+    stored, failures = execute_windowed(session, session.prepare(INSERT), rows, concurrency)
+    return stored, failures, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AstraDB write paths against a local stand-in")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--failure-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    session = LocalSession(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    stored, elapsed = run_serial(session, rows)
+    print({'mode': 'serial', 'stored': stored, 'rows_per_second': round(stored / elapsed, 1)})
+    session.shutdown()
+
+    for concurrency in (1, 8, 32, 128):
+        session = LocalSession(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+        stored, failures, elapsed = run_windowed(session, rows, concurrency)
+        assert stored + len(failures) == len(rows), "every row must be stored or reported"
+        print({'mode': 'windowed', 'concurrency': concurrency, 'stored': stored,
+               'failures': len(failures), 'rows_per_second': round(stored / elapsed, 1)})
+        session.shutdown()
+
+
+if __name__ == "__main__":
+    main()
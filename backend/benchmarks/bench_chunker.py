@@ -0,0 +1,86 @@
+# bench_chunker.py
+# TextChunker vs LangChain's RecursiveCharacterTextSplitter on synthetic multi-megabyte text.
+#
+#   python benchmarks/bench_chunker.py --megabytes 2 --repeat 3
+#
+# Three document shapes: short lines grouped in paragraphs (typical PDF extraction), long
+# paragraphs, and a single line with no newlines at all. Each row reports both splitters' best
+# time and whether they produced identical chunks.
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_chunker import TextChunker
+
+WORDS = ("retrieval", "augmented", "generation", "citation", "vector", "embedding", "the", "of",
+         "and", "model", "paper", "results", "table", "figure", "we", "show", "that", "a")
+
+
+def make_text(shape, megabytes, seed=0):
+    rng = random.Random(seed)
+    words_per_line, lines_per_paragraph = {
+        'lines': (10, 60), 'paragraphs': (300, 1), 'one_line': (None, 1),
+    }[shape]
+    target = int(megabytes * 1_000_000)
+    if words_per_line is None:
+        words = []
+        length = 0
+        while length < target:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)
+    paragraphs = []
+    length = 0
+    while length < target:
+        lines = [" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines_per_paragraph)]
+        paragraphs.append("\n".join(lines))
+        length += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)
+
+
+def best_time(split, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return chunks, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offset-based text chunker")
+    parser.add_argument('--megabytes', type=float, default=2.0)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        RecursiveCharacterTextSplitter = None
+        print("langchain-text-splitters is not installed; timing TextChunker only")
+
+    chunker = TextChunker(args.chunk_size, args.chunk_overlap)
+    print(f"{'shape':>10} {'MB':>5} {'chunks':>7} {'langchain s':>12} {'chunker s':>10} {'speedup':>8} {'same':>5}")
+    for shape in ('lines', 'paragraphs', 'one_line'):
+        text = make_text(shape, args.megabytes)
+        chunks, chunker_seconds = best_time(chunker.split_text, text, args.repeat)
+        if RecursiveCharacterTextSplitter is None:
+            print(f"{shape:>10} {len(text) / 1e6:>5.1f} {len(chunks):>7} {'-':>12} {chunker_seconds:>10.3f}")
+            continue
+        splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        expected, langchain_seconds = best_time(splitter.split_text, text, args.repeat)
+        print(f"{shape:>10} {len(text) / 1e6:>5.1f} {len(chunks):>7} {langchain_seconds:>12.3f} "
+              f"{chunker_seconds:>10.3f} {langchain_seconds / chunker_seconds:>7.1f}x {str(chunks == expected):>5}")
+
+
+if __name__ == "__main__":
+    main()
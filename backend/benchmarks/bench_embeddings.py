@@ -0,0 +1,85 @@
+# bench_embeddings.py
+# Measures OpenAIEmbedder throughput against the local stub embeddings server.
+#
+#   python benchmarks/bench_embeddings.py --chunks 2000 --latency-ms 50
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_embedder import OpenAIEmbedder
+from embedding_cache import EmbeddingCache
+from stub_embeddings_server import start_stub_server, stub_vector
+
+
+def synthetic_chunks(count, size=1000):
+    return [f"chunk {i} " + ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size] for i in range(count)]
+
+
+def run(server, texts, batch_size, concurrency, cache=None):
+    embedder = OpenAIEmbedder(api_key="stub", base_url=server.base_url,
+                              max_batch_size=batch_size, max_concurrency=concurrency, cache=cache)
+    requests_before = server.stats.requests
+    server.stats.max_in_flight = 0
+    try:
+        start = time.perf_counter()
+        vectors = embedder.embed(texts)
+        elapsed = time.perf_counter() - start
+    finally:
+        embedder.close()
+
+    # Results must come back in input order
+    for text in (texts[0], texts[len(texts) // 2], texts[-1]):
+        index = texts.index(text)
+        assert vectors[index] is not None, f"chunk {index} was not embedded"
+        assert np.allclose(vectors[index], stub_vector(text, len(vectors[index])), atol=1e-6), \
+            f"chunk {index} came back out of order"
+
+    return {
+        'cached': cache is not None,
+        'batch_size': batch_size,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'chunks_per_second': round(len(texts) / elapsed, 1),
+        'requests': server.stats.requests - requests_before,
+        'max_in_flight': server.stats.max_in_flight,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched OpenAI embedding calls")
+    parser.add_argument('--chunks', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--per-input-ms', type=float, default=0.05)
+    parser.add_argument('--serial-sample', type=int, default=50,
+                        help="Chunks used for the one-request-per-chunk baseline")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.latency_ms, per_input_ms=args.per_input_ms)
+    texts = synthetic_chunks(args.chunks)
+    try:
+        results = [run(server, texts[:args.serial_sample], batch_size=1, concurrency=1)]
+        for batch_size, concurrency in ((1, 8), (100, 1), (100, 4), (2048, 4)):
+            results.append(run(server, texts, batch_size, concurrency))
+
+        # Re-ingesting the same chunks should be served from the embedding cache
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite"))
+            results.append(run(server, texts, 100, 4, cache=cache))
+            results.append(run(server, texts, 100, 4, cache=cache))
+            print(cache.stats())
+            cache.close()
+    finally:
+        server.shutdown()
+
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
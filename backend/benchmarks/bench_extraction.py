@@ -0,0 +1,68 @@
+# bench_extraction.py
+# Serial vs process-pool PDF text extraction on a synthetic document.
+#
+#   python benchmarks/bench_extraction.py --pages 1000 --workers 2 4 8
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpl import PDFProcessingPipeline
+from local_vector_store import LocalVectorStore
+from synthetic_pdf import write_pdf
+
+
+def make_pipeline(store_dir, workers, min_pages):
+    return PDFProcessingPipeline(
+        openai_api_key="unused",
+        astra_db_secure_bundle_path=None,
+        astra_db_client_id=None,
+        astra_db_client_secret=None,
+        astra_keyspace=None,
+        vector_store=LocalVectorStore(store_dir),
+        extraction_workers=workers,
+        parallel_min_pages=min_pages
+    )
+
+
+def timed_extract(pipeline, pdf_path):
+    start = time.perf_counter()
+    pages = pipeline.extract_pages(pdf_path)
+    return pages, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF text extraction")
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument('--min-pages', type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, "synthetic.pdf")
+        write_pdf(pdf_path, args.pages)
+
+        serial = make_pipeline(os.path.join(directory, "store"), 1, args.min_pages)
+        reference, serial_seconds = timed_extract(serial, pdf_path)
+        serial.close()
+        print({'workers': 1, 'pages': len(reference), 'seconds': round(serial_seconds, 3),
+               'pages_per_second': round(len(reference) / serial_seconds, 1), 'speedup': 1.0})
+
+        for workers in sorted(set(args.workers)):
+            pipeline = make_pipeline(os.path.join(directory, "store"), workers, args.min_pages)
+            # Warm the pool so worker start-up is not counted against every document
+            pipeline.extract_pages(pdf_path)
+            pages, seconds = timed_extract(pipeline, pdf_path)
+            pipeline.close()
+            assert pages == reference, "parallel extraction must match the serial output page for page"
+            print({'workers': workers, 'pages': len(pages), 'seconds': round(seconds, 3),
+                   'pages_per_second': round(len(pages) / seconds, 1),
+                   'speedup': round(serial_seconds / seconds, 2)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench_extraction_cache.py
+# PDF parsing vs reading page texts back from the extraction cache, on a synthetic document.
+#
+#   python benchmarks/bench_extraction_cache.py --pages 1000 --chunk-sizes 500 1000 2000
+#
+# Reports the cold extraction (parse + cache write), warm whole-document and streaming reads,
+# random page-range reads, the cache file size next to the raw text size, and a re-chunking
+# sweep over several chunk sizes with and without the cache.
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpl import PDFProcessingPipeline
+from local_vector_store import LocalVectorStore
+from fingerprints import file_digest
+from synthetic_pdf import write_pdf
+
+
+def make_pipeline(store_dir, chunk_size, cache_dir=None):
+    return PDFProcessingPipeline(
+        openai_api_key="unused",
+        astra_db_secure_bundle_path=None,
+        astra_db_client_id=None,
+        astra_db_client_secret=None,
+        astra_keyspace=None,
+        vector_store=LocalVectorStore(store_dir),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_size // 5,
+        extraction_cache_path=cache_dir
+    )
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def rechunk(pdf_path, store_dir, chunk_sizes, cache_dir):
+    """Extract and split the document once per chunk size, as a chunking experiment would"""
+    start = time.perf_counter()
+    chunks = 0
+    for chunk_size in chunk_sizes:
+        pipeline = make_pipeline(store_dir, chunk_size, cache_dir)
+        chunks += len(pipeline.split_pages(pipeline.extract_pages(pdf_path)))
+        pipeline.close()
+    return chunks, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the page-level extraction cache")
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--range-pages', type=int, default=10, help="Pages per random range read")
+    parser.add_argument('--range-reads', type=int, default=200)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[500, 1000, 2000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, "synthetic.pdf")
+        write_pdf(pdf_path, args.pages)
+        store_dir = os.path.join(directory, "store")
+        cache_dir = os.path.join(directory, "extraction_cache")
+
+        uncached = make_pipeline(store_dir, 1000)
+        reference, parse_seconds = timed(lambda: uncached.extract_pages(pdf_path))
+        uncached.close()
+
+        pipeline = make_pipeline(store_dir, 1000, cache_dir)
+        cold, cold_seconds = timed(lambda: pipeline.extract_pages(pdf_path))
+        warm, warm_seconds = timed(lambda: pipeline.extract_pages(pdf_path))
+        streamed, stream_seconds = timed(lambda: list(pipeline.iter_pdf_pages(pdf_path)))
+        assert cold == reference and warm == reference and streamed == reference, \
+            "cached pages must match the parsed pages"
+
+        document_hash, hash_seconds = timed(lambda: file_digest(pdf_path))
+        cache = pipeline.extraction_cache
+        rng = random.Random(0)
+        starts = [rng.randrange(max(1, len(reference) - args.range_pages)) for _ in range(args.range_reads)]
+        _, range_seconds = timed(lambda: [cache.get(document_hash, start, start + args.range_pages)
+                                          for start in starts])
+        pipeline.close()
+
+        text_bytes = sum(len(page.encode('utf-8')) for page in reference)
+        cache_bytes = os.path.getsize(cache.path(document_hash))
+        print({'pages': len(reference), 'parse_s': round(parse_seconds, 3),
+               'cold_s': round(cold_seconds, 3), 'warm_s': round(warm_seconds, 4),
+               'stream_s': round(stream_seconds, 4), 'hash_s': round(hash_seconds, 4),
+               'speedup': round(parse_seconds / warm_seconds, 1)})
+        print({'range_pages': args.range_pages,
+               'range_read_ms': round(range_seconds / args.range_reads * 1000, 3),
+               'text_bytes': text_bytes, 'cache_bytes': cache_bytes,
+               'ratio': round(text_bytes / cache_bytes, 2)})
+
+        for label, sweep_cache in (('parse', None), ('cache', cache_dir)):
+            chunks, seconds = rechunk(pdf_path, store_dir, args.chunk_sizes, sweep_cache)
+            print({'rechunk': label, 'chunk_sizes': args.chunk_sizes, 'chunks': chunks,
+                   'seconds': round(seconds, 3)})
+
+
+if __name__ == "__main__":
+    main()
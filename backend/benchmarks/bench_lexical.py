@@ -0,0 +1,106 @@
+# bench_lexical.py
+# Exact-term lookup: the BM25 index against the old substring scan, plus hybrid ranking.
+#
+#   python benchmarks/bench_lexical.py --chunks 100000 --queries 200 --lexical-weight 0.3
+#
+# Chunks are random vocabulary words with a rare "needle" term (a method, dataset or author name)
+# planted in one chunk per query. Each query is a question around its needle, and vectors are
+# unrelated to the words, so vector search cannot find it. Reports index build and reopen times,
+# then per mode p50/p99 latency and how often the planted chunk ranks first.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_vector_store import LocalVectorStore
+
+COMMON = ["the", "of", "results", "model", "we", "show", "table", "figure", "training", "data", "method",
+          "accuracy", "baseline", "attention", "layer", "loss", "dataset", "paper", "proposed", "evaluation"]
+
+
+def make_corpus(rng, chunks, words_per_chunk=150, vocabulary=20000):
+    vocabulary = COMMON * 50 + [f"term{i}" for i in range(vocabulary)]
+    picks = rng.integers(0, len(vocabulary), (chunks, words_per_chunk))
+    return [" ".join(vocabulary[i] for i in row) for row in picks]
+
+
+def timed(function, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(function(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 lookup and hybrid ranking")
+    parser.add_argument('--chunks', type=int, default=100000)
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--upload-chunks', type=int, default=200, help="Chunks per add(), like one paper")
+    parser.add_argument('--lexical-weight', type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = make_corpus(rng, args.chunks)
+    targets = rng.choice(args.chunks, args.queries, replace=False)
+    needles = [f"needle{i}net" for i in range(args.queries)]
+    for target, needle in zip(targets, needles):
+        texts[target] = f"{texts[target]} {needle} outperforms the baseline"
+    questions = [f"which results does {needle} report" for needle in needles]
+    vectors = rng.standard_normal((args.chunks, args.dimensions), dtype=np.float32)
+
+    report = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, dimensions=args.dimensions)
+        start = time.perf_counter()
+        for first in range(0, args.chunks, args.upload_chunks):
+            store.add(vectors[first:first + args.upload_chunks], texts[first:first + args.upload_chunks])
+        report.append({'name': 'build', 'seconds': round(time.perf_counter() - start, 3),
+                       'segments': len(store.lexical_index().segments)})
+        store.close()
+
+        start = time.perf_counter()
+        store = LocalVectorStore(directory)
+        store.lexical_index()
+        report.append({'name': 'reopen', 'seconds': round(time.perf_counter() - start, 3)})
+
+        query_vectors = rng.standard_normal((args.queries, args.dimensions), dtype=np.float32)
+
+        def substring(question):
+            # --mode substring: first chunk containing the needle
+            row = store.find_containing(question.split()[3])
+            return [row] if row else []
+
+        vector_of = dict(zip(questions, query_vectors))
+        modes = {
+            'substring_scan': substring,
+            'lexical': lambda question: store.lexical_search(question, k=10),
+            'hybrid': lambda question: store.hybrid_search(question, vector_of[question], k=10,
+                                                           lexical_weight=args.lexical_weight),
+            'vector': lambda question: store.search(vector_of[question], k=10),
+        }
+        for name, function in modes.items():
+            results, latencies = timed(function, questions)
+            hits = sum(bool(found) and found[0]['row_id'] == target for found, target in zip(results, targets))
+            report.append({
+                'name': name,
+                'hit_at_1': round(hits / args.queries, 4),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            })
+        store.close()
+
+    for row in report:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench_local_store.py
+# Open time and query latency of LocalVectorStore, checked against an in-memory brute-force scan.
+#
+#   python benchmarks/bench_local_store.py --vectors 200000 --dimensions 768
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_vector_store import LocalVectorStore, normalize_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local memory-mapped vector store")
+    parser.add_argument('--vectors', type=int, default=200000)
+    parser.add_argument('--dimensions', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--block-rows', type=int, default=65536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, dimensions=args.dimensions)
+        start = time.perf_counter()
+        for first in range(0, args.vectors, 50000):
+            count = min(50000, args.vectors - first)
+            vectors = rng.standard_normal((count, args.dimensions), dtype=np.float32)
+            store.add(vectors, [f"chunk {first + i}" for i in range(count)])
+        build_seconds = time.perf_counter() - start
+        store.close()
+
+        start = time.perf_counter()
+        store = LocalVectorStore(directory)
+        store.matrix()
+        open_ms = (time.perf_counter() - start) * 1000
+
+        queries = rng.standard_normal((args.queries, args.dimensions), dtype=np.float32)
+        reference = np.asarray(store.matrix())
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            results = store.search(query, k=args.k, block_rows=args.block_rows)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            expected = np.argsort(-(reference @ normalize_rows(query)[0]))[:args.k]
+            assert [row["row_id"] for row in results] == expected.tolist(), "blocked search disagrees with brute force"
+
+        store.close()
+
+    print({
+        'vectors': args.vectors,
+        'dimensions': args.dimensions,
+        'build_seconds': round(build_seconds, 2),
+        'open_ms': round(open_ms, 2),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'query_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# bench_quantized_search.py
+# Recall@k and latency of int8 and binary quantized search with exact rescoring, per oversample factor,
+# against exact float32 search on the same LocalVectorStore.
+#
+#   python benchmarks/bench_quantized_search.py --vectors 200000 --dimensions 768 --oversample 1 2 4 8 16
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_vector_store import LocalVectorStore
+from quantized_index import recall_report
+
+
+def clustered_vectors(rng, count, dimensions, clusters=256, spread=0.6):
+    """Vectors grouped around random centers, closer to real embeddings than isotropic noise"""
+    centers = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    assignments = rng.integers(0, clusters, count)
+    return centers[assignments] + spread * rng.standard_normal((count, dimensions), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized search recall and latency")
+    parser.add_argument('--vectors', type=int, default=200000)
+    parser.add_argument('--dimensions', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--oversample', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, dimensions=args.dimensions)
+        for first in range(0, args.vectors, 50000):
+            count = min(50000, args.vectors - first)
+            store.add(clustered_vectors(np.random.default_rng(first), count, args.dimensions),
+                      [f"chunk {first + i}" for i in range(count)])
+
+        # Queries are perturbed copies of stored vectors, like questions close to a passage
+        rows = rng.integers(0, args.vectors, args.queries)
+        queries = np.asarray(store.matrix()[rows]) + 0.05 * rng.standard_normal(
+            (args.queries, args.dimensions), dtype=np.float32)
+
+        # The quantized copies are built by the first quantized search; keep that out of the latencies
+        store.quantized_index()
+        report = recall_report(store, queries, k=args.k, oversample_factors=args.oversample)
+        store.close()
+
+    for row in report:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench_query_cache.py
+# Question latency with and without the query cache on a skewed (Zipf) stream of repeated questions.
+#
+#   python benchmarks/bench_query_cache.py --chunks 200000 --questions 2000 --embed-latency-ms 30
+#
+# Each distinct question has a few paraphrases ("What is X?", "what is x", "Tell me what X is")
+# whose embeddings are near-duplicates of each other. The embedding call is simulated with a sleep
+# of embed-latency-ms (the model or API round trip) and search is an exact scan of a
+# LocalVectorStore. Modes: no cache, exact cache, and exact + semantic cache; half-way through,
+# one document is re-ingested to show the invalidation cost. Reports p50/p99 latency, embedding
+# calls and hit counts.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_vector_store import LocalVectorStore
+from query_cache import QueryCache
+
+PARAPHRASES = ("What is {}?", "what is {}", "Tell me what {} is")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query cache")
+    parser.add_argument('--chunks', type=int, default=200000)
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=300, help="Distinct questions")
+    parser.add_argument('--questions', type=int, default=2000, help="Questions asked")
+    parser.add_argument('--zipf', type=float, default=1.2)
+    parser.add_argument('--embed-latency-ms', type=float, default=30.0)
+    parser.add_argument('--semantic-threshold', type=float, default=0.95)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    topics = [f"method{i}" for i in range(args.distinct)]
+    base_vectors = rng.standard_normal((args.distinct, args.dimensions), dtype=np.float32)
+    paraphrase_vectors = {}
+    for i, topic in enumerate(topics):
+        for template in PARAPHRASES:
+            noise = 0.05 * rng.standard_normal(args.dimensions, dtype=np.float32)
+            paraphrase_vectors[template.format(topic)] = base_vectors[i] + noise
+    stream = [PARAPHRASES[rng.integers(len(PARAPHRASES))].format(topics[min(rank, args.distinct) - 1])
+              for rank in rng.zipf(args.zipf, args.questions)]
+
+    calls = 0
+
+    def embed(question):
+        nonlocal calls
+        calls += 1
+        time.sleep(args.embed_latency_ms / 1000)
+        return paraphrase_vectors[question]
+
+    report = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(os.path.join(directory, "store"), dimensions=args.dimensions)
+        document_ids = [f"doc{i % args.documents}" for i in range(args.chunks)]
+        for first in range(0, args.chunks, 50000):
+            count = min(50000, args.chunks - first)
+            store.add(rng.standard_normal((count, args.dimensions), dtype=np.float32),
+                      [f"chunk {first + i}" for i in range(count)], document_ids=document_ids[first:first + count])
+
+        def search(vector):
+            return [{"document_id": row["document_id"], "text": row["text"], "score": row["score"]}
+                    for row in store.search(vector, k=args.k)]
+
+        for mode in ('none', 'exact', 'semantic'):
+            cache = None
+            if mode != 'none':
+                cache = QueryCache(os.path.join(directory, f"{mode}.sqlite"),
+                                   semantic_threshold=args.semantic_threshold if mode == 'semantic' else None)
+            calls = 0
+            latencies = []
+            for i, question in enumerate(stream):
+                if cache is not None and i == len(stream) // 2:
+                    cache.invalidate(["doc0"])
+                start = time.perf_counter()
+                if cache is None:
+                    search(embed(question))
+                else:
+                    cache.search("", f"vector k={args.k}", question, search,
+                                 lambda text: cache.embedding("bench", text, embed))
+                latencies.append((time.perf_counter() - start) * 1000)
+            row = {
+                'mode': mode,
+                'questions': len(stream),
+                'embedding_calls': calls,
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+                'mean_ms': round(float(np.mean(latencies)), 3),
+            }
+            if cache is not None:
+                row.update(cache.stats())
+                cache.close()
+            report.append(row)
+        store.close()
+
+    for row in report:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
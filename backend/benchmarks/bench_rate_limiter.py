@@ -0,0 +1,129 @@
+# bench_rate_limiter.py
+# Goodput and lost work under contention, with and without the adaptive rate limiter.
+#
+#   python benchmarks/bench_rate_limiter.py --requests 400 --capacity 8 --concurrency 32
+#
+# embeddings: an in-process endpoint that serves `capacity` requests at a time and answers the
+#     rest with a throttling error after a short delay (like a 429). Compared: a fixed pool of
+#     `concurrency` workers sending each request once, the same pool retrying immediately,
+#     and RateLimiter (AIMD concurrency, jittered backoff) with the same maximum.
+# writes: execute_windowed against a LocalSession whose requests time out past `capacity` in
+#     flight, with and without a RateLimiter.
+# Reports completed and lost requests, attempts sent, wall time and goodput (completed/s).
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter
+from astra_writer import execute_windowed
+from local_cassandra import LocalSession
+
+
+class Throttled(Exception):
+    """The endpoint's "too many requests" answer"""
+
+
+class ThrottlingEndpoint:
+    """Serves at most capacity requests at once; the others are rejected after reject_ms"""
+
+    def __init__(self, capacity, latency_ms, reject_ms):
+        self.capacity = capacity
+        self.latency = latency_ms / 1000.0
+        self.reject = reject_ms / 1000.0
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.attempts = 0
+
+    def request(self):
+        with self.lock:
+            self.attempts += 1
+            admitted = self.in_flight < self.capacity
+            if admitted:
+                self.in_flight += 1
+        if not admitted:
+            time.sleep(self.reject)
+            raise Throttled()
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def run_embeddings(mode, args):
+    endpoint = ThrottlingEndpoint(args.capacity, args.latency_ms, args.reject_ms)
+    limiter = RateLimiter("embeddings", max_concurrency=args.concurrency, max_retries=args.max_retries,
+                          base_delay=args.latency_ms / 1000.0, max_delay=1.0)
+
+    def send(_):
+        if mode == 'limiter':
+            limiter.call(endpoint.request, retryable=(Throttled,))
+            return
+        for attempt in range(args.max_retries + 1 if mode == 'retry' else 1):
+            try:
+                return endpoint.request()
+            except Throttled:
+                if attempt == args.max_retries or mode == 'fixed':
+                    raise
+
+    completed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(send, i) for i in range(args.requests)]
+        for future in futures:
+            try:
+                future.result()
+                completed += 1
+            except Throttled:
+                pass
+    seconds = time.perf_counter() - start
+    return {
+        'target': 'embeddings', 'mode': mode, 'completed': completed, 'lost': args.requests - completed,
+        'attempts': endpoint.attempts, 'seconds': round(seconds, 3),
+        'goodput_per_s': round(completed / seconds, 1),
+        'final_limit': limiter.concurrency.limit if mode == 'limiter' else args.concurrency,
+    }
+
+
+def run_writes(mode, args):
+    session = LocalSession(latency_ms=args.latency_ms, capacity=args.capacity, max_workers=args.concurrency)
+    limiter = RateLimiter("astra_writes", max_concurrency=args.concurrency, max_retries=args.max_retries,
+                          base_delay=args.latency_ms / 1000.0, max_delay=1.0) if mode == 'limiter' else None
+    start = time.perf_counter()
+    stored, failures = execute_windowed(session, "INSERT", ((i,) for i in range(args.requests)),
+                                        args.concurrency, limiter)
+    seconds = time.perf_counter() - start
+    session.shutdown()
+    return {
+        'target': 'writes', 'mode': mode, 'completed': stored, 'lost': len(failures),
+        'attempts': stored + session.overloaded, 'seconds': round(seconds, 3),
+        'goodput_per_s': round(stored / seconds, 1),
+        'final_limit': limiter.concurrency.limit if limiter is not None else args.concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive rate limiting under contention")
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--capacity', type=int, default=8, help="Requests the service handles at once")
+    parser.add_argument('--concurrency', type=int, default=32, help="Requests the client sends at once")
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--reject-ms', type=float, default=2.0)
+    parser.add_argument('--max-retries', type=int, default=8)
+    args = parser.parse_args()
+
+    for mode in ('fixed', 'retry', 'limiter'):
+        print(json.dumps(run_embeddings(mode, args)))
+    for mode in ('fixed', 'limiter'):
+        print(json.dumps(run_writes(mode, args)))
+
+
+if __name__ == "__main__":
+    main()
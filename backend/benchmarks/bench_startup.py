@@ -0,0 +1,160 @@
+# bench_startup.py
+# Start-up cost of the backend scripts: module import time and first-request latency.
+#
+#   python benchmarks/bench_startup.py --repeat 5 --output startup.json
+#
+# Every measurement runs in a fresh interpreter, since import and model-load costs are only
+# paid once per process. first_request ingests a one-page synthetic PDF through a new pipeline
+# (stub embeddings server, local vector store) and then a second one, so the difference is the
+# lazy-loading cost of the first call. model_load compares building the sentence-transformers
+# model with and without the warm cache of embedding_generator.py; it is skipped when
+# sentence_transformers or torch is not installed.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+MODULES = ("mpl", "openai_embedder", "embedding_generator", "astraDBClient", "local_vector_store")
+HEAVY_MODULES = ("numpy", "openai", "PyPDF2", "langchain", "dotenv", "cassandra", "torch", "sentence_transformers")
+
+
+def run_child(*args):
+    """Run this script in a fresh interpreter and return the JSON it prints"""
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'] + [str(arg) for arg in args],
+                           cwd=BACKEND, capture_output=True, text=True, check=True)
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def child_import(module):
+    start = time.perf_counter()
+    __import__(module)
+    return {'seconds': time.perf_counter() - start,
+            'loaded': [name for name in HEAVY_MODULES if name in sys.modules]}
+
+
+def child_first_request(base_url, directory):
+    start = time.perf_counter()
+    from mpl import PDFProcessingPipeline
+    from local_vector_store import LocalVectorStore
+    imported = time.perf_counter()
+    pipeline = PDFProcessingPipeline(
+        openai_api_key="unused",
+        astra_db_secure_bundle_path=None,
+        astra_db_client_id=None,
+        astra_db_client_secret=None,
+        astra_keyspace=None,
+        openai_base_url=base_url,
+        vector_store=LocalVectorStore(os.path.join(directory, "store"))
+    )
+    constructed = time.perf_counter()
+    pipeline.ingest_pdf(os.path.join(directory, "first.pdf"))
+    first = time.perf_counter()
+    pipeline.ingest_pdf(os.path.join(directory, "second.pdf"))
+    second = time.perf_counter()
+    pipeline.close()
+    return {'import': imported - start, 'construct': constructed - imported,
+            'first_ingest': first - constructed, 'second_ingest': second - first}
+
+
+def child_model_load(warm_cache_dir):
+    start = time.perf_counter()
+    from embedding_generator import load_model
+    model = load_model(warm_cache_dir=warm_cache_dir or None)
+    loaded = time.perf_counter()
+    model.encode(["first request"])
+    return {'load': loaded - start, 'first_encode': time.perf_counter() - loaded}
+
+
+# Benchmark helpers import numpy, so only the parent process loads them; children start clean
+def bench_imports(repeat):
+    from bench_suite import latency_summary
+    results = []
+    for module in MODULES:
+        runs = [run_child('import', module) for _ in range(repeat)]
+        results.append(dict(latency_summary([run['seconds'] for run in runs]), scenario='import',
+                            name=module, loaded=runs[-1]['loaded']))
+
+    # Whole process: interpreter start, argument parsing and exit, without touching the model
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(BACKEND, "embedding_generator.py"), "--help"],
+                       cwd=BACKEND, capture_output=True, check=True)
+        seconds.append(time.perf_counter() - start)
+    results.append(dict(latency_summary(seconds), scenario='process', name='embedding_generator --help'))
+    return results
+
+
+def bench_first_request(repeat, embed_latency_ms):
+    from bench_suite import latency_summary
+    from stub_embeddings_server import start_stub_server
+    from synthetic_pdf import write_pdf
+    server = start_stub_server(latency_ms=embed_latency_ms)
+    runs = []
+    try:
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as directory:
+                write_pdf(os.path.join(directory, "first.pdf"), 1, seed=1)
+                write_pdf(os.path.join(directory, "second.pdf"), 1, seed=2)
+                runs.append(run_child('first_request', server.base_url, directory))
+    finally:
+        server.shutdown()
+    return [dict(latency_summary([run[phase] for run in runs]), scenario='first_request', name=phase)
+            for phase in ('import', 'construct', 'first_ingest', 'second_ingest')]
+
+
+def bench_model_load(repeat):
+    if not (importlib.util.find_spec("sentence_transformers") and importlib.util.find_spec("torch")):
+        return [{'scenario': 'model_load', 'skipped': "sentence_transformers or torch is not installed"}]
+
+    from bench_suite import latency_summary
+
+    results = []
+    with tempfile.TemporaryDirectory() as warm_cache_dir:
+        # The first warm-cache run writes the artifact; it is not part of the measurement
+        run_child('model_load', warm_cache_dir)
+        for name, directory in (('cold', ''), ('warm_cache', warm_cache_dir)):
+            runs = [run_child('model_load', directory) for _ in range(repeat)]
+            for phase in ('load', 'first_encode'):
+                results.append(dict(latency_summary([run[phase] for run in runs]),
+                                    scenario='model_load', name=f"{name}_{phase}"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and first-request latency benchmark")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--embed-latency-ms', type=float, default=20.0)
+    parser.add_argument('--output', default=None, help="Also write the JSON report here")
+    parser.add_argument('--child', nargs='+', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, *child_args = args.child
+        print(json.dumps(globals()[f"child_{kind}"](*child_args)))
+        return 0
+
+    report = {
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': (bench_imports(args.repeat) + bench_first_request(args.repeat, args.embed_latency_ms)
+                    + bench_model_load(args.repeat)),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
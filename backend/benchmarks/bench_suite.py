@@ -0,0 +1,321 @@
+# bench_suite.py
+# End-to-end offline benchmark of the ingestion and query paths, for comparing commits.
+#
+#   python benchmarks/bench_suite.py --pages 10 100 --repeat 5 --output bench.json
+#   python benchmarks/bench_suite.py --compare bench.json --tolerance 0.15
+#
+# The real extraction, splitting, embedding and storage code runs against local stand-ins:
+# synthetic PDFs, the stub embeddings server (with injectable latency), the in-process Cassandra
+# session and the local vector store. Each scenario runs in its own process so its peak RSS is
+# reported separately. The report is JSON; --compare exits non-zero when a median regresses.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from stub_embeddings_server import start_stub_server, stub_vector
+from local_cassandra import LocalSession
+from synthetic_pdf import write_pdf
+
+SCENARIOS = ("stages", "end_to_end", "query", "scripts")
+
+
+def latency_summary(seconds):
+    """p50/p99/mean in milliseconds over repeated samples"""
+    samples = np.asarray(seconds) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'mean_ms': round(float(samples.mean()), 3),
+    }
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_pipeline(config, store_dir, base_url, **options):
+    from mpl import PDFProcessingPipeline
+    from local_vector_store import LocalVectorStore
+    return PDFProcessingPipeline(
+        openai_api_key="unused",
+        astra_db_secure_bundle_path=None,
+        astra_db_client_id=None,
+        astra_db_client_secret=None,
+        astra_keyspace=None,
+        openai_base_url=base_url,
+        vector_store=LocalVectorStore(store_dir),
+        stream_batch_size=config['batch_size'],
+        **options
+    )
+
+
+def use_local_cassandra(pipeline, config):
+    """Point a pipeline's writes at the in-process Cassandra session instead of the local store"""
+    pipeline.vector_store = None
+    pipeline.session = LocalSession(latency_ms=config['write_latency_ms'])
+    return pipeline
+
+
+def run_stages(config, directory, server):
+    """Each pipeline stage timed on its own, per document size"""
+    results = []
+    for pages in config['pages']:
+        pdf_path = os.path.join(directory, f"stages-{pages}.pdf")
+        write_pdf(pdf_path, pages)
+        timings = {stage: [] for stage in ('extract', 'split', 'embed', 'store_local', 'store_cassandra')}
+        counts = {}
+        for repeat in range(config['repeat']):
+            pipeline = make_pipeline(config, os.path.join(directory, f"stages-{pages}-{repeat}"), server.base_url)
+
+            start = time.perf_counter()
+            text = "".join(pipeline.extract_pages(pdf_path))
+            timings['extract'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            chunks = pipeline.split_text(text)
+            timings['split'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            embeddings = pipeline.truncate_embeddings(pipeline.generate_embeddings(chunks))
+            timings['embed'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            pipeline.store_in_astra_db(embeddings)
+            timings['store_local'].append(time.perf_counter() - start)
+
+            use_local_cassandra(pipeline, config)
+            start = time.perf_counter()
+            pipeline.store_in_astra_db(embeddings)
+            timings['store_cassandra'].append(time.perf_counter() - start)
+
+            pipeline.session.shutdown()
+            pipeline.close()
+            counts = {'pages': pages, 'chunks': len(chunks)}
+
+        for stage, seconds in timings.items():
+            unit = 'pages' if stage == 'extract' else 'chunks'
+            summary = latency_summary(seconds)
+            results.append(dict(summary, scenario='stages', name=stage, pages=pages,
+                                items=counts[unit], unit=unit,
+                                per_second=round(counts[unit] / (summary['p50_ms'] / 1000), 1)))
+    return results
+
+
+def run_end_to_end(config, directory, server):
+    """Whole-document ingestion through each of the pipeline's entry points"""
+    results = []
+    for pages in config['pages']:
+        pdf_path = os.path.join(directory, f"e2e-{pages}.pdf")
+        write_pdf(pdf_path, pages)
+        for mode in ('ingest_pdf', 'ingest_pdf_streaming', 'ingest_pdf_async'):
+            seconds = []
+            for repeat in range(config['repeat']):
+                pipeline = use_local_cassandra(
+                    make_pipeline(config, os.path.join(directory, f"e2e-{pages}-{mode}-{repeat}"),
+                                  server.base_url), config)
+                start = time.perf_counter()
+                result = getattr(pipeline, mode)(pdf_path)
+                if asyncio.iscoroutine(result):
+                    result = asyncio.run(result)
+                seconds.append(time.perf_counter() - start)
+                pipeline.session.shutdown()
+                pipeline.close()
+                if result['failures']:
+                    raise RuntimeError(f"{mode} failed to store {len(result['failures'])} chunks")
+            summary = latency_summary(seconds)
+            results.append(dict(summary, scenario='end_to_end', name=mode, pages=pages,
+                                chunks=result['chunks'],
+                                pages_per_second=round(pages / (summary['p50_ms'] / 1000), 1)))
+    return results
+
+
+def run_query(config, directory, server):
+    """Top-k search over a local store holding query_vectors chunks"""
+    from local_vector_store import LocalVectorStore
+    store = LocalVectorStore(os.path.join(directory, "query-store"), dimensions=config['dimensions'])
+    rng = np.random.default_rng(0)
+    for first in range(0, config['query_vectors'], 50000):
+        count = min(50000, config['query_vectors'] - first)
+        store.add(rng.standard_normal((count, config['dimensions']), dtype=np.float32),
+                  [f"chunk {first + i}" for i in range(count)])
+    queries = [stub_vector(f"question {i}", config['dimensions']) for i in range(config['queries'])]
+
+    results = []
+    for quantization in (None, 'int8', 'binary'):
+        store.search(queries[0], k=10, quantization=quantization)
+        seconds = []
+        for query in queries:
+            start = time.perf_counter()
+            store.search(query, k=10, quantization=quantization)
+            seconds.append(time.perf_counter() - start)
+        results.append(dict(latency_summary(seconds), scenario='query', name=quantization or 'float32',
+                            vectors=config['query_vectors'], dimensions=config['dimensions']))
+    store.close()
+    return results
+
+
+def run_scripts(config, directory, server):
+    """Process start-up plus one call of the command-line scripts Node shells out to"""
+    text_path = os.path.join(directory, "upload.txt")
+    pdf_path = os.path.join(directory, "upload.pdf")
+    write_pdf(pdf_path, 1)
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write("synthetic upload text")
+    embedding = json.dumps(stub_vector("upload", config['dimensions']).tolist())
+
+    # Binary transport: one float32 row per chunk in a file, metadata on stdin
+    from vector_io import write_vectors
+    chunk_count = config['script_chunks']
+    vectors_path = os.path.join(directory, "chunks.f32")
+    write_vectors(vectors_path, [stub_vector(f"chunk {i}", config['dimensions']) for i in range(chunk_count)])
+    chunk_metadata = json.dumps({
+        'pdf_path': pdf_path, 'pdf_name': "upload.pdf", 'text_path': text_path,
+        'dimensions': config['dimensions'], 'chunks': [{'start': 0, 'end': 9, 'page': 1}] * chunk_count,
+    })
+    record_metadata = json.dumps({
+        'dimensions': config['dimensions'],
+        'records': [{'document_id': f"doc-{i}", 'text': f"chunk {i}"} for i in range(chunk_count)],
+    })
+
+    commands = {
+        'pdf_processor': ([sys.executable, os.path.join(BACKEND, "pdf_processor.py"),
+                           pdf_path, "upload.pdf", text_path, embedding], None),
+        'astraDBClient_store': ([sys.executable, os.path.join(BACKEND, "astraDBClient.py"),
+                                 "store", "doc-1", "synthetic upload text", embedding], None),
+        'pdf_processor_binary': ([sys.executable, os.path.join(BACKEND, "pdf_processor.py"),
+                                  "--vectors", vectors_path], chunk_metadata),
+        'astraDBClient_store_batch': ([sys.executable, os.path.join(BACKEND, "astraDBClient.py"),
+                                       "store-batch", "--vectors", vectors_path], record_metadata),
+    }
+    results = []
+    for name, (command, stdin) in commands.items():
+        seconds = []
+        for repeat in range(config['repeat']):
+            # A fresh store each run, so duplicate checks never short-circuit the write
+            env = dict(os.environ, LOCAL_VECTOR_STORE_PATH=os.path.join(directory, f"script-store-{name}-{repeat}"))
+            start = time.perf_counter()
+            subprocess.run(command, env=env, cwd=BACKEND, check=True, capture_output=True,
+                           input=stdin, text=True)
+            seconds.append(time.perf_counter() - start)
+        # The script runs in its own process; report the largest one so far
+        results.append(dict(latency_summary(seconds), scenario='scripts', name=name,
+                            chunks=chunk_count if stdin else 1,
+                            child_peak_rss_mb=peak_rss_mb(resource.RUSAGE_CHILDREN)))
+    return results
+
+
+def run_scenario(name, config):
+    """Run one scenario in this process with its own stub server"""
+    server = start_stub_server(latency_ms=config['embed_latency_ms'])
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            results = globals()[f"run_{name}"](config, directory, server)
+    finally:
+        server.shutdown()
+    for result in results:
+        result['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return tuple(str(result.get(field)) for field in ('scenario', 'name', 'pages', 'vectors'))
+
+
+def compare(report, baseline, tolerance):
+    """Results whose p50 is more than `tolerance` slower than the baseline's"""
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        before = previous.get(result_key(result))
+        if before and result['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append({
+                'scenario': result['scenario'], 'name': result['name'],
+                'pages': result.get('pages'), 'baseline_p50_ms': before['p50_ms'],
+                'p50_ms': result['p50_ms'], 'change': round(result['p50_ms'] / before['p50_ms'] - 1, 3),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for ingestion and queries")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=256, help="Streaming batch size")
+    parser.add_argument('--embed-latency-ms', type=float, default=20.0)
+    parser.add_argument('--write-latency-ms', type=float, default=2.0)
+    parser.add_argument('--query-vectors', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--dimensions', type=int, default=768)
+    parser.add_argument('--script-chunks', type=int, default=200,
+                        help="Chunks per call in the binary-transport script runs")
+    parser.add_argument('--output', default=None, help="Also write the JSON report here")
+    parser.add_argument('--compare', default=None, help="Baseline report to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative p50 slowdown against the baseline")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    config = {
+        'pages': args.pages, 'repeat': args.repeat, 'batch_size': args.batch_size,
+        'embed_latency_ms': args.embed_latency_ms, 'write_latency_ms': args.write_latency_ms,
+        'query_vectors': args.query_vectors, 'queries': args.queries, 'dimensions': args.dimensions,
+        'script_chunks': args.script_chunks,
+    }
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, config)))
+        return 0
+
+    results = []
+    for scenario in args.scenarios:
+        # A fresh interpreter per scenario keeps peak RSS attributable to that scenario
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', scenario]
+                               + sys.argv[1:], capture_output=True, text=True, check=True)
+        results.extend(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': config,
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
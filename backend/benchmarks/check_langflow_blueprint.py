@@ -0,0 +1,151 @@
+# check_langflow_blueprint.py
+# Runs the code of every PythonFunction node in an exported Langflow blueprint against local
+# stand-ins: a synthetic PDF, the stub embeddings server and the in-process Cassandra session.
+#
+#   python benchmarks/check_langflow_blueprint.py --pages 20 --batch-size 16 --concurrency 8
+#
+# The RecursiveCharacterTextSplitter node is a Langflow built-in, so the pipeline's own chunker
+# stands in for it. Checks that the nodes agree with the pipeline (extracted text, vectors in
+# input order, truncation), that embedding is batched, and that the store node reuses one
+# connection and prepared statement across runs while keeping inserts concurrent. Exits
+# non-zero on the first failed check.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpl import PDFProcessingPipeline
+from local_vector_store import LocalVectorStore
+from local_cassandra import LocalSession
+from stub_embeddings_server import start_stub_server, stub_vector
+from synthetic_pdf import write_pdf
+
+
+class LocalCluster:
+    """Stand-in for cassandra.cluster.Cluster handing out one LocalSession"""
+
+    created = []
+
+    def __init__(self, cloud=None, auth_provider=None):
+        self.session = LocalSession(latency_ms=LocalCluster.latency_ms)
+        self.shutdowns = 0
+        LocalCluster.created.append(self)
+
+    def connect(self):
+        return self.session
+
+    def shutdown(self):
+        self.shutdowns += 1
+        self.session.shutdown()
+
+
+def node_function(blueprint, node_id, overrides=None):
+    """Exec a PythonFunction node's code and return its entry point"""
+    node = next(node for node in blueprint['data']['nodes'] if node['id'] == node_id)
+    template = node['data']['node']['template']
+    namespace = {}
+    exec(compile(template['code']['value'], f"<{node_id}>", "exec"), namespace)
+    namespace.update(overrides or {})
+    return namespace[template['function_name']['value']], template
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAILED: {message}")
+        sys.exit(1)
+    print(f"ok: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an exported Langflow blueprint's node code locally")
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--write-latency-ms', type=float, default=5.0)
+    args = parser.parse_args()
+    LocalCluster.latency_ms = args.write_latency_ms
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, "synthetic.pdf")
+        write_pdf(pdf_path, args.pages)
+        pipeline = PDFProcessingPipeline(
+            openai_api_key="unused",
+            astra_db_secure_bundle_path="bundle.zip",
+            astra_db_client_id="client",
+            astra_db_client_secret="secret",
+            astra_keyspace="keyspace",
+            vector_store=LocalVectorStore(os.path.join(directory, "store"))
+        )
+        blueprint_path = pipeline.export_langflow_blueprint(
+            os.path.join(directory, "flow.json"), batch_size=args.batch_size,
+            write_concurrency=args.concurrency
+        )
+        with open(blueprint_path) as f:
+            blueprint = json.load(f)
+
+        node_ids = {node['id'] for node in blueprint['data']['nodes']}
+        check(all(edge['source'] in node_ids and edge['target'] in node_ids
+                  for edge in blueprint['data']['edges']), "every edge connects existing nodes")
+
+        extract_text, _ = node_function(blueprint, "pdf_text_extractor")
+        text = extract_text(pdf_path)
+        check(text == pipeline.extract_text_from_pdf(pdf_path), "extracted text matches the pipeline")
+        texts = pipeline.split_text(text)
+
+        server = start_stub_server(latency_ms=2.0)
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "unused")
+        try:
+            embed_texts, template = node_function(blueprint, "openai_embeddings")
+            check(template['batch_size']['value'] == args.batch_size, "batch size is exported as a node field")
+            vectors = embed_texts(texts)
+            expected_requests = -(-len(texts) // args.batch_size)
+            check(server.stats.requests == expected_requests,
+                  f"{len(texts)} chunks embedded in {server.stats.requests} requests")
+            check(np.allclose(vectors, np.stack([stub_vector(text) for text in texts]), atol=1e-6),
+                  "vectors come back in input order")
+        finally:
+            server.shutdown()
+
+        truncate_embedding, _ = node_function(blueprint, "truncate_embeddings")
+        truncated = truncate_embedding(vectors)
+        reference = vectors[:, :pipeline.max_dimensions]
+        reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+        check(truncated.shape == (len(texts), pipeline.max_dimensions) and np.allclose(truncated, reference),
+              "batch truncated and re-normalized like the pipeline")
+        check(np.allclose(truncate_embedding(vectors[0].tolist()), reference[0]), "single list embedding truncated")
+
+        store_in_astra, template = node_function(blueprint, "astra_db_store", {'Cluster': LocalCluster})
+        check(template['concurrency']['value'] == args.concurrency, "write concurrency is exported as a node field")
+        start = time.perf_counter()
+        first = store_in_astra(truncated, texts)
+        seconds = time.perf_counter() - start
+        second = store_in_astra(truncated, texts)
+        session = LocalCluster.created[0].session
+        check(len(LocalCluster.created) == 1 and session.prepared == 1,
+              "one connection and prepared statement for two runs")
+        check(len(session.executed) == 2 * len(texts) and first == second ==
+              f"Successfully stored {len(texts)} embeddings in AstraDB", first)
+        # Inserts run concurrently, so rows are matched by their text rather than completion order
+        rows = session.executed[:len(texts)]
+        check(all("?" in query and parameters[0] == 1 and parameters[1] == parameters[3] and
+                  len(parameters[2]) == pipeline.max_dimensions for query, parameters in rows) and
+              sorted(parameters[4] for _, parameters in rows) == sorted(texts) and
+              len({parameters[1] for _, parameters in rows}) == len(texts),
+              "rows bound to the prepared INSERT")
+        bound = next(parameters for _, parameters in rows if parameters[4] == texts[0])
+        check(np.allclose(bound[2], truncated[0], atol=1e-6), "each row carries its own chunk's vector")
+        serial_seconds = len(texts) * args.write_latency_ms / 1000
+        check(seconds < serial_seconds / 2,
+              f"{len(texts)} inserts took {seconds:.3f}s (one at a time: {serial_seconds:.3f}s)")
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# local_cassandra.py
+# In-process stand-in for a cassandra-driver Session, for benchmarks without a cluster.
+#
+# It accepts the calls the pipeline makes (prepare, execute, execute_async, set_keyspace,
+# shutdown), simulates a per-request round trip, can inject failures, and records every
+# statement and its parameters in `executed`. With capacity, requests beyond that many in
+# flight time out like an overloaded cluster (cassandra.OperationTimedOut).
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LocalWriteFailure(Exception):
+    """Injected failure, standing in for a write timeout"""
+
+
+class LocalPreparedStatement:
+    def __init__(self, query_string):
+        self.query_string = query_string
+
+
+class LocalSession:
+    def __init__(self, latency_ms=2.0, failure_rate=0.0, max_workers=256, seed=0, capacity=None):
+        self.latency = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.capacity = capacity
+        self.in_flight = 0
+        self.overloaded = 0
+        self.keyspace = None
+        self.executed = []
+        self.prepared = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-cassandra")
+
+    def set_keyspace(self, keyspace):
+        self.keyspace = keyspace
+
+    def prepare(self, query):
+        with self._lock:
+            self.prepared += 1
+        return LocalPreparedStatement(query)
+
+    def execute(self, query, parameters=None, timeout=None):
+        with self._lock:
+            self.in_flight += 1
+            overloaded = self.capacity is not None and self.in_flight > self.capacity
+        try:
+            # Simulated network round trip
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if overloaded:
+            from cassandra import OperationTimedOut
+            with self._lock:
+                self.overloaded += 1
+            raise OperationTimedOut(errors="simulated overload")
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            if not failed:
+                self.executed.append((getattr(query, 'query_string', query), parameters))
+        if failed:
+            raise LocalWriteFailure("simulated write timeout")
+        return []
+
+    def execute_async(self, query, parameters=None, timeout=None):
+        return self._executor.submit(self.execute, query, parameters, timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
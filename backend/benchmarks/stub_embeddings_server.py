@@ -0,0 +1,137 @@
+# stub_embeddings_server.py
+# Local stand-in for the OpenAI embeddings endpoint, for benchmarks without the real API.
+#
+#   python benchmarks/stub_embeddings_server.py --port 8089 --latency-ms 50
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python mpl.py
+#
+# Vectors are deterministic per input text, so callers can check result ordering.
+
+import json
+import time
+import base64
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+DEFAULT_DIMENSIONS = 1536
+
+
+def stub_vector(text, dimensions=DEFAULT_DIMENSIONS):
+    """The unit vector the stub returns for a given text"""
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class StubStats:
+    """Request counters, including the peak number of requests handled at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inputs = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self, inputs):
+        with self.lock:
+            self.requests += 1
+            self.inputs += inputs
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class StubEmbeddingsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, per_input_ms=0.0, dimensions=DEFAULT_DIMENSIONS):
+        super().__init__(address, StubEmbeddingsHandler)
+        self.latency = latency_ms / 1000.0
+        self.per_input = per_input_ms / 1000.0
+        self.dimensions = dimensions
+        self.stats = StubStats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class StubEmbeddingsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/embeddings'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length))
+        inputs = body['input']
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = body.get('dimensions') or self.server.dimensions
+        as_base64 = body.get('encoding_format') == 'base64'
+
+        stats = self.server.stats
+        stats.enter(len(inputs))
+        try:
+            # Simulated network + model time
+            time.sleep(self.server.latency + self.server.per_input * len(inputs))
+
+            data = []
+            for index, text in enumerate(inputs):
+                vector = stub_vector(text, dimensions)
+                embedding = base64.b64encode(vector.tobytes()).decode('ascii') if as_base64 else vector.tolist()
+                data.append({"object": "embedding", "index": index, "embedding": embedding})
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            payload = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": body.get('model'),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+            }).encode('utf-8')
+        finally:
+            stats.exit()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0, **kwargs):
+    """Start a stub server on a background thread and return it"""
+    server = StubEmbeddingsServer((host, port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI embeddings server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Fixed delay per request")
+    parser.add_argument('--per-input-ms', type=float, default=0.0, help="Extra delay per input text")
+    parser.add_argument('--dimensions', type=int, default=DEFAULT_DIMENSIONS)
+    args = parser.parse_args()
+
+    server = StubEmbeddingsServer((args.host, args.port), latency_ms=args.latency_ms,
+                                  per_input_ms=args.per_input_ms, dimensions=args.dimensions)
+    print(f"Stub embeddings server listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# synthetic_pdf.py
+# Writes text-only PDFs of any page count without third-party PDF libraries.
+#
+#   python benchmarks/synthetic_pdf.py out.pdf --pages 500
+
+import random
+import argparse
+
+VOCABULARY = (
+    "model data training results method evaluation dataset baseline accuracy transformer "
+    "attention embedding retrieval corpus citation experiment analysis network layer loss "
+    "gradient optimization benchmark performance latency throughput memory index query "
+    "document paper section figure table appendix proposed approach significant improvement"
+).split()
+
+LINES_PER_PAGE = 50
+CHARS_PER_LINE = 90
+
+
+def page_lines(rng, page_number):
+    lines = [f"Page {page_number + 1}"]
+    while len(lines) < LINES_PER_PAGE:
+        line = []
+        length = 0
+        while length < CHARS_PER_LINE:
+            word = rng.choice(VOCABULARY)
+            line.append(word)
+            length += len(word) + 1
+        lines.append(" ".join(line))
+    return lines
+
+
+def page_texts(pages, seed=0):
+    """The text of each generated page, lines joined by newlines"""
+    rng = random.Random(seed)
+    return ["\n".join(page_lines(rng, i)) for i in range(pages)]
+
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, seed=0):
+    """Write a PDF with `pages` pages of generated text and return the page texts"""
+    texts = page_texts(pages, seed)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in texts:
+        operators = " ".join(f"({escape(line)}) Tj T*" for line in text.split("\n"))
+        content = f"BT /F1 10 Tf 12 TL 40 800 Td {operators} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Contents %d 0 R /Resources << /Font << /F1 3 0 R >> >> >>" % content_id)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic text PDF")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_pdf(args.output, args.pages, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# chunk_batch.py
+# Columnar batch of embedded chunks: the texts and ids as small slotted records, and every vector
+# in one contiguous float32 matrix (4 bytes per dimension instead of a boxed Python float each).
+#
+# Batches can be truncated and re-normalized in place, and optionally held as int8 codes with a
+# per-row scale (symmetric scalar quantization), a quarter of the float32 size.
+
+import numpy as np
+
+
+def quantize_int8(vectors):
+    """Symmetric per-row int8 quantization: returns (codes, scales) with vectors ~= codes * scales"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[1]:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+    else:
+        scales = np.ones(len(vectors), dtype=np.float32)
+    codes = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class ChunkRecord:
+    """
+    Metadata of one embedded chunk; index is its position in the list that was embedded,
+    start/end/page its location in the document when the chunk came from a TextChunk
+    """
+
+    __slots__ = ('text', 'index', 'id', 'document_id', 'start', 'end', 'page')
+
+    def __init__(self, text, index, id=None, document_id=None, start=None, end=None, page=None):
+        self.text = text
+        self.index = index
+        self.id = id
+        self.document_id = document_id
+        self.start = start
+        self.end = end
+        self.page = page
+
+    @classmethod
+    def from_chunk(cls, chunk, index):
+        """Record of a chunk text or TextChunk at position index"""
+        if isinstance(chunk, str):
+            return cls(chunk, index)
+        # A ChunkRecord being embedded again keeps its row and document ids
+        return cls(chunk.text, index, id=getattr(chunk, 'id', None), document_id=getattr(chunk, 'document_id', None),
+                   start=chunk.start, end=chunk.end, page=chunk.page)
+
+    def location(self):
+        """{'start', 'end', 'page'} of the chunk in its document, or None if unknown"""
+        if self.start is None:
+            return None
+        return {'start': self.start, 'end': self.end, 'page': self.page}
+
+
+class ChunkBatch:
+    """Records plus one (len, dimensions) vector matrix, float32 or int8-quantized"""
+
+    __slots__ = ('records', 'vectors', 'codes', 'scales')
+
+    def __init__(self, records, vectors):
+        self.records = records
+        self.vectors = vectors
+        self.codes = None
+        self.scales = None
+
+    @classmethod
+    def from_vectors(cls, chunks, vectors):
+        """Pair chunk texts (or TextChunks) with their vectors, dropping entries whose vector is None"""
+        records = []
+        rows = []
+        for index, (chunk, vector) in enumerate(zip(chunks, vectors)):
+            if vector is None:
+                continue
+            records.append(ChunkRecord.from_chunk(chunk, index))
+            rows.append(vector)
+        if not rows:
+            return cls(records, np.empty((0, 0), dtype=np.float32))
+        matrix = np.empty((len(rows), len(rows[0])), dtype=np.float32)
+        for i, vector in enumerate(rows):
+            matrix[i] = vector
+        return cls(records, matrix)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def texts(self):
+        return [record.text for record in self.records]
+
+    @property
+    def dimensions(self):
+        matrix = self.codes if self.codes is not None else self.vectors
+        return matrix.shape[1]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the vector representation"""
+        if self.codes is not None:
+            return self.codes.nbytes + self.scales.nbytes
+        return self.vectors.nbytes
+
+    def truncate(self, dimensions, renormalize=True):
+        """
+        Keep the first `dimensions` components of every vector and rescale rows back to unit
+        length (text-embedding-3 vectors stay meaningful when shortened this way)
+        """
+        if self.codes is not None:
+            raise ValueError("Truncate before quantizing")
+        if self.vectors.shape[1] > dimensions:
+            # A compacted copy: rewriting the buffer in place would change or free memory that
+            # views handed out earlier (slices, from_vectors callers) still point at
+            self.vectors = np.ascontiguousarray(self.vectors[:, :dimensions])
+        if renormalize and len(self.vectors):
+            norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.vectors /= norms
+        return self
+
+    def quantize(self):
+        """Replace the float32 matrix with int8 codes and a float32 scale per row"""
+        if self.codes is None:
+            self.codes, self.scales = quantize_int8(self.vectors)
+            self.vectors = None
+        return self
+
+    def float_vectors(self):
+        """The float32 matrix, dequantizing int8 codes if the batch is quantized"""
+        if self.codes is not None:
+            return self.codes.astype(np.float32) * self.scales[:, np.newaxis]
+        return self.vectors
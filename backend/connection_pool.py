@@ -0,0 +1,124 @@
+# connection_pool.py
+# Process-wide cache of Cassandra sessions, prepared statements, local stores, query caches
+# and pipelines.
+#
+# Connecting to AstraDB (secure bundle, TLS handshake, topology discovery) and introspecting
+# system_schema cost far more than ingesting a small PDF. Everything here is created lazily
+# on first use per set of connection parameters, shared by every caller and thread after that,
+# and shut down once at interpreter exit (or explicitly with shutdown()).
+
+import atexit
+import hashlib
+import threading
+
+_lock = threading.RLock()
+_clusters = {}
+_sessions = {}
+_prepared = {}
+_verified = set()
+_local_stores = {}
+_query_caches = {}
+_pipelines = {}
+
+
+def session_key(secure_bundle_path, client_id, client_secret, keyspace):
+    """Cache key for a set of connection parameters; the secret is only kept as a digest"""
+    secret = hashlib.sha256((client_secret or "").encode("utf-8")).hexdigest()
+    return (secure_bundle_path, client_id, secret, keyspace)
+
+
+def get_session(secure_bundle_path, client_id=None, client_secret=None, keyspace=None):
+    """Return the shared session for these parameters, connecting on first use"""
+    key = session_key(secure_bundle_path, client_id, client_secret, keyspace)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            from cassandra.cluster import Cluster
+            from cassandra.auth import PlainTextAuthProvider
+
+            auth_provider = PlainTextAuthProvider(client_id, client_secret) if client_id else None
+            cluster = Cluster(cloud={'secure_connect_bundle': secure_bundle_path}, auth_provider=auth_provider)
+            session = cluster.connect()
+            if keyspace:
+                session.set_keyspace(keyspace)
+            _clusters[key] = cluster
+            _sessions[key] = session
+        return session
+
+
+def prepare(session, query):
+    """Prepare a statement once per session; prepared statements are safe to share"""
+    key = (id(session), query)
+    with _lock:
+        statement = _prepared.get(key)
+        if statement is None:
+            statement = _prepared[key] = session.prepare(query)
+        return statement
+
+
+def verify_once(session, name, verify):
+    """Run verify() the first time `name` is checked on this session, e.g. a schema lookup"""
+    key = (id(session), name)
+    with _lock:
+        if key in _verified:
+            return
+        verify()
+        _verified.add(key)
+
+
+def local_store(directory):
+    """Shared LocalVectorStore for a directory"""
+    with _lock:
+        store = _local_stores.get(directory)
+        if store is None:
+            from local_vector_store import LocalVectorStore
+            store = _local_stores[directory] = LocalVectorStore(directory)
+        return store
+
+
+def query_cache(path):
+    """Shared QueryCache for a file, configured from the environment (see query_cache.py)"""
+    with _lock:
+        cache = _query_caches.get(path)
+        if cache is None:
+            from query_cache import cache_from_env
+            cache = _query_caches[path] = cache_from_env(path)
+        return cache
+
+
+def get_pipeline(key, factory):
+    """Shared object (a PDFProcessingPipeline) for key, built by factory() on first use"""
+    with _lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            pipeline = _pipelines[key] = factory()
+        return pipeline
+
+
+def shutdown():
+    """Close every cached pipeline, store and cluster"""
+    with _lock:
+        for pipeline in _pipelines.values():
+            try:
+                pipeline.close()
+            except Exception as e:
+                print(f"Error closing pipeline: {e}")
+        for store in _local_stores.values():
+            store.close()
+        for cache in _query_caches.values():
+            cache.close()
+        for cluster in _clusters.values():
+            try:
+                cluster.shutdown()
+            except Exception as e:
+                print(f"Error shutting down cluster: {e}")
+        _pipelines.clear()
+        _local_stores.clear()
+        _query_caches.clear()
+        _clusters.clear()
+        _sessions.clear()
+        _prepared.clear()
+        _verified.clear()
+
+
+atexit.register(shutdown)
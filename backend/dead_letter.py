@@ -0,0 +1,93 @@
+# dead_letter.py
+# Chunks that could not be embedded or stored, kept for replay instead of being dropped.
+#
+# One JSON object per line and chunk:
+#   {"stage": "embed" | "store", "error": "...", "time": 1700000000.0, "text": "...", "index": 3,
+#    "id": null, "document_id": null, "start": 812, "end": 1790, "page": 2,
+#    "vector": "<base64 float32, store entries only>"}
+#
+# Replaying (PDFProcessingPipeline.replay_dead_letters, `python mpl.py replay`) first moves the
+# file aside with take(), so chunks that fail again are appended to a fresh file by the normal
+# ingestion path while the taken ones are processed; the taken file is deleted once replay is
+# done, or picked up again by the next take() if replay was interrupted.
+
+import os
+import json
+import time
+import base64
+import threading
+
+REPLAY_SUFFIX = ".replaying"
+
+
+class DeadLetterFile:
+    """Append-only JSON-lines file of failed chunks"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, stage, records, error, vectors=None):
+        """
+        Append ChunkRecords (with their float32 vectors for the store stage); error is shared by
+        all of them or a list with one per record. Returns how many were written
+        """
+        now = time.time()
+        errors = error if isinstance(error, (list, tuple)) else [error] * len(records)
+        lines = []
+        for i, record in enumerate(records):
+            entry = {
+                'stage': stage, 'error': str(errors[i]), 'time': now,
+                'text': record.text, 'index': record.index, 'id': record.id,
+                'document_id': record.document_id,
+                'start': record.start, 'end': record.end, 'page': record.page,
+            }
+            if vectors is not None:
+                entry['vector'] = base64.b64encode(vectors[i].astype('<f4').tobytes()).decode('ascii')
+            lines.append(json.dumps(entry) + "\n")
+        if not lines:
+            return 0
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        return len(lines)
+
+    def take(self):
+        """Move the entries out of the file for replay; returns (entries, path holding them)"""
+        taken = self.path + REPLAY_SUFFIX
+        with self.lock:
+            if os.path.exists(self.path):
+                if os.path.exists(taken):
+                    # An interrupted replay left entries behind: keep both
+                    with open(self.path, 'r', encoding='utf-8') as new, open(taken, 'a', encoding='utf-8') as old:
+                        old.write(new.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, taken)
+        if not os.path.exists(taken):
+            return [], None
+        entries = []
+        with open(taken, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash mid-write
+                        continue
+        return entries, taken
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+
+
+def entry_vector(entry):
+    """The float32 vector stored with a store-stage entry"""
+    import numpy as np
+    return np.frombuffer(base64.b64decode(entry['vector']), dtype='<f4')
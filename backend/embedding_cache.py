@@ -0,0 +1,194 @@
+# embedding_cache.py
+# Content-addressed embedding cache shared by mpl.py (OpenAI) and embedding_generator.py (MiniLM).
+#
+# Entries are keyed by (model name, dimensions, hash of the normalized chunk text). An in-memory
+# LRU sits in front of a SQLite file holding float32 vectors; the file is trimmed back under
+# max_disk_bytes by evicting the least recently used rows.
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Under the user's cache directory rather than next to the sources
+DEFAULT_CACHE_PATH = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                  "pdf-embeddings", "embedding_cache.sqlite")
+
+
+def normalize_text(text):
+    """Normalize unicode and whitespace so trivially different copies share an entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model, dimensions, text):
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{dimensions or 0}\0".encode("utf-8"))
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + SQLite) embedding cache with hit/miss counters"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_entries=10000, max_disk_bytes=1 << 30):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.db.commit()
+        self.disk_bytes = self.db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model, dimensions, texts):
+        """Return a list aligned with texts holding cached float32 vectors or None"""
+        keys = [cache_key(model, dimensions, text) for text in texts]
+        results = [None] * len(texts)
+        with self.lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    results[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                import numpy as np
+                found = []
+                missing_keys = list(missing)
+                # Stay well under SQLite's bound-parameter limit
+                for start in range(0, len(missing_keys), 500):
+                    batch = missing_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in missing.pop(key):
+                            results[i] = vector
+                            self.disk_hits += 1
+                        found.append(key)
+                if found:
+                    now = time.time()
+                    self.db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                        [(now, key) for key in found])
+                    self.db.commit()
+                self.misses += sum(len(indexes) for indexes in missing.values())
+
+        return results
+
+    def put_many(self, model, dimensions, texts, vectors):
+        """Store vectors for texts; None entries are skipped"""
+        import numpy as np
+        rows = []
+        now = time.time()
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                if vector is None:
+                    continue
+                vector = np.asarray(vector, dtype=np.float32)
+                key = cache_key(model, dimensions, text)
+                self._remember(key, vector)
+                rows.append((key, model, dimensions or 0, vector.tobytes(), now))
+            if not rows:
+                return
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dimensions, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            # Rows already on disk are ignored; vectors in one call share a size
+            self.disk_bytes += (self.db.total_changes - before) * len(rows[0][3])
+            self.db.commit()
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows until the store is back under 90% of its budget"""
+        target = int(self.max_disk_bytes * 0.9)
+        while self.disk_bytes > target:
+            rows = self.db.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000").fetchall()
+            if not rows:
+                self.disk_bytes = 0
+                break
+            freed = []
+            for key, size in rows:
+                freed.append((key,))
+                self.disk_bytes -= size
+                self.memory.pop(key, None)
+                if self.disk_bytes <= target:
+                    break
+            self.db.executemany("DELETE FROM embeddings WHERE key = ?", freed)
+            self.evictions += len(freed)
+        self.db.commit()
+
+    def get_or_compute(self, model, dimensions, texts, compute):
+        """
+        Look texts up in the cache, call compute(missing_texts) for the rest and cache its output.
+        compute must return a list aligned with its input (None for failures).
+        """
+        texts = list(texts)
+        results = self.get_many(model, dimensions, texts)
+
+        # Compute each distinct missing text once, even if it repeats within the batch
+        missing = OrderedDict()
+        for i, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(cache_key(model, dimensions, texts[i]), []).append(i)
+        if missing:
+            unique_texts = [texts[indexes[0]] for indexes in missing.values()]
+            computed = compute(unique_texts)
+            for indexes, vector in zip(missing.values(), computed):
+                for i in indexes:
+                    results[i] = vector
+            self.put_many(model, dimensions, unique_texts, computed)
+        return results
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self.memory),
+                "disk_bytes": self.disk_bytes,
+            }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -1,20 +1,349 @@
 # embeddings_generator.py
+#
+# One-shot usage (prints a JSON list):
+#   python embedding_generator.py <text_file>
+#
+# Chunked one-shot usage (prints one JSON object per chunk as batches finish):
+#   python embedding_generator.py <text_file> --chunked [--batch-size 64]
+#
+# Persistent worker usage (model is loaded once, requests are batched):
+#   python embedding_generator.py --serve                  # stdin/stdout
+#   python embedding_generator.py --serve --port 8765      # local TCP socket
+#
+# Worker protocol: newline-delimited JSON, one request object per line.
+#   request:  {"id": 1, "text": "..."}  or  {"id": 1, "path": "/path/to/file.txt"}
+#   response: {"id": 1, "embedding": [...]}  or  {"id": 1, "error": "..."}
+#   chunked:  {"id": 1, "path": "...", "chunked": true}  ->  {"id": 1, "chunks": [...]}
+#
+# A chunk is {"start": int, "end": int, "page": int, "vector": base64 float32 (little-endian)}.
+# Offsets index into the original text; pages are counted from form feeds ("\f").
+#
+# sentence_transformers (and torch with it) and numpy are imported on first use, so argument
+# errors and --help return at once. With --warm-cache DIR (or EMBEDDING_WARM_CACHE) the loaded
+# model is saved there with model.save and later processes load that local copy instead of
+# resolving the model through the Hugging Face hub. The copy holds configuration and safetensors
+# weights only, never pickles, so the directory cannot smuggle in code.
+import os
+import re
 import sys
 import json
-from sentence_transformers import SentenceTransformer
+import queue
+import base64
+import shutil
+import bisect
+import argparse
+import threading
+import time
+import socketserver
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
 
-# Get path to .txt file
-text_file_path = sys.argv[1]
+MODEL_NAME = 'all-MiniLM-L6-v2'
 
-# Read the text content
-with open(text_file_path, 'r', encoding='utf-8') as f:
-    text = f.read()
+# MiniLM truncates at 256 word pieces; ~180 words keeps a window safely inside that
+DEFAULT_WINDOW_WORDS = 180
+DEFAULT_OVERLAP_WORDS = 40
+DEFAULT_BATCH_SIZE = 64
 
-# Load pre-trained embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+PAGE_BREAK = '\f'
+_WORD_RE = re.compile(r'\S+')
 
-# Generate embedding
-embedding = model.encode(text).tolist()
 
-# Return as JSON
-print(json.dumps(embedding))
+def warm_cache_path(cache_dir, model_name):
+    """Directory of a model's saved copy; the library version is part of the name"""
+    from importlib.metadata import version
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+    return os.path.join(cache_dir, f"{safe_name}-st{version('sentence-transformers')}")
+
+
+def load_model(model_name=MODEL_NAME, warm_cache_dir=None):
+    """Load the sentence-transformers model, from the warm cache when one is given and present"""
+    from sentence_transformers import SentenceTransformer
+    if warm_cache_dir:
+        path = warm_cache_path(warm_cache_dir, model_name)
+        if os.path.isdir(path):
+            try:
+                return SentenceTransformer(path)
+            except Exception as e:
+                print(f"Ignoring unreadable warm cache {path}: {e}", file=sys.stderr)
+                shutil.rmtree(path, ignore_errors=True)
+
+    model = SentenceTransformer(model_name)
+
+    if warm_cache_dir:
+        # Saved under a temporary name and renamed so a concurrent loader never sees a partial copy
+        os.makedirs(warm_cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            model.save(temp_path, safe_serialization=True)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Could not write warm cache {path}: {e}", file=sys.stderr)
+            shutil.rmtree(temp_path, ignore_errors=True)
+    return model
+
+
+def read_text(text_file_path):
+    with open(text_file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def encode_cached(model, texts, cache=None, batch_size=DEFAULT_BATCH_SIZE, model_name=MODEL_NAME):
+    """
+    Encode texts, serving repeats from the embedding cache when one is given; entries are keyed
+    by model_name, which must name the model that was loaded
+    """
+    if cache is None:
+        return model.encode(texts, batch_size=batch_size)
+    return cache.get_or_compute(model_name, model.get_sentence_embedding_dimension(), texts,
+                                lambda missing: model.encode(missing, batch_size=batch_size))
+
+
+def split_windows(text, window_words=DEFAULT_WINDOW_WORDS, overlap_words=DEFAULT_OVERLAP_WORDS):
+    """Split text into overlapping word windows, returned as (start, end, page) offsets"""
+    if overlap_words >= window_words:
+        raise ValueError("overlap_words must be smaller than window_words")
+
+    page_breaks = [m.start() for m in re.finditer(PAGE_BREAK, text)]
+    words = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+    step = window_words - overlap_words
+
+    windows = []
+    for first in range(0, len(words), step):
+        last = min(first + window_words, len(words)) - 1
+        start, end = words[first][0], words[last][1]
+        page = bisect.bisect_right(page_breaks, start) + 1
+        windows.append((start, end, page))
+        if last == len(words) - 1:
+            break
+    return windows
+
+
+def pack_vector(vector):
+    """Encode a vector as base64 little-endian float32"""
+    import numpy as np
+    return base64.b64encode(np.asarray(vector, dtype='<f4').tobytes()).decode('ascii')
+
+
+def chunk_record(window, vector):
+    start, end, page = window
+    return {'start': start, 'end': end, 'page': page, 'vector': pack_vector(vector)}
+
+
+def encode_chunks(model, text, batch_size=DEFAULT_BATCH_SIZE,
+                  window_words=DEFAULT_WINDOW_WORDS, overlap_words=DEFAULT_OVERLAP_WORDS, cache=None,
+                  model_name=MODEL_NAME):
+    """Yield chunk records batch by batch so callers can stream them out"""
+    windows = split_windows(text, window_words, overlap_words)
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        vectors = encode_cached(model, [text[start:end] for start, end, _ in batch], cache, batch_size,
+                                model_name)
+        for window, vector in zip(batch, vectors):
+            yield chunk_record(window, vector)
+
+
+class EmbeddingWorker:
+    """Holds one loaded model and coalesces requests that arrive close together into one encode call"""
+
+    def __init__(self, model_name=MODEL_NAME, max_batch=DEFAULT_BATCH_SIZE, batch_wait_ms=5, cache=None,
+                 warm_cache_dir=None):
+        self.model_name = model_name
+        self.model = load_model(model_name, warm_cache_dir)
+        self.cache = cache
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, text, callback):
+        """Queue a text; callback(embedding, error) is called from the worker thread"""
+        self.requests.put((text, callback))
+
+    def _collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = encode_cached(self.model, texts, self.cache, self.max_batch, self.model_name)
+            except Exception as e:
+                for _, callback in batch:
+                    callback(None, str(e))
+            else:
+                for (_, callback), vector in zip(batch, vectors):
+                    callback(vector, None)
+            for _ in batch:
+                self.requests.task_done()
+
+    def join(self):
+        """Block until every submitted request has been answered"""
+        self.requests.join()
+
+
+def submit_chunked(worker, request_id, text, send):
+    """Submit every window of a document and reply once all chunks are encoded"""
+    windows = split_windows(text)
+    if not windows:
+        send({'id': request_id, 'chunks': []})
+        return
+
+    chunks = [None] * len(windows)
+    state = {'remaining': len(windows), 'error': None}
+    lock = threading.Lock()
+
+    def make_reply(index):
+        def reply(vector, error):
+            with lock:
+                if error is not None:
+                    state['error'] = error
+                else:
+                    chunks[index] = chunk_record(windows[index], vector)
+                state['remaining'] -= 1
+                done = state['remaining'] == 0
+            if done:
+                if state['error'] is not None:
+                    send({'id': request_id, 'error': state['error']})
+                else:
+                    send({'id': request_id, 'chunks': chunks})
+        return reply
+
+    for index, (start, end, _) in enumerate(windows):
+        worker.submit(text[start:end], make_reply(index))
+
+
+def handle_request_line(worker, line, send):
+    """Parse one framed request and submit it; send(dict) writes the response"""
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        text = request['text'] if 'text' in request else read_text(request['path'])
+    except Exception as e:
+        send({'id': request_id, 'error': f"Invalid request: {e}"})
+        return
+
+    if request.get('chunked'):
+        submit_chunked(worker, request_id, text, send)
+        return
+
+    def reply(vector, error):
+        if error is not None:
+            send({'id': request_id, 'error': error})
+        else:
+            send({'id': request_id, 'embedding': vector.tolist()})
+
+    worker.submit(text, reply)
+
+
+def serve_stdio(worker):
+    write_lock = threading.Lock()
+
+    def send(message):
+        with write_lock:
+            sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+    # Signal readiness so callers can wait for the model load to finish
+    send({'ready': True, 'model': worker.model_name})
+    for line in sys.stdin:
+        if line.strip():
+            handle_request_line(worker, line, send)
+    worker.join()
+
+
+def serve_socket(worker, host, port):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+
+            def send(message):
+                with write_lock:
+                    try:
+                        self.wfile.write((json.dumps(message) + "\n").encode('utf-8'))
+                        self.wfile.flush()
+                    except OSError:
+                        pass
+
+            for raw in self.rfile:
+                line = raw.decode('utf-8')
+                if line.strip():
+                    handle_request_line(worker, line, send)
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    with Server((host, port), Handler) as server:
+        print(f"Embedding worker listening on {host}:{port}", file=sys.stderr)
+        server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sentence embeddings for text files")
+    parser.add_argument('text_file', nargs='?', help="Text file to embed (one-shot mode)")
+    parser.add_argument('--serve', action='store_true', help="Run as a persistent worker")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help="Serve on a TCP socket instead of stdin/stdout")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--batch-wait-ms', type=float, default=5)
+    parser.add_argument('--chunked', action='store_true', help="Embed overlapping windows instead of the whole text")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Windows per encode call (chunked mode)")
+    parser.add_argument('--window-words', type=int, default=DEFAULT_WINDOW_WORDS)
+    parser.add_argument('--overlap-words', type=int, default=DEFAULT_OVERLAP_WORDS)
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default=os.getenv('EMBEDDING_CACHE_PATH'),
+                        help=f"SQLite embedding cache file (off unless given or EMBEDDING_CACHE_PATH is set; "
+                             f"without a path: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="Always recompute embeddings")
+    parser.add_argument('--warm-cache', default=os.getenv('EMBEDDING_WARM_CACHE'),
+                        help="Directory holding a saved copy of the loaded model for faster start-up")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache or not args.cache else EmbeddingCache(args.cache)
+
+    if args.serve:
+        worker = EmbeddingWorker(max_batch=args.max_batch, batch_wait_ms=args.batch_wait_ms, cache=cache,
+                                 warm_cache_dir=args.warm_cache)
+        if args.port is not None:
+            serve_socket(worker, args.host, args.port)
+        else:
+            serve_stdio(worker)
+        return
+
+    if not args.text_file:
+        parser.error("a text file is required unless --serve is given")
+
+    # Get path to .txt file and read the text content
+    text = read_text(args.text_file)
+
+    # Load pre-trained embedding model
+    model = load_model(MODEL_NAME, args.warm_cache)
+
+    if args.chunked:
+        # Stream one JSON line per chunk as each batch finishes
+        for record in encode_chunks(model, text, args.batch_size, args.window_words, args.overlap_words, cache):
+            sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+        return
+
+    # Generate embedding
+    embedding = encode_cached(model, [text], cache)[0].tolist()
+
+    # Return as JSON
+    print(json.dumps(embedding))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# extraction_cache.py
+# Persistent cache of the page texts extracted from PDFs, so re-chunking or re-embedding a corpus
+# reads text back instead of parsing every page again.
+#
+#   <directory>/<extractor>/<sha256 of the PDF>.pages
+#
+# <extractor> names the parser, its version and EXTRACTOR_VERSION (bumped when the extraction
+# code changes), so upgrading either starts a fresh cache instead of serving stale text. A file
+# holds one zlib frame per page, then the frames' offset table and a fixed-size footer:
+#
+#   frame 0 | frame 1 | ... | offsets (count + 1 little-endian uint64) | table offset, count, magic
+#
+# The footer makes any page range one seek and read after opening, and the table at the end
+# lets a file be written while pages are still being extracted. Files are written to a
+# temporary name and renamed, so readers only ever see complete ones; a file that fails to
+# parse counts as a miss and is removed.
+
+import os
+import zlib
+import struct
+import tempfile
+import threading
+
+EXTRACTOR_VERSION = 1
+MAGIC = b"PGX1"
+FOOTER = struct.Struct("<QI4s")
+DEFAULT_LEVEL = 6
+# What reading a page from a damaged file raises
+CORRUPT_PAGE_ERRORS = (zlib.error, UnicodeDecodeError)
+
+
+def extractor_name():
+    """Cache namespace of the current extraction code"""
+    from importlib import metadata
+    try:
+        version = metadata.version("PyPDF2")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return f"pypdf2-{version}-v{EXTRACTOR_VERSION}"
+
+
+class PageFile:
+    """Random access to the pages of one cache file"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.file.seek(0, os.SEEK_END)
+            size = self.file.tell()
+            if size < FOOTER.size:
+                raise ValueError(f"{path} is too short for a page file")
+            self.file.seek(size - FOOTER.size)
+            table_offset, count, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic != MAGIC or table_offset + 8 * (count + 1) != size - FOOTER.size:
+                raise ValueError(f"{path} is not a page file")
+            self.file.seek(table_offset)
+            table = self.file.read(8 * (count + 1))
+            self.offsets = struct.unpack(f"<{count + 1}Q", table)
+        except Exception:
+            self.file.close()
+            raise
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def pages(self, start=0, end=None):
+        """Texts of pages [start, end), read with one seek"""
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return []
+        self.file.seek(self.offsets[start])
+        data = self.file.read(self.offsets[end] - self.offsets[start])
+        base = self.offsets[start]
+        frames = (data[self.offsets[i] - base:self.offsets[i + 1] - base] for i in range(start, end))
+        return [zlib.decompress(frame).decode('utf-8', 'surrogatepass') for frame in frames]
+
+    def page(self, number):
+        return self.pages(number, number + 1)[0]
+
+    def iter_pages(self, pages_per_read=32):
+        """Yield every page, reading a few at a time"""
+        for start in range(0, len(self), pages_per_read):
+            yield from self.pages(start, start + pages_per_read)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PageFileWriter:
+    """Writes a page file one page at a time; nothing is visible until commit()"""
+
+    def __init__(self, path, level=DEFAULT_LEVEL):
+        self.path = path
+        self.level = level
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, self.temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self.file = os.fdopen(descriptor, 'wb')
+        self.offsets = [0]
+
+    def add(self, text):
+        frame = zlib.compress((text or "").encode('utf-8', 'surrogatepass'), self.level)
+        self.file.write(frame)
+        self.offsets.append(self.offsets[-1] + len(frame))
+
+    def commit(self):
+        count = len(self.offsets) - 1
+        self.file.write(struct.pack(f"<{count + 1}Q", *self.offsets))
+        self.file.write(FOOTER.pack(self.offsets[-1], count, MAGIC))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temporary, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+
+class ExtractionCache:
+    """Page texts keyed by PDF content hash under one extractor namespace"""
+
+    def __init__(self, directory, extractor=None, level=DEFAULT_LEVEL):
+        self.directory = directory
+        self.extractor = extractor or extractor_name()
+        self.level = level
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, document_hash):
+        return os.path.join(self.directory, self.extractor, f"{document_hash}.pages")
+
+    def open(self, document_hash):
+        """PageFile of a cached document, or None on a miss"""
+        path = self.path(document_hash)
+        try:
+            page_file = PageFile(path)
+        except FileNotFoundError:
+            page_file = None
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Discarding unreadable extraction cache file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            page_file = None
+        with self.lock:
+            if page_file is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return page_file
+
+    def get(self, document_hash, start=0, end=None):
+        """Texts of pages [start, end) of a cached document, or None on a miss"""
+        page_file = self.open(document_hash)
+        if page_file is None:
+            return None
+        with page_file:
+            try:
+                return page_file.pages(start, end)
+            except CORRUPT_PAGE_ERRORS as e:
+                error = e
+        self.discard(document_hash, error)
+        return None
+
+    def discard(self, document_hash, error):
+        """Remove a cached document whose pages failed to read"""
+        path = self.path(document_hash)
+        print(f"Discarding corrupt extraction cache file {path}: {error}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def record(self, document_hash, pages):
+        """
+        Yield pages while writing them to the cache. The file is committed once every page has
+        gone through, and dropped if the caller stops early or extraction fails; a cache that
+        cannot be written is reported and skipped, never failing the extraction itself
+        """
+        writer = None
+        try:
+            writer = PageFileWriter(self.path(document_hash), self.level)
+        except OSError as e:
+            print(f"Not caching extracted text of {document_hash}: {e}")
+        try:
+            for text in pages:
+                if writer is not None:
+                    try:
+                        writer.add(text)
+                    except OSError as e:
+                        print(f"Not caching extracted text of {document_hash}: {e}")
+                        writer.abort()
+                        writer = None
+                yield text
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            try:
+                writer.commit()
+            except OSError as e:
+                print(f"Not caching extracted text of {document_hash}: {e}")
+                writer.abort()
+
+    def put(self, document_hash, pages):
+        for _ in self.record(document_hash, pages):
+            pass
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,123 @@
+# fingerprints.py
+# Document- and chunk-level content fingerprints for incremental re-ingestion.
+#
+# A registry remembers, per document key, the hash of the source file and the fingerprint and
+# row id of every chunk stored for it. Re-ingesting compares against that record so unchanged
+# files are skipped, new chunks are embedded and written, and vanished chunks are deleted.
+
+import sqlite3
+import hashlib
+import threading
+from astra_writer import execute_windowed
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_fingerprints(chunks):
+    """
+    Fingerprint each chunk by the hash of its text. Repeated identical chunks
+    get an occurrence suffix so every chunk of a document has a distinct key.
+    """
+    seen = {}
+    fingerprints = []
+    for chunk in chunks:
+        digest = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        fingerprints.append(f"{digest}-{occurrence}")
+    return fingerprints
+
+
+class LocalFingerprintRegistry:
+    """Fingerprint registry in a SQLite file, used next to a LocalVectorStore"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                document_key TEXT PRIMARY KEY,
+                document_hash TEXT
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_key TEXT,
+                fingerprint TEXT,
+                row_id TEXT,
+                PRIMARY KEY (document_key, fingerprint)
+            )
+        """)
+        self.db.commit()
+
+    def get(self, document_key):
+        """Return (document_hash, {fingerprint: row_id}); the hash is None for unknown documents"""
+        with self.lock:
+            row = self.db.execute("SELECT document_hash FROM documents WHERE document_key = ?",
+                                  (document_key,)).fetchone()
+            chunks = dict(self.db.execute("SELECT fingerprint, row_id FROM chunks WHERE document_key = ?",
+                                          (document_key,)))
+        return (row[0] if row else None), chunks
+
+    def put(self, document_key, document_hash, chunks):
+        """Replace the record for a document"""
+        with self.lock:
+            self.db.execute("DELETE FROM chunks WHERE document_key = ?", (document_key,))
+            self.db.executemany("INSERT INTO chunks (document_key, fingerprint, row_id) VALUES (?, ?, ?)",
+                                [(document_key, fingerprint, row_id) for fingerprint, row_id in chunks.items()])
+            self.db.execute("INSERT OR REPLACE INTO documents (document_key, document_hash) VALUES (?, ?)",
+                            (document_key, document_hash))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class CassandraFingerprintRegistry:
+    """Fingerprint registry in a companion table next to the collection in AstraDB"""
+
+    def __init__(self, session, table):
+        self.session = session
+        self.table = table
+        session.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                document_key text,
+                fingerprint text,
+                row_id text,
+                document_hash text STATIC,
+                PRIMARY KEY (document_key, fingerprint)
+            )
+        """)
+        self.select = session.prepare(
+            f"SELECT document_hash, fingerprint, row_id FROM {table} WHERE document_key = ?")
+        self.delete = session.prepare(f"DELETE FROM {table} WHERE document_key = ?")
+        self.insert_hash = session.prepare(
+            f"INSERT INTO {table} (document_key, document_hash) VALUES (?, ?)")
+        self.insert_chunk = session.prepare(
+            f"INSERT INTO {table} (document_key, fingerprint, row_id) VALUES (?, ?, ?)")
+
+    def get(self, document_key):
+        document_hash = None
+        chunks = {}
+        for row in self.session.execute(self.select, (document_key,)):
+            document_hash = row.document_hash
+            if row.fingerprint is not None:
+                chunks[row.fingerprint] = row.row_id
+        return document_hash, chunks
+
+    def put(self, document_key, document_hash, chunks):
+        self.session.execute(self.delete, (document_key,))
+        execute_windowed(self.session, self.insert_chunk,
+                         ((document_key, fingerprint, row_id) for fingerprint, row_id in chunks.items()))
+        self.session.execute(self.insert_hash, (document_key, document_hash))
+
+    def close(self):
+        pass
@@ -0,0 +1,210 @@
+# lexical_index.py
+# BM25 keyword index over a LocalVectorStore's chunk texts, for exact-term questions (method
+# names, datasets, authors) that embeddings blur.
+#
+#   lexical/seg-<first>-<end>.npz   one segment per append, covering store rows [first, end):
+#       terms     sorted unique terms (lowercased \w+ runs, utf-8)
+#       offsets   the postings of terms[i] are rows/tfs[offsets[i]:offsets[i + 1]]
+#       rows      int32 store row ids, ascending within a term
+#       tfs       uint16 term frequency in that row
+#       lengths   uint32 token count of every row in the segment
+#
+# Segments are flat arrays, so opening the index is one np.load per segment and a term lookup is
+# a binary search in each. A segment is written once (temp file, then rename) and only ever
+# replaced by merging: after an append the newest two are merged while the newer holds at least
+# half as many postings as the older, which keeps O(log n) segments however many small uploads
+# built the store. Deleted rows stay indexed; the store filters them out like in vector search.
+
+import os
+import re
+import math
+from collections import Counter
+from itertools import repeat
+import numpy as np
+
+LEXICAL_DIR = "lexical"
+# Terms longer than this are dropped (base64 runs, hashes, extraction garbage)
+MAX_TERM_LENGTH = 64
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SEGMENT_PATTERN = re.compile(r"^seg-(\d+)-(\d+)\.npz$")
+
+
+def tokenize(text):
+    """Lowercased word tokens of a text"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) <= MAX_TERM_LENGTH]
+
+
+def pack_postings(vocabulary, term_ids, rows, tfs):
+    """
+    Group postings by term and compute each term's offsets. Postings arrive in ascending row
+    order, so a stable sort on the term alone leaves every term's rows ascending
+    """
+    order = np.argsort(term_ids, kind='stable')
+    counts = np.bincount(term_ids, minlength=len(vocabulary))
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, rows[order].astype(np.int32), tfs[order].astype(np.uint16)
+
+
+class Segment:
+    """The arrays of one segment file"""
+
+    def __init__(self, first, end, terms, offsets, rows, tfs, lengths):
+        self.first = first
+        self.end = end
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, first, texts):
+        """Index texts as rows first, first + 1, ..."""
+        ids = {}
+        term_ids, rows, tfs = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            lengths[i] = len(tokens)
+            counts = Counter(tokens)
+            term_ids.extend([ids.setdefault(term, len(ids)) for term in counts])
+            rows.extend(repeat(first + i, len(counts)))
+            tfs.extend(counts.values())
+        # Ids in order of first appearance, renumbered to the sorted vocabulary (utf-8 bytes
+        # sort in code point order, like the strings)
+        terms = sorted(ids)
+        ranks = np.empty(len(ids), dtype=np.int64)
+        ranks[[ids[term] for term in terms]] = np.arange(len(ids))
+        vocabulary = np.array([term.encode('utf-8') for term in terms], dtype=bytes) if terms else np.empty(0, dtype='S1')
+        offsets, rows, tfs = pack_postings(vocabulary, ranks[np.array(term_ids, dtype=np.int64)],
+                                           np.array(rows, dtype=np.int64),
+                                           np.minimum(np.array(tfs, dtype=np.int64), 65535))
+        return cls(first, first + len(texts), vocabulary, offsets, rows, tfs, lengths)
+
+    @classmethod
+    def merge(cls, older, newer):
+        """One segment covering two adjacent ones, without going back to the texts"""
+        vocabulary, inverse = np.unique(np.concatenate([older.terms, newer.terms]), return_inverse=True)
+        term_ids = np.concatenate([
+            inverse[:len(older.terms)][np.repeat(np.arange(len(older.terms)), np.diff(older.offsets))],
+            inverse[len(older.terms):][np.repeat(np.arange(len(newer.terms)), np.diff(newer.offsets))],
+        ])
+        offsets, rows, tfs = pack_postings(vocabulary, term_ids, np.concatenate([older.rows, newer.rows]),
+                                           np.concatenate([older.tfs, newer.tfs]))
+        return cls(older.first, newer.end, vocabulary, offsets, rows, tfs,
+                   np.concatenate([older.lengths, newer.lengths]))
+
+    @classmethod
+    def load(cls, path, first, end):
+        with np.load(path) as arrays:
+            return cls(first, end, arrays['terms'], arrays['offsets'], arrays['rows'], arrays['tfs'],
+                       arrays['lengths'])
+
+    def save(self, directory):
+        path = os.path.join(directory, f"seg-{self.first:010d}-{self.end:010d}.npz")
+        temporary = path + ".tmp"
+        with open(temporary, 'wb') as f:
+            np.savez(f, terms=self.terms, offsets=self.offsets, rows=self.rows, tfs=self.tfs,
+                     lengths=self.lengths)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        return path
+
+    def postings(self, term):
+        """(rows, tfs) of a utf-8 term, empty when it does not occur"""
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.rows[:0], self.tfs[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]], self.tfs[self.offsets[i]:self.offsets[i + 1]]
+
+
+class LexicalIndex:
+    """Segmented BM25 index whose rows are a prefix of the store's rows"""
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, LEXICAL_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments = []
+        self.paths = []
+        self._load()
+
+    def _load(self):
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), -int(match.group(2)), name))
+            elif name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+        # Widest segment first at each start, so a merge interrupted before its inputs were
+        # removed is resolved in favour of the merged segment
+        for first, negative_end, name in sorted(found):
+            path = os.path.join(self.directory, name)
+            if first == self.count:
+                self.segments.append(Segment.load(path, first, -negative_end))
+                self.paths.append(path)
+            else:
+                os.remove(path)
+
+    @property
+    def count(self):
+        """Rows indexed so far"""
+        return self.segments[-1].end if self.segments else 0
+
+    def truncate(self, count):
+        """Drop segments reaching past count; the caller re-appends the rows they covered below it"""
+        while self.segments and self.segments[-1].end > count:
+            self.segments.pop()
+            os.remove(self.paths.pop())
+
+    def append(self, first, texts):
+        """Index texts as the rows starting at first, which must be the next unindexed row"""
+        if first != self.count:
+            raise ValueError(f"Lexical index covers {self.count} rows, cannot append at row {first}")
+        if not texts:
+            return
+        segment = Segment.build(first, texts)
+        self.segments.append(segment)
+        self.paths.append(segment.save(self.directory))
+        while len(self.segments) > 1 and 2 * len(self.segments[-1].rows) >= len(self.segments[-2].rows):
+            newer, newer_path = self.segments.pop(), self.paths.pop()
+            older, older_path = self.segments.pop(), self.paths.pop()
+            merged = Segment.merge(older, newer)
+            self.segments.append(merged)
+            self.paths.append(merged.save(self.directory))
+            os.remove(older_path)
+            os.remove(newer_path)
+
+    def scores(self, query):
+        """BM25 score of every row matching a query term, as (rows ascending, scores)"""
+        terms = {term.encode('utf-8') for term in tokenize(query)}
+        count = self.count
+        if not terms or count == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        average_length = max(sum(int(segment.lengths.sum(dtype=np.int64)) for segment in self.segments) / count, 1.0)
+
+        matched_rows, matched_scores = [], []
+        for term in terms:
+            postings = [(segment, *segment.postings(term)) for segment in self.segments]
+            frequency = sum(len(rows) for _, rows, _ in postings)
+            if frequency == 0:
+                continue
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for segment, rows, tfs in postings:
+                if not len(rows):
+                    continue
+                tfs = tfs.astype(np.float32)
+                lengths = segment.lengths[rows - segment.first].astype(np.float32)
+                norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+                matched_rows.append(rows)
+                matched_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norms))
+        if not matched_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, positions = np.unique(np.concatenate(matched_rows), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(matched_scores), minlength=len(rows))
+        return rows.astype(np.int64), scores.astype(np.float32)
@@ -0,0 +1,396 @@
+# local_vector_store.py
+# Offline stand-in for AstraDB: a local vector index with the same store and query operations.
+#
+# Layout of a store directory:
+#   vectors.f32    append-only, row-major float32 matrix of L2-normalized vectors (memory-mapped)
+#   meta.sqlite    one row per vector (row id, chunk id, document id, text, JSON metadata, deleted
+#                  flag) plus the dimensions
+#   vectors.i8, scales.f32, vectors.sign
+#                  int8 and sign-bit copies of the vectors for quantized search (quantized_index.py),
+#                  only built by the first quantized search; a process that has run one keeps
+#                  them current as it adds, others leave them to catch up on their next one
+#   lexical/       BM25 index segments over the chunk texts (lexical_index.py)
+#
+# Deletes are tombstones: the vector stays in the file and search skips the row.
+#
+# Opening a store reads no vectors; search scans the memory map block by block, so memory stays
+# bounded by block_rows * dimensions regardless of how many chunks are stored.
+
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from quantized_index import QuantizedIndex, QUANTIZATIONS
+from lexical_index import LexicalIndex
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "meta.sqlite"
+DEFAULT_BLOCK_ROWS = 65536
+DEFAULT_OVERSAMPLE = 4
+# Share of the hybrid score that comes from BM25 (the rest is cosine similarity)
+DEFAULT_LEXICAL_WEIGHT = 0.3
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_merge(best_scores, best_rows, scores, rows, k):
+    """Merge a block's scores into the running top-k (unsorted)"""
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    scores = np.concatenate([best_scores, scores])
+    rows = np.concatenate([best_rows, rows])
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    return scores, rows
+
+
+class LocalVectorStore:
+    """Memory-mapped float32 vector file with a SQLite side table for chunk metadata"""
+
+    def __init__(self, directory, dimensions=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.lock = threading.RLock()
+
+        self.db = sqlite3.connect(os.path.join(directory, METADATA_FILE), check_same_thread=False)
+        # SQLite's lower() only folds ASCII
+        self.db.create_function("casefold", 1, lambda text: text.casefold() if text is not None else None,
+                                deterministic=True)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row_id INTEGER PRIMARY KEY,
+                document_id TEXT,
+                text TEXT,
+                metadata TEXT
+            )
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(chunks)")}
+        if 'chunk_id' not in columns:
+            self.db.execute("ALTER TABLE chunks ADD COLUMN chunk_id TEXT")
+        if 'deleted' not in columns:
+            self.db.execute("ALTER TABLE chunks ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_chunk_id ON chunks (chunk_id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+        row = self.db.execute("SELECT value FROM info WHERE key = 'dimensions'").fetchone()
+        self.dimensions = int(row[0]) if row else None
+        if self.dimensions is None and dimensions is not None:
+            self._set_dimensions(dimensions)
+        elif dimensions is not None and dimensions != self.dimensions:
+            raise ValueError(f"Store has {self.dimensions} dimensions, not {dimensions}")
+
+        self.count = self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        self.deleted = np.array(
+            [row[0] for row in self.db.execute("SELECT row_id FROM chunks WHERE deleted = 1 ORDER BY row_id")],
+            dtype=np.int64)
+        self._recover()
+        self._matrix = None
+        self._quantized = None
+        self._lexical = None
+
+    def _set_dimensions(self, dimensions):
+        self.dimensions = int(dimensions)
+        self.db.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('dimensions', ?)", (str(dimensions),))
+        self.db.commit()
+
+    def _recover(self):
+        """Drop vector rows written by an append whose metadata never committed"""
+        if self.dimensions is None or not os.path.exists(self.vectors_path):
+            return
+        expected = self.count * self.dimensions * 4
+        if os.path.getsize(self.vectors_path) > expected:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(expected)
+
+    def matrix(self):
+        """Zero-copy view of all stored vectors"""
+        with self.lock:
+            if self._matrix is None or self._matrix.shape[0] != self.count:
+                if self.count == 0:
+                    self._matrix = np.empty((0, self.dimensions or 0), dtype=np.float32)
+                else:
+                    self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                             shape=(self.count, self.dimensions))
+            return self._matrix
+
+    def quantized_index(self):
+        """The int8/sign-bit index, brought in line with the vector file on first use"""
+        with self.lock:
+            if self._quantized is None and self.dimensions is not None:
+                index = QuantizedIndex(self.directory, self.dimensions)
+                counts = index.row_counts()
+                if max(counts) > self.count:
+                    index.truncate(self.count)
+                    counts = index.row_counts()
+                if min(counts) < self.count:
+                    # Quantize only the rows added since the index was last in use
+                    index.rebuild(self.matrix(), start=min(counts))
+                self._quantized = index
+            return self._quantized
+
+    def lexical_index(self):
+        """The BM25 index, brought in line with the stored texts on first use"""
+        with self.lock:
+            if self._lexical is None:
+                index = LexicalIndex(self.directory)
+                if index.count > self.count:
+                    index.truncate(self.count)
+                for start in range(index.count, self.count, 10000):
+                    index.append(start, [text for (text,) in self.db.execute(
+                        "SELECT text FROM chunks WHERE row_id >= ? AND row_id < ? ORDER BY row_id",
+                        (start, start + 10000))])
+                self._lexical = index
+            return self._lexical
+
+    def __len__(self):
+        return self.count
+
+    def add(self, vectors, texts, document_ids=None, metadatas=None, chunk_ids=None):
+        """Append vectors with their texts; returns the new row ids"""
+        vectors = normalize_rows(vectors)
+        if len(vectors) != len(texts):
+            raise ValueError("vectors and texts must have the same length")
+        document_ids = document_ids or [None] * len(texts)
+        metadatas = metadatas or [None] * len(texts)
+        chunk_ids = chunk_ids or [None] * len(texts)
+
+        with self.lock:
+            if self.dimensions is None:
+                self._set_dimensions(vectors.shape[1])
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+
+            # Vectors first, then metadata: a crash in between leaves only trailing
+            # vector bytes, which _recover and quantized_index trim on the next open; the
+            # lexical index is appended last and caught up from the texts if that is lost.
+            # The quantized copies are only extended once a quantized search has loaded them
+            lexical = self.lexical_index()
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            if self._quantized is not None:
+                self._quantized.append(vectors)
+
+            first = self.count
+            row_ids = list(range(first, first + len(texts)))
+            self.db.executemany(
+                "INSERT INTO chunks (row_id, chunk_id, document_id, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(row_id, chunk_id, document_id, text, json.dumps(metadata) if metadata is not None else None)
+                 for row_id, chunk_id, document_id, text, metadata
+                 in zip(row_ids, chunk_ids, document_ids, texts, metadatas)]
+            )
+            self.db.commit()
+            self.count += len(texts)
+            lexical.append(first, texts)
+            return row_ids
+
+    def search(self, query_vector, k=5, threshold=None, block_rows=DEFAULT_BLOCK_ROWS,
+               quantization=None, oversample=DEFAULT_OVERSAMPLE):
+        """
+        Top-k rows by cosine similarity, best first.
+        With quantization ('int8' or 'binary') a scan of the quantized index picks
+        k * oversample candidates, which are then rescored exactly.
+        """
+        rows, scores = self._search_rows(normalize_rows(query_vector)[0], k, threshold, block_rows,
+                                         quantization, oversample)
+        return self._rows_with_scores(rows, scores)
+
+    def _search_rows(self, query, k, threshold=None, block_rows=DEFAULT_BLOCK_ROWS,
+                     quantization=None, oversample=DEFAULT_OVERSAMPLE):
+        """search() as (rows, scores) arrays for a normalized query"""
+        if self.count == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        matrix = self.matrix()
+
+        if quantization is None:
+            candidates = k
+        elif quantization in QUANTIZATIONS:
+            # Approximate scores are not cosines; the threshold applies after rescoring
+            index = self.quantized_index()
+            candidates = k * max(int(oversample), 1)
+        else:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+
+        def scores_of(start, end):
+            if quantization is None:
+                return matrix[start:end] @ query
+            return index.block_scores(quantization, query, start, end, matrix.shape[0])
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, matrix.shape[0], block_rows):
+            scores = scores_of(start, min(start + block_rows, matrix.shape[0]))
+            rows = np.arange(start, start + len(scores), dtype=np.int64)
+            tombstones = self.deleted[(self.deleted >= start) & (self.deleted < start + len(scores))]
+            if len(tombstones):
+                scores[tombstones - start] = -np.inf
+            if threshold is not None and quantization is None:
+                mask = scores >= threshold
+                scores, rows = scores[mask], rows[mask]
+            best_scores, best_rows = top_k_merge(best_scores, best_rows, scores, rows, candidates)
+
+        live = np.isfinite(best_scores)
+        best_scores, best_rows = best_scores[live], best_rows[live]
+        if quantization is not None and len(best_rows):
+            # Exact rescoring reads only the candidates' float32 rows from disk
+            best_rows = np.sort(best_rows)
+            best_scores = matrix[best_rows] @ query
+            if threshold is not None:
+                mask = best_scores >= threshold
+                best_scores, best_rows = best_scores[mask], best_rows[mask]
+        order = np.argsort(-best_scores)[:k]
+        return best_rows[order], best_scores[order]
+
+    def lexical_search(self, query_text, k=5):
+        """Top-k rows by BM25 score for the query's terms, best first"""
+        if k <= 0:
+            return []
+        rows, scores = self._live_lexical_scores(query_text)
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')
+        return self._rows_with_scores(rows[order], scores[order])
+
+    def hybrid_search(self, query_text, query_vector, k=5, lexical_weight=DEFAULT_LEXICAL_WEIGHT,
+                      quantization=None, oversample=DEFAULT_OVERSAMPLE):
+        """
+        Top-k rows by lexical_weight * BM25 + (1 - lexical_weight) * cosine similarity, best first.
+        BM25 is divided by the best BM25 score among the matches so both parts are at most 1.
+        Candidates are the k * oversample best rows of each ranking, scored exactly on both.
+        """
+        if self.count == 0 or k <= 0:
+            return []
+        query = normalize_rows(query_vector)[0]
+        candidates = k * max(int(oversample), 1)
+        lexical_rows, lexical_scores = self._live_lexical_scores(query_text)
+        vector_rows, _ = self._search_rows(query, candidates, quantization=quantization, oversample=oversample)
+        if len(lexical_scores) > candidates:
+            top_lexical = lexical_rows[np.argpartition(-lexical_scores, candidates - 1)[:candidates]]
+        else:
+            top_lexical = lexical_rows
+        rows = np.union1d(vector_rows, top_lexical)
+
+        vector_scores = self.matrix()[rows] @ query
+        lexical_part = np.zeros(len(rows), dtype=np.float32)
+        if len(lexical_rows):
+            positions = np.minimum(np.searchsorted(lexical_rows, rows), len(lexical_rows) - 1)
+            matched = lexical_rows[positions] == rows
+            lexical_part[matched] = lexical_scores[positions[matched]] / lexical_scores.max()
+        scores = lexical_weight * lexical_part + (1 - lexical_weight) * vector_scores
+
+        order = np.argsort(-scores, kind='stable')[:k]
+        results = self._rows_with_scores(rows[order], scores[order])
+        for result, vector_score, lexical_score in zip(results, vector_scores[order], lexical_part[order]):
+            result["vector_score"] = float(vector_score)
+            result["lexical_score"] = float(lexical_score)
+        return results
+
+    def _live_lexical_scores(self, query_text):
+        """BM25 (rows, scores) of the matching rows that are not deleted"""
+        rows, scores = self.lexical_index().scores(query_text)
+        if len(self.deleted) and len(rows):
+            live = ~np.isin(rows, self.deleted)
+            rows, scores = rows[live], scores[live]
+        return rows, scores
+
+    def delete_chunks(self, chunk_ids):
+        """Tombstone the rows with the given chunk ids; returns how many were deleted"""
+        chunk_ids = list(chunk_ids)
+        deleted = []
+        with self.lock:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                deleted.extend(row[0] for row in self.db.execute(
+                    f"SELECT row_id FROM chunks WHERE deleted = 0 AND chunk_id IN ({placeholders})", batch))
+            if deleted:
+                self.db.executemany("UPDATE chunks SET deleted = 1 WHERE row_id = ?", [(row,) for row in deleted])
+                self.db.commit()
+                self.deleted = np.union1d(self.deleted, np.array(deleted, dtype=np.int64))
+        return len(deleted)
+
+    def has_document(self, document_id):
+        with self.lock:
+            return self.db.execute(
+                "SELECT 1 FROM chunks WHERE document_id = ? AND deleted = 0 LIMIT 1", (document_id,)
+            ).fetchone() is not None
+
+    def _rows_with_scores(self, rows, scores):
+        if len(rows) == 0:
+            return []
+        row_ids = [int(row) for row in rows]
+        placeholders = ",".join("?" * len(row_ids))
+        with self.lock:
+            found = {
+                row_id: (document_id, text, metadata)
+                for row_id, document_id, text, metadata in self.db.execute(
+                    f"SELECT row_id, document_id, text, metadata FROM chunks WHERE row_id IN ({placeholders})",
+                    row_ids)
+            }
+        results = []
+        for row_id, score in zip(row_ids, scores):
+            document_id, text, metadata = found[row_id]
+            results.append({
+                "row_id": row_id,
+                "document_id": document_id,
+                "text": text,
+                "metadata": json.loads(metadata) if metadata else None,
+                "score": float(score),
+            })
+        return results
+
+    def find_containing(self, text):
+        """
+        First row whose text contains `text` (case-insensitive, Unicode case folding), with its
+        vector. A scan over every chunk text; lexical_search is the indexed lookup by terms
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT row_id, document_id, text FROM chunks WHERE deleted = 0 AND instr(casefold(text), ?) > 0 "
+                "ORDER BY row_id LIMIT 1", (text.casefold(),)).fetchone()
+        if row is None:
+            return None
+        row_id, document_id, chunk_text = row
+        return {"row_id": row_id, "document_id": document_id, "text": chunk_text,
+                "embedding": self.matrix()[row_id].tolist()}
+
+    def store_embeddings(self, embeddings, document_id=None):
+        """
+        Pipeline-compatible store: takes a ChunkBatch and returns
+        (stored_count, failures) like PDFProcessingPipeline.store_in_astra_db
+        """
+        if not len(embeddings):
+            return 0, []
+        records = embeddings.records
+        try:
+            self.add(embeddings.float_vectors(),
+                     [record.text for record in records],
+                     document_ids=[record.document_id or document_id for record in records],
+                     metadatas=[record.location() for record in records],
+                     chunk_ids=[record.id for record in records])
+        except Exception as e:
+            return 0, [{'index': i, 'text': record.text, 'error': e} for i, record in enumerate(records)]
+        return len(embeddings), []
+
+    def close(self):
+        with self.lock:
+            self._matrix = None
+            self._quantized = None
+            self._lexical = None
+            self.db.close()
@@ -1,18 +1,42 @@
 # Complete Python code for PDF to AstraDB embedding pipeline with simplified Langflow integration
 
 import os
+import sys
 import uuid
-import PyPDF2
-import openai
-import numpy as np
-import requests
-from dotenv import load_dotenv
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from openai_embedder import OpenAIEmbedder, MAX_INPUTS_PER_REQUEST, MAX_TOKENS_PER_REQUEST, is_throttled
+from astra_writer import execute_windowed, execute_windowed_async
+from rate_limiter import RateLimiter
+from dead_letter import DeadLetterFile, entry_vector
+import connection_pool
+from text_chunker import TextChunker, PageChunkStream, token_length
+from pipeline_metrics import PipelineMetrics, start_metrics_server, cprofile_hook, sampling_profile_hook
+from fingerprints import file_digest, chunk_fingerprints, LocalFingerprintRegistry, CassandraFingerprintRegistry
 
-# Load environment variables
-load_dotenv()
+# Heavy dependencies (PyPDF2, openai, numpy, the Cassandra driver) are imported
+# where they are first used, so importing this module or constructing a pipeline only pays
+# for what that run touches.
+_environment_loaded = False
+
+def load_environment():
+    """Load variables from .env into os.environ, once"""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+def extract_page_range(pdf_file_path, start, end):
+    """Extract pages [start, end) of a PDF; runs in extraction worker processes"""
+    import PyPDF2
+    with open(pdf_file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[page_num].extract_text() for page_num in range(start, end)]
 
 class PDFProcessingPipeline:
     def __init__(self, 
@@ -26,7 +50,32 @@ class PDFProcessingPipeline:
                  chunk_size=1000,
                  chunk_overlap=200,
                  max_dimensions=768,
-                 langflow_server_url=None):
+                 langflow_server_url=None,
+                 openai_base_url=None,
+                 embedding_batch_size=MAX_INPUTS_PER_REQUEST,
+                 embedding_max_concurrency=4,
+                 embedding_max_retries=2,
+                 embedding_cache_path=None,
+                 write_concurrency=32,
+                 vector_store=None,
+                 stream_batch_size=256,
+                 max_in_flight_batches=2,
+                 extraction_workers=1,
+                 parallel_min_pages=32,
+                 incremental=False,
+                 request_dimensions=False,
+                 quantize_embeddings=False,
+                 metrics=None,
+                 profiler=None,
+                 chunk_length="characters",
+                 query_cache=None,
+                 embedding_requests_per_minute=None,
+                 embedding_tokens_per_minute=None,
+                 writes_per_second=None,
+                 write_latency_tolerance=3.0,
+                 embedding_latency_tolerance=None,
+                 dead_letter_path=None,
+                 extraction_cache_path=None):
         
         self.openai_api_key = openai_api_key
         self.astra_db_secure_bundle_path = astra_db_secure_bundle_path
@@ -37,38 +86,115 @@ class PDFProcessingPipeline:
         self.embedding_model = embedding_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # chunk_size and chunk_overlap count "characters" or "tokens" of the embedding model
+        self.chunk_length = chunk_length
         self.max_dimensions = max_dimensions
         self.langflow_server_url = langflow_server_url
+        self.openai_base_url = openai_base_url
+        self.write_concurrency = write_concurrency
+        # A LocalVectorStore replaces AstraDB entirely (offline runs and benchmarks)
+        self.vector_store = vector_store
+        self.stream_batch_size = stream_batch_size
+        self.max_in_flight_batches = max_in_flight_batches
+        # Documents with at least parallel_min_pages pages are extracted by a process pool
+        self.extraction_workers = extraction_workers
+        self.parallel_min_pages = parallel_min_pages
+        self._extraction_pool = None
+        # Incremental mode skips unchanged documents and re-embeds only changed chunks
+        self.incremental = incremental
+        self._fingerprints = None
+        # Guards lazily created pools and registries when one pipeline is shared across threads
+        self._lock = threading.Lock()
+        # request_dimensions asks the API for max_dimensions directly instead of truncating 1536;
+        # quantize_embeddings holds batches as int8 codes between embedding and storage
+        self.request_dimensions = request_dimensions
+        self.quantize_embeddings = quantize_embeddings
+        # Stage timings and chunk counters; profiler(pdf_file_path) is an optional context
+        # manager wrapped around each document (see pipeline_metrics)
+        self.metrics = metrics or PipelineMetrics()
+        self.profiler = profiler
+        # Optional QueryCache: embed_question reuses cached question embeddings, and every
+        # write or delete makes cached results for the documents it touched stale
+        self.query_cache = query_cache
+        # Embedding requests wait for the endpoint's request and token quotas, writes for
+        # writes_per_second; both adapt their concurrency to throttling and retry with backoff.
+        # A *_latency_tolerance also trims concurrency once a call takes that many times the best
+        # recent latency (for calls made through limiter.call/call_async). It is off for
+        # embeddings by default since their latency follows the batch's size, not only the load
+        self.embedding_limiter = RateLimiter(
+            "embeddings",
+            requests_per_second=embedding_requests_per_minute / 60 if embedding_requests_per_minute else None,
+            tokens_per_second=embedding_tokens_per_minute / 60 if embedding_tokens_per_minute else None,
+            max_concurrency=embedding_max_concurrency, throttled=is_throttled,
+            max_retries=embedding_max_retries, max_delay=8.0, latency_tolerance=embedding_latency_tolerance,
+            metrics=self.metrics
+        )
+        self.write_limiter = RateLimiter("astra_writes", requests_per_second=writes_per_second,
+                                         max_concurrency=write_concurrency, latency_tolerance=write_latency_tolerance,
+                                         metrics=self.metrics)
+        # Chunks that still fail after retries are saved here for `python mpl.py replay`
+        self.dead_letters = DeadLetterFile(dead_letter_path) if dead_letter_path else None
         
-        # Initialize OpenAI client
-        openai.api_key = self.openai_api_key
+        # Optional persistent cache of page texts by PDF hash, so re-chunking or re-embedding
+        # a document reads its text back instead of parsing the PDF again
+        self.extraction_cache = None
+        if extraction_cache_path:
+            from extraction_cache import ExtractionCache
+            self.extraction_cache = ExtractionCache(extraction_cache_path)
+        
+        # Optional persistent cache so re-ingested chunks are not paid for twice
+        self.embedding_cache = None
+        if embedding_cache_path:
+            from embedding_cache import EmbeddingCache
+            self.embedding_cache = EmbeddingCache(embedding_cache_path)
+        self.embedder = OpenAIEmbedder(
+            api_key=self.openai_api_key,
+            model=self.embedding_model,
+            base_url=self.openai_base_url,
+            max_batch_size=embedding_batch_size,
+            max_concurrency=embedding_max_concurrency,
+            max_retries=embedding_max_retries,
+            cache=self.embedding_cache,
+            dimensions=self.max_dimensions if self.request_dimensions else None,
+            metrics=self.metrics,
+            limiter=self.embedding_limiter
+        )
         
         # Initialize Astra DB connection
-        self.setup_astra_db_connection()
+        self.session = None
+        if self.vector_store is None:
+            self.setup_astra_db_connection()
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap
-        )
+        # Chunks like RecursiveCharacterTextSplitter, but on offsets; the token counter
+        # (tiktoken) is only loaded on first use
+        self._text_splitter = None
+    
+    @property
+    def text_splitter(self):
+        """TextChunker for chunk_size/chunk_overlap, created on first use"""
+        with self._lock:
+            if self._text_splitter is None:
+                self._text_splitter = TextChunker(
+                    chunk_size=self.chunk_size,
+                    chunk_overlap=self.chunk_overlap,
+                    length_function=token_length(self.embedding_model) if self.chunk_length == "tokens" else None
+                )
+            return self._text_splitter
     
     def setup_astra_db_connection(self):
         """Initialize connection to AstraDB"""
-        cloud_config = {
-            'secure_connect_bundle': self.astra_db_secure_bundle_path
-        }
-        
-        auth_provider = PlainTextAuthProvider(
-            self.astra_db_client_id, 
-            self.astra_db_client_secret
+        # Sessions are shared process-wide per set of connection parameters
+        self.session = connection_pool.get_session(
+            self.astra_db_secure_bundle_path,
+            self.astra_db_client_id,
+            self.astra_db_client_secret,
+            self.astra_keyspace
         )
         
-        self.cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider)
-        self.session = self.cluster.connect()
-        self.session.set_keyspace(self.astra_keyspace)
-        
-        # Verify collection exists
-        self.verify_collection()
+        # Verify collection exists, once per session
+        connection_pool.verify_once(
+            self.session, f"{self.astra_keyspace}.{self.collection_name}", self.verify_collection
+        )
     
     def verify_collection(self):
         """Verify that the collection exists"""
@@ -106,96 +232,383 @@ class PDFProcessingPipeline:
             print(f"Error verifying collection: {e}")
             raise
     
-    def extract_text_from_pdf(self, pdf_file_path):
-        """Extract text content from a PDF file"""
-        text = ""
+    def iter_pdf_pages(self, pdf_file_path):
+        """Yield the text of each page of a PDF file, one page at a time"""
+        if self.extraction_cache is None:
+            yield from self._iter_pdf_pages(pdf_file_path)
+            return
+        from extraction_cache import CORRUPT_PAGE_ERRORS
+        document_hash = file_digest(pdf_file_path)
+        page_file = self.extraction_cache.open(document_hash)
+        if page_file is not None:
+            self.metrics.increment('extraction_cache_hits_total')
+            yielded = 0
+            error = None
+            with page_file:
+                try:
+                    for page_text in page_file.iter_pages():
+                        yield page_text
+                        yielded += 1
+                except CORRUPT_PAGE_ERRORS as e:
+                    error = e
+            if error is None:
+                return
+            # The pages before the damaged frame are already out: parse the rest, and leave
+            # caching the document again to its next full extraction
+            self.extraction_cache.discard(document_hash, error)
+            yield from self._iter_pdf_pages(pdf_file_path, start=yielded)
+            return
+        self.metrics.increment('extraction_cache_misses_total')
+        yield from self.extraction_cache.record(document_hash, self._iter_pdf_pages(pdf_file_path))
+    
+    def _iter_pdf_pages(self, pdf_file_path, start=0):
+        import PyPDF2
         try:
             with open(pdf_file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(pdf_reader.pages)):
-                    text += pdf_reader.pages[page_num].extract_text()
-            return text
+                for page_num in range(start, len(pdf_reader.pages)):
+                    with self.metrics.timer('stage_seconds', stage='extract_page'):
+                        page_text = pdf_reader.pages[page_num].extract_text()
+                    self.metrics.increment('pages_extracted_total')
+                    yield page_text
+        except Exception as e:
+            print(f"Error extracting text from PDF: {e}")
+            raise
+    
+    def extraction_pool(self):
+        """Process pool for page extraction, started on first use"""
+        with self._lock:
+            if self._extraction_pool is None:
+                self._extraction_pool = ProcessPoolExecutor(max_workers=self.extraction_workers)
+            return self._extraction_pool
+    
+    def extract_pages(self, pdf_file_path):
+        """
+        Extract the text of every page, in page order.
+        Large documents are split into page ranges that worker processes parse
+        independently; small ones are parsed in-process to skip the pool overhead.
+        With an extraction cache, a PDF parsed before is read back from it instead.
+        """
+        with self.metrics.timer('stage_seconds', stage='extract'):
+            if self.extraction_cache is None:
+                return self._extract_pages(pdf_file_path)
+            document_hash = file_digest(pdf_file_path)
+            pages = self.extraction_cache.get(document_hash)
+            if pages is not None:
+                self.metrics.increment('extraction_cache_hits_total')
+                return pages
+            self.metrics.increment('extraction_cache_misses_total')
+            pages = self._extract_pages(pdf_file_path)
+            self.extraction_cache.put(document_hash, pages)
+            return pages
+    
+    def _extract_pages(self, pdf_file_path):
+        if self.extraction_workers <= 1:
+            return list(self._iter_pdf_pages(pdf_file_path))
+        
+        import PyPDF2
+        try:
+            with open(pdf_file_path, 'rb') as file:
+                page_count = len(PyPDF2.PdfReader(file).pages)
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             raise
+        
+        if page_count < self.parallel_min_pages:
+            return list(self._iter_pdf_pages(pdf_file_path))
+        
+        # A few ranges per worker evens out pages that are slower to parse
+        range_count = min(page_count, self.extraction_workers * 2)
+        bounds = [page_count * i // range_count for i in range(range_count + 1)]
+        futures = [
+            self.extraction_pool().submit(extract_page_range, pdf_file_path, start, end)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        
+        pages = []
+        try:
+            for future in futures:
+                pages.extend(future.result())
+        except Exception as e:
+            print(f"Error extracting text from PDF: {e}")
+            raise
+        self.metrics.increment('pages_extracted_total', len(pages))
+        return pages
+    
+    def extract_text_from_pdf(self, pdf_file_path):
+        """Extract text content from a PDF file"""
+        return "".join(self.extract_pages(pdf_file_path))
     
     def split_text(self, text):
         """Split text into chunks"""
-        return self.text_splitter.split_text(text)
+        with self.metrics.timer('stage_seconds', stage='split'):
+            chunks = self.text_splitter.split_text(text)
+        self.metrics.increment('chunks_split_total', len(chunks))
+        return chunks
     
-    def generate_embeddings(self, text_chunks):
-        """Generate embeddings using OpenAI's text-embedding-3-small model"""
-    embeddings = []
+    def split_pages(self, pages):
+        """
+        Split a document's pages into TextChunks carrying their character offsets in
+        "".join(pages) and the page each chunk starts on
+        """
+        with self.metrics.timer('stage_seconds', stage='split'):
+            chunks = self.text_splitter.split_pages(pages)
+        self.metrics.increment('chunks_split_total', len(chunks))
+        return chunks
     
-    # Create client instance
-    client = openai.OpenAI(api_key=self.openai_api_key)
+    def iter_chunks(self, pages):
+        """
+        Split a stream of page texts into TextChunks without holding the whole document.
+        The last chunk of each page is split again together with the next page, so
+        chunks can span page boundaries; unlike split_pages, separators are chosen on that
+        buffered text, so chunk boundaries can differ (see PageChunkStream).
+        """
+        stream = PageChunkStream(self.text_splitter)
+        for page_text in pages:
+            with self.metrics.timer('stage_seconds', stage='split'):
+                chunks = stream.add(page_text)
+            self.metrics.increment('chunks_split_total', len(chunks))
+            yield from chunks
+        chunks = stream.finish()
+        self.metrics.increment('chunks_split_total', len(chunks))
+        yield from chunks
     
-    for chunk in text_chunks:
-        try:
-            response = client.embeddings.create(
-                input=chunk,
-                model=self.embedding_model
-            )
-            # Extract the embedding vector
-            embedding_vector = response.data[0].embedding
-            embeddings.append({
-                'text': chunk,
-                'embedding': embedding_vector
-            })
-        except Exception as e:
-            print(f"Error generating embedding: {e}")
-            continue
-            
-    return embeddings
-    
-    def truncate_embeddings(self, embeddings_data):
-        """Truncate embeddings from 1536 to 768 dimensions"""
-        truncated_embeddings = []
-        
-        for item in embeddings_data:
-            embedding = item['embedding']
-            truncated_embedding = embedding[:self.max_dimensions]
-            truncated_embeddings.append({
-                'text': item['text'],
-                'embedding': truncated_embedding
-            })
-            
-        return truncated_embeddings
+    def iter_embedding_batches(self, chunks, batch_size=None, document_id=None):
+        """
+        Embed and truncate a stream of chunks, yielding one ChunkBatch per batch whose
+        record.index is the chunk's position in the whole stream
+        """
+        batch_size = batch_size or self.stream_batch_size
+        batch = []
+        offset = 0
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield self.embed_chunk_batch(batch, offset, document_id)
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield self.embed_chunk_batch(batch, offset, document_id)
     
-    def store_in_astra_db(self, truncated_embeddings):
-        """Store truncated embeddings in AstraDB"""
-        stored_count = 0
-        for item in truncated_embeddings:
-            try:
-                # Generate a unique ID for each embedding
-                doc_id = str(uuid.uuid4())
-                # Convert the embedding to a proper format for Cassandra
-                vector_value = list(map(float, item['embedding']))
-                
-                # Prepare the insert query
-                insert_query = f"""
+    def embed_chunk_batch(self, chunks, offset=0, document_id=None):
+        """Embed and truncate chunks that start at position offset of the document"""
+        embeddings = self.truncate_embeddings(self.generate_embeddings(chunks, document_id=document_id))
+        # Embedding drops failed chunks, so positions in the batch are not positions in the document
+        for record in embeddings:
+            record.index += offset
+        return embeddings
+    
+    def generate_embeddings(self, text_chunks, dead_letter=True, document_id=None):
+        """
+        Generate embeddings using OpenAI's text-embedding-3-small model for chunk texts or
+        TextChunks. Returns a ChunkBatch; chunks whose request failed are left out (and
+        dead-lettered unless dead_letter is False). document_id (the PDF's content hash) is
+        given to every record, so writes invalidate only that document's cached queries.
+        """
+        from chunk_batch import ChunkBatch, ChunkRecord
+        # Chunks are sent many per request with a bounded number of requests in flight;
+        # results come back in input order
+        with self.metrics.timer('stage_seconds', stage='embed'):
+            vectors = self.embedder.embed([chunk if isinstance(chunk, str) else chunk.text
+                                           for chunk in text_chunks])
+            embeddings = ChunkBatch.from_vectors(text_chunks, vectors)
+        if document_id is not None:
+            for record in embeddings:
+                record.document_id = document_id
+        self.metrics.increment('chunks_embedded_total', len(embeddings))
+        # Failed requests are reported once by the embedder; count every chunk they lost
+        self.metrics.increment('chunks_dropped_total', len(text_chunks) - len(embeddings), stage='embed')
+        if dead_letter and len(embeddings) < len(text_chunks):
+            records = [ChunkRecord.from_chunk(chunk, index)
+                       for index, (chunk, vector) in enumerate(zip(text_chunks, vectors)) if vector is None]
+            for record in records:
+                record.document_id = record.document_id or document_id
+            self.dead_letter('embed', records, "embedding request failed after retries")
+        return embeddings
+    
+    def dead_letter(self, stage, records, error, vectors=None):
+        """
+        Save chunks that failed at a stage to the dead-letter file, if there is one; error is
+        one error for all of them or a list with each record's own
+        """
+        if self.dead_letters is None or not records:
+            return
+        count = self.dead_letters.write(stage, records, error, vectors)
+        self.metrics.increment('chunks_dead_lettered_total', count, stage=stage)
+        print(f"Saved {count} chunks that failed to {stage} to {self.dead_letters.path}; "
+              f"retry them with `python mpl.py replay`")
+    
+    def embed_question(self, question):
+        """
+        Embed a question the way chunks are embedded (model, truncation, normalization), so it
+        can be compared with stored vectors; served from the query cache when possible
+        """
+        from chunk_batch import ChunkBatch
+        
+        def embed(text):
+            embeddings = ChunkBatch.from_vectors([text], self.embedder.embed([text]))
+            if not len(embeddings):
+                raise RuntimeError("Failed to embed the question")
+            return self.truncate_embeddings(embeddings).float_vectors()[0]
+        
+        if self.query_cache is None:
+            return embed(question)
+        return self.query_cache.embedding(f"{self.embedding_model}:{self.max_dimensions}", question, embed)
+    
+    def invalidate_queries(self, document_ids=None):
+        """Make cached query results that may include these documents' chunks stale (all for None)"""
+        if self.query_cache is None:
+            return
+        document_ids = None if document_ids is None else set(document_ids)
+        # Chunks stored without a document id could be in any document's results
+        self.query_cache.invalidate(None if document_ids is None or None in document_ids else document_ids)
+    
+    def truncate_embeddings(self, embeddings):
+        """Truncate embeddings from 1536 to 768 dimensions, in place, and re-normalize them"""
+        embeddings.truncate(self.max_dimensions)
+        if self.quantize_embeddings:
+            embeddings.quantize()
+        return embeddings
+    
+    def insert_statement(self):
+        """Prepared INSERT for the collection, prepared once per session"""
+        return connection_pool.prepare(self.session, f"""
                 INSERT INTO {self.collection_name} (key, query_vector_value, tx_id, vector_id, content) 
-                VALUES ((%s, %s), %s, %s, %s, %s)
-                """
-                
-                # Execute the query
-                self.session.execute(
-                    insert_query, 
-                    (1, doc_id, vector_value, 'now()', doc_id, item['text'])
-                )
-                stored_count += 1
-                
-            except Exception as e:
-                print(f"Error storing in AstraDB: {e}")
-                continue
+                VALUES ((?, ?), ?, now(), ?, ?)
+            """)
+    
+    def insert_parameters(self, truncated_embeddings):
+        """Bound values of the prepared INSERT for each chunk of a batch"""
+        vectors = truncated_embeddings.float_vectors()
+        for record, vector in zip(truncated_embeddings.records, vectors):
+            # Use the caller's row ID if given, else generate a unique one
+            doc_id = record.id or str(uuid.uuid4())
+            # The driver serializes vector columns from a list of floats
+            yield (1, doc_id, vector.tolist(), doc_id, record.text)
+    
+    def record_store(self, truncated_embeddings, stored_count, failures, seconds, dead_letter=True):
+        """Count the outcome of writing one batch"""
+        self.metrics.observe('stage_seconds', seconds, stage='store')
+        self.metrics.increment('chunks_stored_total', stored_count)
+        self.metrics.increment('chunks_dropped_total', len(failures), stage='store')
+        # Vectors are written as float32 whether or not the batch is held quantized
+        self.metrics.increment('storage_bytes_total', 4 * len(truncated_embeddings) * truncated_embeddings.dimensions +
+                               sum(len(record.text.encode('utf-8')) for record in truncated_embeddings))
+        if dead_letter and failures:
+            indices = [failure['index'] for failure in failures]
+            self.dead_letter('store', [truncated_embeddings.records[index] for index in indices],
+                             [failure['error'] for failure in failures],
+                             truncated_embeddings.float_vectors()[indices])
+    
+    def write_retried(self, error, attempt):
+        self.metrics.increment('write_retries_total')
+    
+    def store_in_astra_db(self, truncated_embeddings, dead_letter=True):
+        """
+        Store truncated embeddings in AstraDB.
+        Returns (stored_count, failures) where each failure is a dict with the
+        chunk index, its text and the error; failed chunks are also dead-lettered
+        unless dead_letter is False.
+        """
+        start = time.perf_counter()
+        stored_count, failures = self._store_in_astra_db(truncated_embeddings)
+        self.record_store(truncated_embeddings, stored_count, failures, time.perf_counter() - start, dead_letter)
+        if stored_count:
+            self.invalidate_queries(record.document_id for record in truncated_embeddings)
+        return stored_count, failures
+    
+    def _store_in_astra_db(self, truncated_embeddings):
+        if self.vector_store is not None:
+            return self.vector_store.store_embeddings(truncated_embeddings)
+        
+        # Rows are written concurrently with at most write_concurrency requests in flight
+        stored_count, errors = execute_windowed(
+            self.session, self.insert_statement(), self.insert_parameters(truncated_embeddings),
+            self.write_concurrency, self.write_limiter, self.write_retried
+        )
+        
+        failures = [
+            {'index': index, 'text': truncated_embeddings.records[index].text, 'error': error}
+            for index, error in errors
+        ]
+        return stored_count, failures
+    
+    async def store_in_astra_db_async(self, truncated_embeddings):
+        """store_in_astra_db through the driver's async API; waiting on writes yields to the event loop"""
+        if self.vector_store is not None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.store_in_astra_db, truncated_embeddings
+            )
+        
+        start = time.perf_counter()
+        stored_count, errors = await execute_windowed_async(
+            self.session, self.insert_statement(), self.insert_parameters(truncated_embeddings),
+            self.write_concurrency, self.write_limiter, self.write_retried
+        )
+        failures = [
+            {'index': index, 'text': truncated_embeddings.records[index].text, 'error': error}
+            for index, error in errors
+        ]
+        self.record_store(truncated_embeddings, stored_count, failures, time.perf_counter() - start)
+        if stored_count:
+            self.invalidate_queries(record.document_id for record in truncated_embeddings)
+        return stored_count, failures
+    
+    def delete_from_astra_db(self, row_ids, document_id=None):
+        """
+        Delete stored chunks by row ID; returns (deleted_count, failures). document_id names the
+        document they belong to, when the caller knows
+        """
+        row_ids = list(row_ids)
+        if self.vector_store is not None:
+            deleted_count = self.vector_store.delete_chunks(row_ids)
+            if deleted_count:
+                self.invalidate_queries(None if document_id is None else [document_id])
+            return deleted_count, []
         
-        return stored_count
+        delete_statement = connection_pool.prepare(
+            self.session, f"DELETE FROM {self.collection_name} WHERE key = (?, ?)"
+        )
+        deleted_count, errors = execute_windowed(
+            self.session, delete_statement, ((1, row_id) for row_id in row_ids), self.write_concurrency,
+            self.write_limiter, self.write_retried
+        )
+        # Row ids do not say which documents lost chunks; without document_id assume any
+        if deleted_count:
+            self.invalidate_queries(None if document_id is None else [document_id])
+        return deleted_count, [{'index': index, 'id': row_ids[index], 'error': error} for index, error in errors]
+    
+    def fingerprint_registry(self):
+        """Where document and chunk fingerprints live: next to the local store or the collection"""
+        with self._lock:
+            if self._fingerprints is None:
+                if self.vector_store is not None:
+                    self._fingerprints = LocalFingerprintRegistry(
+                        os.path.join(self.vector_store.directory, "fingerprints.sqlite")
+                    )
+                else:
+                    self._fingerprints = CassandraFingerprintRegistry(
+                        self.session, f"{self.collection_name}_fingerprints"
+                    )
+            return self._fingerprints
     
-    def export_langflow_blueprint(self, output_file="pdf_processor_flow.json"):
+    def export_langflow_blueprint(self, output_file="pdf_processor_flow.json", batch_size=None,
+                                  embedding_concurrency=None, write_concurrency=None):
         """
         Export a Langflow blueprint JSON file that can be imported directly into Langflow
         This is an alternative to using the API for registration
+        
+        The generated nodes work like this pipeline: one OpenAI client and one AstraDB session
+        (with its prepared INSERT) per Langflow worker, reused across runs; chunks embedded
+        batch_size at a time with embedding_concurrency requests in flight; vectors truncated
+        with NumPy; rows written concurrently, write_concurrency at a time. The three settings
+        default to this pipeline's and stay editable as node fields in Langflow.
         """
+        batch_size = min(batch_size or self.embedder.max_batch_size, MAX_INPUTS_PER_REQUEST)
+        embedding_concurrency = embedding_concurrency or self.embedder.max_concurrency
+        write_concurrency = write_concurrency or self.write_concurrency
+        dimensions = self.max_dimensions if self.request_dimensions else None
+        
         blueprint = {
             "name": "PDF to AstraDB Processing Pipeline",
             "description": "Process PDFs and store embeddings in AstraDB",
@@ -226,13 +639,10 @@ class PDFProcessingPipeline:
 import PyPDF2
 
 def extract_text(file_path):
-    text = ""
     with open(file_path, 'rb') as file:
         pdf_reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(pdf_reader.pages)):
-            text += pdf_reader.pages[page_num].extract_text()
-    return text
-                                        """
+        return "".join(page.extract_text() or "" for page in pdf_reader.pages)
+"""
                                     },
                                     "function_name": {"type": "str", "value": "extract_text"},
                                     "input": {"type": "file", "value": ""}
@@ -256,13 +666,80 @@ def extract_text(file_path):
                     },
                     {
                         "id": "openai_embeddings",
-                        "type": "OpenAIEmbeddings",
+                        "type": "PythonFunction",
                         "position": {"x": 700, "y": 100},
                         "data": {
                             "node": {
                                 "template": {
-                                    "openai_api_key": {"type": "str", "value": "${OPENAI_API_KEY}"},
-                                    "model": {"type": "str", "value": self.embedding_model}
+                                    "code": {
+                                        "type": "code",
+                                        "value": f"""
+import os
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from openai import OpenAI
+
+MODEL = {self.embedding_model!r}
+DIMENSIONS = {dimensions!r}
+MAX_TOKENS_PER_REQUEST = {MAX_TOKENS_PER_REQUEST}
+
+# Created on first use and reused by every run of this node
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                             base_url=os.getenv("OPENAI_BASE_URL") or {self.openai_base_url!r},
+                             max_retries=5)
+        return _client
+
+def make_batches(texts, batch_size):
+    # At most batch_size inputs and about MAX_TOKENS_PER_REQUEST tokens (4 characters each) per request
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        estimate = len(text) // 4 + 1
+        if i > start and (i - start >= batch_size or tokens + estimate > MAX_TOKENS_PER_REQUEST):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += estimate
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+def embed_texts(texts, batch_size={batch_size}, max_concurrency={embedding_concurrency}):
+    # Splitter output is LangChain documents or plain strings
+    texts = [getattr(text, 'page_content', text) for text in texts]
+    client = get_client()
+    options = {{'dimensions': DIMENSIONS}} if DIMENSIONS else {{}}
+    
+    def embed_batch(bounds):
+        start, end = bounds
+        # Base64 responses decode straight into float32 arrays
+        response = client.embeddings.create(input=texts[start:end], model=MODEL,
+                                            encoding_format="base64", **options)
+        vectors = [None] * (end - start)
+        for item in response.data:
+            vectors[item.index] = np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+        return vectors
+    
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        batches = list(pool.map(embed_batch, make_batches(texts, batch_size)))
+    vectors = [vector for batch in batches for vector in batch]
+    return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+"""
+                                    },
+                                    "function_name": {"type": "str", "value": "embed_texts"},
+                                    "texts": {"type": "list", "value": ""},
+                                    "batch_size": {"type": "int", "value": batch_size},
+                                    "max_concurrency": {"type": "int", "value": embedding_concurrency}
                                 }
                             }
                         }
@@ -277,18 +754,18 @@ def extract_text(file_path):
                                     "code": {
                                         "type": "code",
                                         "value": f"""
+import numpy as np
+
 def truncate_embedding(embedding_data, max_length={self.max_dimensions}):
-    # Check if we have a single embedding or a list of embeddings
-    if isinstance(embedding_data, list) and all(isinstance(item, list) for item in embedding_data):
-        # We have a list of embeddings (batch processing)
-        return [emb[:max_length] for emb in embedding_data]
-    elif isinstance(embedding_data, list):
-        # We have a single embedding
-        return embedding_data[:max_length]
-    else:
-        # Invalid input
-        raise TypeError("Expected a list (embedding) or list of lists (batch of embeddings)")
-                                        """
+    # A single embedding or a batch of them, as one array
+    vectors = np.asarray(embedding_data, dtype=np.float32)
+    if vectors.ndim not in (1, 2):
+        raise TypeError("Expected an embedding or a batch of embeddings")
+    # Truncated vectors are re-normalized so cosine and dot-product search still agree
+    truncated = vectors[..., :max_length]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.where(norms == 0, 1, norms)
+"""
                                     },
                                     "function_name": {"type": "str", "value": "truncate_embedding"},
                                     "input": {"type": "list", "value": ""}
@@ -307,57 +784,77 @@ def truncate_embedding(embedding_data, max_length={self.max_dimensions}):
                                         "type": "code",
                                         "value": f"""
 import uuid
+import atexit
+import threading
+from collections import deque
+import numpy as np
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
 
-def store_in_astra(embeddings, texts):
-    # AstraDB connection setup
-    cloud_config = {{
-        'secure_connect_bundle': '{self.astra_db_secure_bundle_path}'
-    }}
-    
-    auth_provider = PlainTextAuthProvider(
-        '{self.astra_db_client_id}', 
-        '{self.astra_db_client_secret}'
-    )
-    
-    cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider)
-    session = cluster.connect()
-    session.set_keyspace('{self.astra_keyspace}')
-    
-    # Store embeddings
+SECURE_CONNECT_BUNDLE = {self.astra_db_secure_bundle_path!r}
+CLIENT_ID = {self.astra_db_client_id!r}
+CLIENT_SECRET = {self.astra_db_client_secret!r}
+KEYSPACE = {self.astra_keyspace!r}
+COLLECTION_NAME = {self.collection_name!r}
+
+# One cluster connection and prepared INSERT per Langflow worker, reused by every run of this node
+_session = None
+_insert = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session, _insert
+    with _session_lock:
+        if _session is None:
+            cluster = Cluster(cloud={{'secure_connect_bundle': SECURE_CONNECT_BUNDLE}},
+                              auth_provider=PlainTextAuthProvider(CLIENT_ID, CLIENT_SECRET))
+            session = cluster.connect()
+            session.set_keyspace(KEYSPACE)
+            _insert = session.prepare(
+                f"INSERT INTO {{COLLECTION_NAME}} (key, query_vector_value, tx_id, vector_id, content) "
+                "VALUES ((?, ?), ?, now(), ?, ?)"
+            )
+            atexit.register(cluster.shutdown)
+            _session = session
+        return _session, _insert
+
+def store_in_astra(embeddings, texts, concurrency={write_concurrency}):
+    session, insert = get_session()
+    vectors = np.asarray(embeddings, dtype=np.float32)
     stored_count = 0
-    collection_name = '{self.collection_name}'
+    errors = []
+    in_flight = deque()
     
-    for i, embedding in enumerate(embeddings):
+    def wait_oldest():
+        nonlocal stored_count
         try:
-            # Generate a unique ID
-            doc_id = str(uuid.uuid4())
-            # Convert embedding to proper format
-            vector_value = list(map(float, embedding))
-            text = texts[i] if i < len(texts) else ""
-            
-            # Insert query
-            insert_query = f\"\"\"
-            INSERT INTO {{collection_name}} (key, query_vector_value, tx_id, vector_id, content) 
-            VALUES ((%s, %s), %s, %s, %s, %s)
-            \"\"\"
-            
-            # Execute
-            session.execute(insert_query, (1, doc_id, vector_value, 'now()', doc_id, text))
+            in_flight.popleft().result()
             stored_count += 1
-            
         except Exception as e:
-            print(f"Error storing in AstraDB: {{e}}")
+            errors.append(e)
     
-    # Close connection
-    cluster.shutdown()
+    # Keep at most `concurrency` inserts in flight
+    for i, vector in enumerate(vectors):
+        if len(in_flight) >= concurrency:
+            wait_oldest()
+        doc_id = str(uuid.uuid4())
+        text = getattr(texts[i], 'page_content', texts[i]) if i < len(texts) else ""
+        # The driver serializes vector columns from a list of floats
+        in_flight.append(session.execute_async(insert, (1, doc_id, vector.tolist(), doc_id, text)))
+    while in_flight:
+        wait_oldest()
+    
+    if errors:
+        print(f"Error storing in AstraDB: {{errors[0]}}")
+        return (f"Stored {{stored_count}} embeddings in AstraDB; "
+                f"{{len(errors)}} failed (first error: {{errors[0]}})")
     return f"Successfully stored {{stored_count}} embeddings in AstraDB"
-                                        """
+"""
                                     },
                                     "function_name": {"type": "str", "value": "store_in_astra"},
                                     "embeddings": {"type": "list", "value": ""},
-                                    "texts": {"type": "list", "value": ""}
+                                    "texts": {"type": "list", "value": ""},
+                                    "concurrency": {"type": "int", "value": write_concurrency}
                                 }
                             }
                         }
@@ -392,11 +889,11 @@ def store_in_astra(embeddings, texts):
                         "source": "text_splitter",
                         "sourceHandle": "chunks",
                         "target": "openai_embeddings",
-                        "targetHandle": "documents"
+                        "targetHandle": "texts"
                     },
                     {
                         "source": "openai_embeddings",
-                        "sourceHandle": "embeddings",
+                        "sourceHandle": "output",
                         "target": "truncate_embeddings",
                         "targetHandle": "input"
                     },
@@ -433,24 +930,357 @@ def store_in_astra(embeddings, texts):
             print(f"Error exporting blueprint: {e}")
             return None
     
-    def process_pdf(self, pdf_file_path):
-        """Process a PDF file from start to finish"""
+    @staticmethod
+    def summarize(result):
+        """Human-readable summary of an ingest result"""
+        if result.get('unchanged'):
+            return "PDF is unchanged since it was last ingested; nothing to do"
+        stored_count, failures = result['stored'], result['failures']
+        # Chunks that never got an embedding are not store failures; report them too
+        unembedded = result['chunks'] - result['embeddings'] - result.get('reused', 0)
+        if unembedded > 0:
+            return (f"Processed PDF and stored {stored_count} embeddings in AstraDB; "
+                    f"{unembedded} of {result['chunks']} chunks failed to embed"
+                    + (f" and {len(failures)} failed to store" if failures else ""))
+        if failures:
+            return (f"Processed PDF and stored {stored_count} embeddings in AstraDB; "
+                    f"{len(failures)} chunks failed to store (first error: {failures[0]['error']})")
+        return f"Successfully processed PDF and stored {stored_count} embeddings in AstraDB"
+    
+    @contextmanager
+    def document_span(self, pdf_file_path):
+        """Time one document and run the profiler hook around it"""
+        start = time.perf_counter()
+        try:
+            with self.profiler(pdf_file_path) if self.profiler else nullcontext():
+                yield
+        except BaseException:
+            self.metrics.increment('documents_failed_total')
+            raise
+        finally:
+            self.metrics.observe('document_seconds', time.perf_counter() - start)
+            self.metrics.increment('documents_total')
+    
+    def ingest_pdf(self, pdf_file_path):
+        """
+        Process a PDF file from start to finish and return per-stage counts:
+        pages, chunks, embeddings, stored and the list of store failures
+        """
+        with self.document_span(pdf_file_path):
+            return self._ingest_pdf(pdf_file_path)
+    
+    def _ingest_pdf(self, pdf_file_path):
+        if self.incremental:
+            return self.ingest_pdf_incremental(pdf_file_path)
+        
         # 1. Extract text from PDF
-        text = self.extract_text_from_pdf(pdf_file_path)
+        pages = self.extract_pages(pdf_file_path)
         
-        # 2. Split text into chunks
-        text_chunks = self.split_text(text)
+        # 2. Split text into chunks, keeping their offsets and pages
+        text_chunks = self.split_pages(pages)
         
-        # 3. Generate embeddings
-        embeddings = self.generate_embeddings(text_chunks)
+        # 3. Generate embeddings, tagged with the document's content hash
+        embeddings = self.generate_embeddings(text_chunks, document_id=file_digest(pdf_file_path))
         
         # 4. Truncate embeddings to 768 dimensions
         truncated_embeddings = self.truncate_embeddings(embeddings)
         
         # 5. Store in AstraDB
-        stored_count = self.store_in_astra_db(truncated_embeddings)
+        stored_count, failures = self.store_in_astra_db(truncated_embeddings)
         
-        return f"Successfully processed PDF and stored {stored_count} embeddings in AstraDB"
+        return {
+            'pages': len(pages),
+            'chunks': len(text_chunks),
+            'embeddings': len(embeddings),
+            'stored': stored_count,
+            'failures': failures
+        }
+    
+    def ingest_pdf_incremental(self, pdf_file_path, document_key=None):
+        """
+        Re-ingest a PDF against its previous fingerprints: an unchanged file is a no-op,
+        otherwise only new chunks are embedded and written and vanished chunks are deleted.
+        Returns the ingest_pdf counts plus 'unchanged', 'reused' and 'deleted'.
+        """
+        document_key = document_key or os.path.abspath(pdf_file_path)
+        registry = self.fingerprint_registry()
+        document_hash = file_digest(pdf_file_path)
+        previous_hash, previous_chunks = registry.get(document_key)
+        
+        if previous_hash == document_hash:
+            return {'pages': 0, 'chunks': len(previous_chunks), 'embeddings': 0, 'stored': 0,
+                    'failures': [], 'unchanged': True, 'reused': len(previous_chunks), 'deleted': 0}
+        
+        pages = self.extract_pages(pdf_file_path)
+        text_chunks = self.split_pages(pages)
+        fingerprints = chunk_fingerprints([chunk.text for chunk in text_chunks])
+        
+        # Chunks whose fingerprint was stored before keep their rows
+        current = {fingerprint: previous_chunks[fingerprint]
+                   for fingerprint in fingerprints if fingerprint in previous_chunks}
+        new_chunks = [(fingerprint, chunk) for fingerprint, chunk in zip(fingerprints, text_chunks)
+                      if fingerprint not in previous_chunks]
+        
+        # A partly failed document stays marked as changed, so the next run re-embeds and
+        # writes the missing chunks itself; replaying dead letters too would duplicate rows
+        embeddings = self.generate_embeddings([chunk for _, chunk in new_chunks], dead_letter=False,
+                                              document_id=document_hash)
+        truncated_embeddings = self.truncate_embeddings(embeddings)
+        
+        for record in truncated_embeddings:
+            record.id = str(uuid.uuid4())
+        
+        stored_count, failures = self.store_in_astra_db(truncated_embeddings, dead_letter=False)
+        failed = {failure['index'] for failure in failures}
+        for index, record in enumerate(truncated_embeddings):
+            if index not in failed:
+                # record.index is the chunk's position in new_chunks
+                current[new_chunks[record.index][0]] = record.id
+        
+        stale = [row_id for fingerprint, row_id in previous_chunks.items() if fingerprint not in current]
+        # Stale rows were written under the previous version's hash, unless it was never complete
+        deleted_count, delete_failures = self.delete_from_astra_db(stale, previous_hash)
+        
+        # Only mark the document as up to date once every chunk is stored, so a
+        # partially failed run is diffed again next time
+        complete = len(current) == len(fingerprints) and not delete_failures
+        registry.put(document_key, document_hash if complete else None, current)
+        
+        return {
+            'pages': len(pages),
+            'chunks': len(text_chunks),
+            'embeddings': len(embeddings),
+            'stored': stored_count,
+            'failures': failures + delete_failures,
+            'unchanged': False,
+            'reused': len(text_chunks) - len(new_chunks),
+            'deleted': deleted_count
+        }
+    
+    def process_pdf(self, pdf_file_path):
+        """Process a PDF file from start to finish"""
+        return self.summarize(self.ingest_pdf(pdf_file_path))
+    
+    def ingest_pdf_streaming(self, pdf_file_path, batch_size=None, max_in_flight=None):
+        """
+        Process a PDF page by page: pages -> chunks -> embedding batches -> writes.
+        At most max_in_flight batches are being written while the next one is embedded,
+        so peak memory depends on the batch size rather than on the size of the PDF.
+        Returns the same counts as ingest_pdf.
+        """
+        with self.document_span(pdf_file_path):
+            return self._ingest_pdf_streaming(pdf_file_path, batch_size, max_in_flight)
+    
+    def _ingest_pdf_streaming(self, pdf_file_path, batch_size, max_in_flight):
+        max_in_flight = max_in_flight or self.max_in_flight_batches
+        counts = {'pages': 0, 'chunks': 0}
+        
+        def counted(items, key):
+            for item in items:
+                counts[key] += 1
+                yield item
+        
+        batches = self.iter_embedding_batches(
+            counted(self.iter_chunks(counted(self.iter_pdf_pages(pdf_file_path), 'pages')), 'chunks'),
+            batch_size, file_digest(pdf_file_path)
+        )
+        
+        stored_count = 0
+        embedded_count = 0
+        failures = []
+        pending = deque()
+        
+        def finish_oldest():
+            nonlocal stored_count
+            batch, future = pending.popleft()
+            stored, batch_failures = future.result()
+            stored_count += stored
+            # Failures index the batch's records; report the chunk's position in the document
+            for failure in batch_failures:
+                failures.append(dict(failure, index=batch.records[failure['index']].index))
+        
+        with ThreadPoolExecutor(max_workers=max_in_flight) as writer:
+            for batch in batches:
+                if len(pending) >= max_in_flight:
+                    finish_oldest()
+                pending.append((batch, writer.submit(self.store_in_astra_db, batch)))
+                embedded_count += len(batch)
+            while pending:
+                finish_oldest()
+        
+        return {
+            'pages': counts['pages'],
+            'chunks': counts['chunks'],
+            'embeddings': embedded_count,
+            'stored': stored_count,
+            'failures': failures
+        }
+    
+    def process_pdf_streaming(self, pdf_file_path, batch_size=None, max_in_flight=None):
+        """Streaming variant of process_pdf with bounded memory"""
+        return self.summarize(self.ingest_pdf_streaming(pdf_file_path, batch_size, max_in_flight))
+    
+    async def ingest_pdf_async(self, pdf_file_path, batch_size=None, queue_size=None):
+        """
+        Process a PDF with extraction, embedding and storage running at the same time.
+        Pages are parsed and chunked in a worker thread, up to max_in_flight_batches
+        embedding batches are awaited concurrently and writes use the driver's async API.
+        The stages are joined by queues holding at most queue_size batches, so a slow
+        stage holds back the ones before it. Returns the same counts as ingest_pdf.
+        In incremental mode the document goes through ingest_pdf_incremental instead, in a
+        worker thread, since only that path consults the fingerprint registry.
+        """
+        with self.document_span(pdf_file_path):
+            if self.incremental:
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self.ingest_pdf_incremental, pdf_file_path
+                )
+            return await self._ingest_pdf_async(pdf_file_path, batch_size, queue_size)
+    
+    async def _ingest_pdf_async(self, pdf_file_path, batch_size, queue_size):
+        batch_size = batch_size or self.stream_batch_size
+        queue_size = queue_size or self.max_in_flight_batches
+        loop = asyncio.get_running_loop()
+        chunk_batches = asyncio.Queue(maxsize=queue_size)
+        embedded_batches = asyncio.Queue(maxsize=queue_size)
+        stopped = threading.Event()
+        counts = {'pages': 0, 'chunks': 0, 'embeddings': 0, 'stored': 0}
+        failures = []
+        document_id = await loop.run_in_executor(None, file_digest, pdf_file_path)
+        # Extraction plus one thread per embedding batch in flight
+        workers = ThreadPoolExecutor(max_workers=self.max_in_flight_batches + 1,
+                                     thread_name_prefix="ingest-async")
+        
+        def put_from_thread(batch):
+            # Blocks the extraction thread while the queue is full, until the pipeline stops
+            if stopped.is_set():
+                raise RuntimeError("Ingestion stopped")
+            future = asyncio.run_coroutine_threadsafe(chunk_batches.put(batch), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.1)
+                except FutureTimeoutError:
+                    if stopped.is_set():
+                        future.cancel()
+                        raise RuntimeError("Ingestion stopped")
+        
+        def extract():
+            def pages():
+                for page_text in self.iter_pdf_pages(pdf_file_path):
+                    counts['pages'] += 1
+                    yield page_text
+            
+            batch = []
+            for chunk in self.iter_chunks(pages()):
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    put_from_thread(batch)
+                    batch = []
+            if batch:
+                put_from_thread(batch)
+        
+        extraction = loop.run_in_executor(workers, extract)
+        
+        async def extract_stage():
+            try:
+                await extraction
+            finally:
+                if not stopped.is_set():
+                    await chunk_batches.put(None)
+        
+        async def embed_stage():
+            # Batches are handed on in document order
+            in_flight = deque()
+            while True:
+                batch = await chunk_batches.get()
+                if batch is None:
+                    break
+                if len(in_flight) >= self.max_in_flight_batches:
+                    await embedded_batches.put(await in_flight.popleft())
+                # Records are numbered by their position in the document
+                in_flight.append(loop.run_in_executor(workers, self.embed_chunk_batch, batch, counts['chunks'],
+                                                      document_id))
+                counts['chunks'] += len(batch)
+            while in_flight:
+                await embedded_batches.put(await in_flight.popleft())
+            await embedded_batches.put(None)
+        
+        async def store_stage():
+            while True:
+                batch = await embedded_batches.get()
+                if batch is None:
+                    break
+                stored, batch_failures = await self.store_in_astra_db_async(batch)
+                counts['embeddings'] += len(batch)
+                counts['stored'] += stored
+                for failure in batch_failures:
+                    failures.append(dict(failure, index=batch.records[failure['index']].index))
+        
+        stages = [asyncio.ensure_future(stage()) for stage in (extract_stage, embed_stage, store_stage)]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            stopped.set()
+            for stage in stages:
+                stage.cancel()
+            # Let the extraction thread notice the stop before the loop goes away
+            await asyncio.wait([extraction])
+            raise
+        finally:
+            workers.shutdown(wait=False)
+        
+        return dict(counts, failures=failures)
+    
+    async def process_pdf_async(self, pdf_file_path, batch_size=None, queue_size=None):
+        """asyncio variant of process_pdf with overlapped stages"""
+        return self.summarize(await self.ingest_pdf_async(pdf_file_path, batch_size, queue_size))
+    
+    def replay_dead_letters(self, batch_size=None):
+        """
+        Retry the chunks in the dead-letter file: chunks that failed to embed are embedded and
+        stored, chunks that failed to store are written with their saved vectors. Chunks that
+        fail again go back into the file. Returns counts: replayed, embedded, stored, failed.
+        """
+        import numpy as np
+        from chunk_batch import ChunkBatch, ChunkRecord
+        if self.dead_letters is None:
+            raise ValueError("No dead-letter file configured: set DEAD_LETTER_PATH or pass a path")
+        entries, taken = self.dead_letters.take()
+        batch_size = batch_size or self.stream_batch_size
+        counts = {'replayed': len(entries), 'embedded': 0, 'stored': 0, 'failed': 0}
+        
+        def record(entry, index):
+            return ChunkRecord(entry['text'], index, id=entry.get('id'), document_id=entry.get('document_id'),
+                               start=entry.get('start'), end=entry.get('end'), page=entry.get('page'))
+        
+        for stage in ('embed', 'store'):
+            selected = [entry for entry in entries if entry['stage'] == stage]
+            for first in range(0, len(selected), batch_size):
+                batch = selected[first:first + batch_size]
+                records = [record(entry, index) for index, entry in enumerate(batch)]
+                if stage == 'embed':
+                    embeddings = self.truncate_embeddings(self.generate_embeddings(records))
+                    counts['embedded'] += len(embeddings)
+                    counts['failed'] += len(records) - len(embeddings)
+                else:
+                    embeddings = ChunkBatch(records, np.stack([entry_vector(entry) for entry in batch]))
+                stored, failures = self.store_in_astra_db(embeddings)
+                counts['stored'] += stored
+                counts['failed'] += len(failures)
+        
+        if taken is not None:
+            os.remove(taken)
+        return counts
+    
+    def close(self):
+        """
+        Release worker pools and clients held by the pipeline. The AstraDB session is
+        shared and stays open until connection_pool.shutdown() or interpreter exit.
+        """
+        if self._extraction_pool is not None:
+            self._extraction_pool.shutdown()
+            self._extraction_pool = None
+        self.embedder.close()
 
 # Create a Python class for direct Langflow import
 class PDFProcessor:
@@ -469,6 +1299,7 @@ class PDFProcessor:
                 max_dimensions=768):
         
         # Use environment variables if parameters not provided
+        load_environment()
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         self.astra_db_secure_bundle_path = astra_db_secure_bundle_path or os.getenv("ASTRA_DB_SECURE_BUNDLE_PATH")
         self.astra_db_client_id = astra_db_client_id or os.getenv("ASTRA_DB_CLIENT_ID")
@@ -479,10 +1310,28 @@ class PDFProcessor:
         self.chunk_size = int(chunk_size or os.getenv("CHUNK_SIZE", 1000))
         self.chunk_overlap = int(chunk_overlap or os.getenv("CHUNK_OVERLAP", 200))
         self.max_dimensions = int(max_dimensions or os.getenv("MAX_DIMENSIONS", 768))
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL")
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+        self.local_vector_store_path = os.getenv("LOCAL_VECTOR_STORE_PATH")
+        self.query_cache_path = os.getenv("QUERY_CACHE_PATH")
+        self.dead_letter_path = os.getenv("DEAD_LETTER_PATH")
+        self.extraction_cache_path = os.getenv("EXTRACTION_CACHE_PATH")
     
-    def process_pdf(self, pdf_file_path):
-        """Process a PDF file and store embeddings in AstraDB"""
-        pipeline = PDFProcessingPipeline(
+    def pipeline(self):
+        """
+        The process-wide pipeline for this component's settings, built on first use.
+        Components with the same settings share one pipeline, its embedder and session.
+        """
+        key = (
+            connection_pool.session_key(self.astra_db_secure_bundle_path, self.astra_db_client_id,
+                                        self.astra_db_client_secret, self.astra_keyspace),
+            connection_pool.session_key(None, None, self.openai_api_key, None),
+            self.collection_name, self.embedding_model, self.chunk_size, self.chunk_overlap,
+            self.max_dimensions, self.openai_base_url, self.embedding_cache_path,
+            self.local_vector_store_path, self.query_cache_path, self.dead_letter_path,
+            self.extraction_cache_path
+        )
+        return connection_pool.get_pipeline(key, lambda: PDFProcessingPipeline(
             openai_api_key=self.openai_api_key,
             astra_db_secure_bundle_path=self.astra_db_secure_bundle_path,
             astra_db_client_id=self.astra_db_client_id,
@@ -492,18 +1341,38 @@ class PDFProcessor:
             embedding_model=self.embedding_model,
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            max_dimensions=self.max_dimensions
-        )
-        
-        return pipeline.process_pdf(pdf_file_path)
+            max_dimensions=self.max_dimensions,
+            openai_base_url=self.openai_base_url,
+            embedding_cache_path=self.embedding_cache_path,
+            vector_store=(connection_pool.local_store(self.local_vector_store_path)
+                          if self.local_vector_store_path else None),
+            query_cache=connection_pool.query_cache(self.query_cache_path) if self.query_cache_path else None,
+            dead_letter_path=self.dead_letter_path,
+            extraction_cache_path=self.extraction_cache_path
+        ))
+    
+    def process_pdf(self, pdf_file_path):
+        """Process a PDF file and store embeddings in AstraDB"""
+        return self.pipeline().process_pdf(pdf_file_path)
 
-# Main execution function for testing outside of Langflow
-def main():
-    # Load environment variables
-    load_dotenv()
+def local_vector_store(path):
+    from local_vector_store import LocalVectorStore
+    return LocalVectorStore(path)
+
+def pipeline_from_env():
+    """Build a pipeline from environment variables (see .env)"""
+    load_environment()
+    # LOCAL_VECTOR_STORE_PATH switches storage from AstraDB to a local vector index
+    local_store_path = os.getenv("LOCAL_VECTOR_STORE_PATH")
     
-    # Example usage
-    pdf_processor = PDFProcessingPipeline(
+    # PIPELINE_PROFILE=cprofile|sampling profiles every document into PIPELINE_PROFILE_DIR
+    profile_dir = os.getenv("PIPELINE_PROFILE_DIR", "profiles")
+    profiler = {
+        "cprofile": lambda: cprofile_hook(profile_dir),
+        "sampling": lambda: sampling_profile_hook(profile_dir),
+    }.get(os.getenv("PIPELINE_PROFILE", ""), lambda: None)()
+    
+    pipeline = PDFProcessingPipeline(
         openai_api_key=os.getenv("OPENAI_API_KEY"),
         astra_db_secure_bundle_path=os.getenv("ASTRA_DB_SECURE_BUNDLE_PATH"),
         astra_db_client_id=os.getenv("ASTRA_DB_CLIENT_ID"),
@@ -513,15 +1382,124 @@ def main():
         embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
         chunk_size=int(os.getenv("CHUNK_SIZE", 1000)),
         chunk_overlap=int(os.getenv("CHUNK_OVERLAP", 200)),
-        max_dimensions=int(os.getenv("MAX_DIMENSIONS", 768))
+        chunk_length=os.getenv("CHUNK_LENGTH", "characters"),
+        max_dimensions=int(os.getenv("MAX_DIMENSIONS", 768)),
+        openai_base_url=os.getenv("OPENAI_BASE_URL"),
+        embedding_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", MAX_INPUTS_PER_REQUEST)),
+        embedding_max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4)),
+        embedding_max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 2)),
+        embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH"),
+        write_concurrency=int(os.getenv("WRITE_CONCURRENCY", 32)),
+        vector_store=local_vector_store(local_store_path) if local_store_path else None,
+        stream_batch_size=int(os.getenv("STREAM_BATCH_SIZE", 256)),
+        max_in_flight_batches=int(os.getenv("MAX_IN_FLIGHT_BATCHES", 2)),
+        extraction_workers=int(os.getenv("EXTRACTION_WORKERS", 1)),
+        incremental=os.getenv("INCREMENTAL_INGEST") == "1",
+        request_dimensions=os.getenv("REQUEST_DIMENSIONS") == "1",
+        quantize_embeddings=os.getenv("QUANTIZE_EMBEDDINGS") == "1",
+        profiler=profiler,
+        # QUERY_CACHE_PATH is shared with astraDBClient.py query, which sees this pipeline's invalidations
+        query_cache=connection_pool.query_cache(os.getenv("QUERY_CACHE_PATH")) if os.getenv("QUERY_CACHE_PATH") else None,
+        # Quotas of the embeddings endpoint and the AstraDB write budget; unset means only
+        # adaptive concurrency and retries
+        embedding_requests_per_minute=float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 0)) or None,
+        embedding_tokens_per_minute=float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 0)) or None,
+        writes_per_second=float(os.getenv("ASTRA_WRITES_PER_SECOND", 0)) or None,
+        # Latency growth (as a multiple of the best recent latency) that trims concurrency; 0 disables
+        write_latency_tolerance=float(os.getenv("ASTRA_WRITE_LATENCY_TOLERANCE", 3.0)) or None,
+        embedding_latency_tolerance=float(os.getenv("EMBEDDING_LATENCY_TOLERANCE", 0)) or None,
+        # DEAD_LETTER_PATH keeps chunks that still fail after retries; unset drops them as before
+        dead_letter_path=os.getenv("DEAD_LETTER_PATH"),
+        # EXTRACTION_CACHE_PATH keeps page texts so changing chunking or the model skips PDF parsing
+        extraction_cache_path=os.getenv("EXTRACTION_CACHE_PATH")
     )
     
+    # METRICS_PORT serves the pipeline's metrics in Prometheus text format at /metrics
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(pipeline.metrics, int(os.getenv("METRICS_PORT")))
+    return pipeline
+
+def batch_main(argv):
+    """Non-interactive ingestion of many PDFs through one shared pipeline"""
+    import argparse
+    from batch_ingest import collect_pdf_paths, run_batch
+    
+    parser = argparse.ArgumentParser(prog="mpl.py batch", description="Ingest many PDFs into AstraDB")
+    parser.add_argument("inputs", nargs="*", help="PDF files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--manifest", help="Text file listing one PDF path per line")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.jsonl",
+                        help="Progress file; files recorded as done are skipped on the next run")
+    parser.add_argument("--concurrency", type=int, default=4, help="PDFs processed at the same time")
+    parser.add_argument("--streaming", action="store_true", help="Use bounded-memory streaming ingestion")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged PDFs and re-embed only changed chunks")
+    args = parser.parse_args(argv)
+    
+    paths = collect_pdf_paths(args.inputs, args.manifest)
+    if not paths:
+        parser.error("no PDF files found")
+    
+    pipeline = pipeline_from_env()
+    if args.incremental:
+        pipeline.incremental = True
+    ingest = pipeline.ingest_pdf_streaming if args.streaming and not pipeline.incremental else pipeline.ingest_pdf
+    try:
+        # Only an incremental ingest can retry a partly failed PDF without storing its chunks twice
+        totals = run_batch(ingest, paths, args.checkpoint, args.concurrency, retry_partial=pipeline.incremental)
+    finally:
+        pipeline.close()
+    return 0 if totals['failed'] == 0 and totals['partial'] == 0 else 1
+
+def replay_main(argv):
+    """Retry the chunks saved in the dead-letter file"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="mpl.py replay",
+                                     description="Embed and store chunks that failed in earlier runs")
+    parser.add_argument("path", nargs="?",
+                        help="Dead-letter file (default: DEAD_LETTER_PATH)")
+    args = parser.parse_args(argv)
+    
+    pipeline = pipeline_from_env()
+    if args.path:
+        pipeline.dead_letters = DeadLetterFile(args.path)
+    try:
+        counts = pipeline.replay_dead_letters()
+    finally:
+        pipeline.close()
+    print(f"Replayed {counts['replayed']} chunks: {counts['stored']} stored, {counts['failed']} failed again")
+    return 0 if counts['failed'] == 0 else 1
+
+# Main execution function for testing outside of Langflow
+def main():
+    # Load environment variables
+    load_environment()
+    
+    # `python mpl.py batch ...` ingests whole corpora without prompting
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    # `python mpl.py replay [PATH]` retries dead-lettered chunks
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        sys.exit(replay_main(sys.argv[2:]))
+    
+    # Example usage
+    pdf_processor = pipeline_from_env()
+    
     # Process a PDF
     pdf_path = input("Enter the path to your PDF file: ")
     # Remove any quotes that might have been included in the input
     pdf_path = pdf_path.strip('"\'')
     
-    result = pdf_processor.process_pdf(pdf_path)
+    # STREAMING_INGEST=1 keeps memory bounded on very large PDFs;
+    # ASYNC_INGEST=1 also overlaps extraction, embedding and storage.
+    # Incremental ingestion (INCREMENTAL_INGEST=1) needs the fingerprint registry, which only
+    # process_pdf consults, so it takes precedence like in batch_main
+    if os.getenv("ASYNC_INGEST") == "1" and not pdf_processor.incremental:
+        result = asyncio.run(pdf_processor.process_pdf_async(pdf_path))
+    elif os.getenv("STREAMING_INGEST") == "1" and not pdf_processor.incremental:
+        result = pdf_processor.process_pdf_streaming(pdf_path)
+    else:
+        result = pdf_processor.process_pdf(pdf_path)
     print(result)
     
     # Export a Langflow blueprint
@@ -537,4 +1515,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
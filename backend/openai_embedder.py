@@ -0,0 +1,188 @@
+# openai_embedder.py
+# Batched, concurrent client for the OpenAI embeddings endpoint used by PDFProcessingPipeline
+#
+# openai and numpy are imported on first use, so importing this module
+# (for its request limits) stays cheap.
+
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+
+# Request limits of the embeddings endpoint
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300000
+MAX_TOKENS_PER_INPUT = 8191
+
+
+def retryable_errors():
+    """Errors worth retrying: connection problems, timeouts, rate limits and 5xx responses"""
+    import openai
+    return (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def is_throttled(error):
+    """Errors that mean the endpoint is overloaded, not just a dropped connection"""
+    import openai
+    return isinstance(error, (openai.RateLimitError, openai.InternalServerError, openai.APITimeoutError))
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class OpenAIEmbedder:
+    """Embeds many texts per request with a bounded number of requests in flight"""
+
+    def __init__(self,
+                 api_key,
+                 model="text-embedding-3-small",
+                 base_url=None,
+                 max_batch_size=MAX_INPUTS_PER_REQUEST,
+                 max_batch_tokens=MAX_TOKENS_PER_REQUEST,
+                 max_concurrency=4,
+                 timeout=60.0,
+                 cache=None,
+                 dimensions=None,
+                 max_retries=2,
+                 metrics=None,
+                 limiter=None):
+
+        self.model = model
+        # When set, the API returns vectors already shortened to this many dimensions
+        self.dimensions = dimensions
+        self.max_batch_size = min(max_batch_size, MAX_INPUTS_PER_REQUEST)
+        self.max_batch_tokens = min(max_batch_tokens, MAX_TOKENS_PER_REQUEST)
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.max_retries = max_retries
+        # Optional PipelineMetrics receiving request, retry, token and cache counts
+        self.metrics = metrics
+        # Request/token quotas, adaptive concurrency and retries; pass a shared RateLimiter to
+        # make several embedders respect one quota
+        self.limiter = limiter or RateLimiter("embeddings", max_concurrency=max_concurrency,
+                                              throttled=is_throttled, max_retries=max_retries,
+                                              max_delay=8.0, metrics=metrics)
+
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                           thread_name_prefix="openai-embed")
+
+    @property
+    def client(self):
+        """
+        One client for the lifetime of the embedder so its connection pool is reused,
+        created (and openai imported) by the first request
+        """
+        with self._client_lock:
+            if self._client is None:
+                import openai
+                # Retries happen in embed_batch, where they can be counted
+                self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             timeout=self.timeout, max_retries=0)
+            return self._client
+
+    def make_batches(self, texts):
+        """Group consecutive texts into (start, end) ranges that respect the request limits"""
+        batches = []
+        start = 0
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+            if i > start and (i - start >= self.max_batch_size or
+                              batch_tokens + tokens > self.max_batch_tokens):
+                batches.append((start, i))
+                start = i
+                batch_tokens = 0
+            batch_tokens += tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def embed_batch(self, texts):
+        """Embed one batch with a single request, returning float32 vectors in input order"""
+        options = {'dimensions': self.dimensions} if self.dimensions else {}
+        tokens = sum(min(estimate_tokens(text), MAX_TOKENS_PER_INPUT) for text in texts)
+        if self.metrics is not None:
+            self.metrics.increment('embedding_requests_total')
+            self.metrics.increment('embedding_input_tokens_total', tokens)
+            self.metrics.increment('embedding_request_bytes_total',
+                                   sum(len(text.encode('utf-8')) for text in texts))
+
+        client = self.client
+
+        def request():
+            start = time.perf_counter()
+            try:
+                # Base64 responses decode straight into float32 arrays, skipping a JSON float per dimension
+                return client.embeddings.create(input=texts, model=self.model,
+                                                encoding_format="base64", **options)
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe('embedding_request_seconds', time.perf_counter() - start)
+
+        def retried(error, attempt):
+            if self.metrics is not None:
+                self.metrics.increment('embedding_retries_total')
+
+        try:
+            response = self.limiter.call(request, tokens=tokens, retryable=retryable_errors(),
+                                         on_retry=retried)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.increment('embedding_request_failures_total')
+            raise
+
+        import numpy as np
+        vectors = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+        return vectors
+
+    def embed(self, texts):
+        """
+        Embed all texts and return a list aligned with the input.
+        Entries whose request failed are None.
+        """
+        if self.cache is not None:
+            texts = list(texts)
+            computed = 0
+
+            def compute(missing):
+                nonlocal computed
+                computed += len(missing)
+                return self._embed_uncached(missing)
+
+            vectors = self.cache.get_or_compute(self.model, self.dimensions, texts, compute)
+            if self.metrics is not None:
+                self.metrics.increment('embedding_cache_misses_total', computed)
+                self.metrics.increment('embedding_cache_hits_total', len(texts) - computed)
+            return vectors
+        return self._embed_uncached(texts)
+
+    def _embed_uncached(self, texts):
+        texts = list(texts)
+        results = [None] * len(texts)
+        batches = self.make_batches(texts)
+        futures = [(start, end, self.executor.submit(self.embed_batch, texts[start:end]))
+                   for start, end in batches]
+
+        for start, end, future in futures:
+            try:
+                results[start:end] = future.result()
+            except Exception as e:
+                print(f"Error generating embeddings for chunks {start}-{end - 1}: {e}")
+
+        return results
+
+    def close(self):
+        """Release the worker threads and the HTTP connection pool"""
+        self.executor.shutdown(wait=True)
+        if self._client is not None:
+            self._client.close()
@@ -1,19 +1,87 @@
 # pdf_processor.py
+#
+# Argument mode (one embedding for the whole paper, as a JSON list):
+#   python pdf_processor.py <pdf_path> <pdf_name> <text_file> <embedding_json>
+#
+# Binary mode (one vector per chunk, documents of any size):
+#   python pdf_processor.py --vectors chunks.f32 [--batch-size 20] < metadata.json
+#   metadata: {"pdf_path": ..., "pdf_name": ..., "text_path": ..., "dimensions": 384,
+#              "chunks": [{"start": 0, "end": 812, "page": 1}, ...]}
+#
+# Binary-mode vectors are raw float32 or .npy (see vector_io.py), one row per entry of "chunks";
+# without "chunks" a single vector covers the whole text. Chunks are written with insert_many,
+# batch_size documents per request.
 import sys
 import json
 import os
-from astrapy.db import AstraDB
+import argparse
+from fingerprints import file_digest
+from query_cache import invalidate_documents
+
+# The Data API accepts at most 20 documents per insertMany request
+DEFAULT_INSERT_BATCH_SIZE = int(os.environ.get('ASTRA_INSERT_BATCH_SIZE', 20))
+
+def fail(message):
+    print(json.dumps({ "error": message }))
+    sys.exit(1)
+
+if len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+    from vector_io import read_vectors, read_metadata
+
+    parser = argparse.ArgumentParser(description="Store a paper's chunk embeddings")
+    parser.add_argument('--vectors', required=True, help="Raw float32 or .npy file (or pipe), one row per chunk")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_INSERT_BATCH_SIZE,
+                        help="Chunks per insert_many request")
+    args = parser.parse_args()
 
-# Get args
-pdf_path = sys.argv[1]
-pdf_name = sys.argv[2]
-text_file_path = sys.argv[3]
-embedding = json.loads(sys.argv[4])
+    metadata = read_metadata()
+    pdf_path = metadata['pdf_path']
+    pdf_name = metadata['pdf_name']
+    text_file_path = metadata['text_path']
+    embeddings = read_vectors(args.vectors, metadata.get('dimensions'))
+    chunks = metadata.get('chunks') or [{}]
+    batch_size = args.batch_size
+else:
+    # Get args
+    pdf_path = sys.argv[1]
+    pdf_name = sys.argv[2]
+    text_file_path = sys.argv[3]
+    embeddings = [json.loads(sys.argv[4])]
+    chunks = [{}]
+    batch_size = DEFAULT_INSERT_BATCH_SIZE
+
+if len(embeddings) != len(chunks):
+    fail(f"Got {len(embeddings)} vectors for {len(chunks)} chunks")
 
 # Load text
 with open(text_file_path, 'r', encoding='utf-8') as f:
     text = f.read()
 
+# A chunk without offsets is the whole text
+texts = [text[chunk.get('start', 0):chunk.get('end', len(text))] for chunk in chunks]
+
+# Identical PDFs hash the same; a re-upload returns the stored document instead of a duplicate
+content_hash = file_digest(pdf_path)
+
+# LOCAL_VECTOR_STORE_PATH stores the document in a local vector index instead of AstraDB
+local_store_path = os.environ.get('LOCAL_VECTOR_STORE_PATH')
+
+if local_store_path:
+    from local_vector_store import LocalVectorStore
+
+    store = LocalVectorStore(local_store_path)
+    document_id = content_hash
+    if store.has_document(document_id):
+        print(json.dumps({ "documentId": document_id, "unchanged": True }))
+        sys.exit(0)
+    store.add(embeddings, texts, document_ids=[document_id] * len(texts),
+              metadatas=[dict(chunk, name=pdf_name) for chunk in chunks])
+    invalidate_documents([document_id])
+    print(json.dumps({ "documentId": document_id }))
+    sys.exit(0)
+
+from astrapy.db import AstraDB
+
 # Astra DB config from environment
 db = AstraDB(
     token=os.environ['ASTRA_DB_APPLICATION_TOKEN'],
@@ -23,11 +91,41 @@ db = AstraDB(
 
 # Insert document
 collection = db.collection("uploads")
-doc = {
-    "name": pdf_name,
-    "text": text,
-    "embedding": embedding
-}
-
-result = collection.insert_one(doc)
-print(json.dumps({ "documentId": result["documentId"] }))
+existing = collection.find_one({"content_hash": content_hash})
+if existing and existing.get("data", {}).get("document"):
+    document = existing["data"]["document"]
+    print(json.dumps({ "documentId": document.get("document_id", document["_id"]), "unchanged": True }))
+    sys.exit(0)
+
+def chunk_document(index):
+    vector = embeddings[index]
+    doc = dict(chunks[index],
+               name=pdf_name,
+               text=texts[index],
+               document_id=content_hash,
+               chunk_index=index,
+               chunk_count=len(chunks),
+               embedding=vector.tolist() if hasattr(vector, 'tolist') else vector)
+    # Only chunk 0 carries the hash the duplicate check looks for, and it is written last,
+    # so a paper whose upload failed part-way is not reported as already stored
+    if index == 0:
+        doc["content_hash"] = content_hash
+    return doc
+
+order = list(range(1, len(chunks))) + [0]
+try:
+    for start in range(0, len(order), batch_size):
+        collection.insert_many([chunk_document(index) for index in order[start:start + batch_size]])
+except Exception as e:
+    # Remove what was written so a retry starts clean
+    try:
+        collection.delete_many({"document_id": content_hash})
+    except Exception as cleanup_error:
+        print(f"Could not remove partially stored chunks: {cleanup_error}", file=sys.stderr)
+    # Queries may have seen the chunks that were written
+    invalidate_documents([content_hash])
+    fail(f"Failed to store document: {e}")
+
+invalidate_documents([content_hash])
+
+print(json.dumps({ "documentId": content_hash, "chunks": len(chunks) }))
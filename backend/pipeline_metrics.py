@@ -0,0 +1,260 @@
+# pipeline_metrics.py
+# Counters and timing histograms for PDFProcessingPipeline, exported in Prometheus text format.
+#
+#   metrics = PipelineMetrics()
+#   metrics.add_listener(lambda kind, name, labels, value: ...)   # push every event elsewhere
+#   start_metrics_server(metrics, 9108)                            # GET /metrics
+#
+# Profiling hooks wrap the ingestion of one PDF: cprofile_hook writes a .prof file per document,
+# sampling_profile_hook samples every thread's stack and writes folded stacks for flame graphs.
+
+import os
+import sys
+import time
+import cProfile
+import itertools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Help text for every metric the pipeline records
+DESCRIPTIONS = {
+    'documents_total': ('counter', "PDFs ingested, including failed ones"),
+    'documents_failed_total': ('counter', "PDFs whose ingestion raised an error"),
+    'pages_extracted_total': ('counter', "Pages whose text was extracted"),
+    'extraction_cache_hits_total': ('counter', "PDFs whose page texts were read from the extraction cache"),
+    'extraction_cache_misses_total': ('counter', "PDFs the extraction cache had to parse"),
+    'chunks_split_total': ('counter', "Chunks produced by the text splitter"),
+    'chunks_embedded_total': ('counter', "Chunks that came back with an embedding"),
+    'chunks_stored_total': ('counter', "Chunks written to the vector store"),
+    'chunks_dropped_total': ('counter', "Chunks lost at a stage (label stage)"),
+    'embedding_requests_total': ('counter', "Requests sent to the embeddings endpoint"),
+    'embedding_request_failures_total': ('counter', "Embedding requests that failed after retries"),
+    'embedding_retries_total': ('counter', "Embedding requests retried after a transient error"),
+    'embedding_cache_hits_total': ('counter', "Chunks served from the embedding cache"),
+    'embedding_cache_misses_total': ('counter', "Chunks the embedding cache had to compute"),
+    'embedding_input_tokens_total': ('counter', "Estimated tokens sent for embedding"),
+    'embedding_request_bytes_total': ('counter', "UTF-8 bytes of chunk text sent for embedding"),
+    'storage_bytes_total': ('counter', "Vector and text bytes written to the vector store"),
+    'throttled_requests_total': ('counter', "Requests a service throttled or timed out (label service)"),
+    'write_retries_total': ('counter', "Writes retried after a timeout or overload error"),
+    'chunks_dead_lettered_total': ('counter', "Chunks saved to the dead-letter file (label stage)"),
+    'stage_seconds': ('histogram', "Time spent per call of a pipeline stage (label stage)"),
+    'embedding_request_seconds': ('histogram', "Latency of one embeddings request"),
+    'rate_limit_wait_seconds': ('histogram', "Time a request waited for its rate limit (label service)"),
+    'document_seconds': ('histogram', "Time to ingest one PDF"),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram like a Prometheus client's"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+def label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class PipelineMetrics:
+    """Thread-safe counters and histograms keyed by (name, labels)"""
+
+    def __init__(self, prefix="citeright_"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """callback(kind, name, labels, value) runs for every increment and observation"""
+        self.listeners.append(callback)
+
+    def _notify(self, kind, name, labels, value):
+        for callback in self.listeners:
+            try:
+                callback(kind, name, labels, value)
+            except Exception as e:
+                print(f"Metrics listener failed: {e}")
+
+    def increment(self, name, amount=1, **labels):
+        if not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._notify('counter', name, labels, amount)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+        self._notify('histogram', name, labels, seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """Current value of a counter (0 if never incremented)"""
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """Plain-dict copy of every counter and histogram"""
+        with self.lock:
+            return {
+                'counters': {name + label_text(labels): value
+                             for (name, labels), value in self.counters.items()},
+                'histograms': {name + label_text(labels): {'count': h.count, 'sum': h.sum}
+                               for (name, labels), h in self.histograms.items()},
+            }
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, description = DESCRIPTIONS.get(name, ('untyped', name))
+                lines.append(f"# HELP {self.prefix}{name} {description}")
+                lines.append(f"# TYPE {self.prefix}{name} {kind}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name)
+                lines.append(f"{self.prefix}{name}{label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{self.prefix}{name}_bucket{label_text(labels, [('le', bound)])} {count}")
+                lines.append(f"{self.prefix}{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{self.prefix}{name}_sum{label_text(labels)} {histogram.sum}")
+                lines.append(f"{self.prefix}{name}_count{label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, port, host="0.0.0.0"):
+    """Serve metrics.prometheus_text() at /metrics from a daemon thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
+
+
+_profile_numbers = itertools.count(1)
+
+
+def profile_path(output_dir, pdf_file_path, suffix):
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(pdf_file_path))[0]
+    # The sequence number keeps concurrent or same-second documents apart
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_numbers)}"
+    return os.path.join(output_dir, f"{name}-{stamp}{suffix}")
+
+
+def cprofile_hook(output_dir):
+    """Profiler hook writing one cProfile .prof file per ingested PDF"""
+    @contextmanager
+    def profile(pdf_file_path):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(profile_path(output_dir, pdf_file_path, ".prof"))
+    return profile
+
+
+class SamplingProfiler:
+    """
+    Low-overhead profiler: samples the stacks of all threads every `interval` seconds.
+    Results are folded stacks ("frame;frame;frame count"), the input format of flame graph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+def sampling_profile_hook(output_dir, interval=0.005):
+    """Profiler hook writing folded stack samples per ingested PDF"""
+    @contextmanager
+    def profile(pdf_file_path):
+        with SamplingProfiler(interval) as profiler:
+            yield
+        with open(profile_path(output_dir, pdf_file_path, ".folded"), 'w', encoding='utf-8') as f:
+            f.write(profiler.folded())
+    return profile
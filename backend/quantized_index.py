@@ -0,0 +1,162 @@
+# quantized_index.py
+# Compressed copies of a LocalVectorStore's vectors for a cheap first search pass.
+#
+#   vectors.i8     int8 codes, one row per vector (1 byte per dimension, 4x smaller than float32)
+#   scales.f32     per-row int8 scale, so vector ~= codes * scale
+#   vectors.sign   sign bits packed 8 per byte (32x smaller), compared by Hamming distance
+#
+# A quantized search scans one of these for k * oversample candidates, then rescores only those
+# rows exactly against the float32 vectors, which are read from disk on demand. A larger
+# oversample factor trades latency for recall.
+
+import os
+import time
+import numpy as np
+from chunk_batch import quantize_int8
+
+CODES_FILE = "vectors.i8"
+SCALES_FILE = "scales.f32"
+SIGNS_FILE = "vectors.sign"
+QUANTIZATIONS = ("int8", "binary")
+
+# Rows converted from int8 to float32 at a time, small enough to stay in cache
+CONVERT_ROWS = 2048
+
+# Number of set bits in every byte value, for numpy versions without bitwise_count
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def pack_signs(vectors):
+    """One bit per dimension, set where the component is positive"""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def hamming_distances(signs, query_signs):
+    """Hamming distance from every packed row to the packed query"""
+    signs = np.ascontiguousarray(signs)
+    if signs.shape[1] % 8 == 0:
+        # Compare 64 bits at a time
+        signs = signs.view(np.uint64)
+        query_signs = np.ascontiguousarray(query_signs).view(np.uint64)
+    differing = np.bitwise_xor(signs, query_signs)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(differing).sum(axis=1, dtype=np.int32)
+    return POPCOUNT[differing.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def int8_scores(codes, scales, query):
+    """Dot products of int8 rows with a float32 query, converting a cache-sized slice at a time"""
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    buffer = np.empty((min(CONVERT_ROWS, codes.shape[0]), codes.shape[1]), dtype=np.float32)
+    for start in range(0, codes.shape[0], CONVERT_ROWS):
+        rows = codes[start:start + CONVERT_ROWS]
+        converted = buffer[:len(rows)]
+        np.copyto(converted, rows)
+        np.matmul(converted, query, out=scores[start:start + len(rows)])
+    return scores * scales
+
+
+class QuantizedIndex:
+    """Append-only int8 and sign-bit files kept row-aligned with the float32 vector file"""
+
+    def __init__(self, directory, dimensions):
+        self.dimensions = dimensions
+        self.sign_bytes = (dimensions + 7) // 8
+        self.codes_path = os.path.join(directory, CODES_FILE)
+        self.scales_path = os.path.join(directory, SCALES_FILE)
+        self.signs_path = os.path.join(directory, SIGNS_FILE)
+        self._maps = None
+
+    def row_counts(self):
+        """Rows present in each file (0 for missing files)"""
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0
+                 for path in (self.codes_path, self.scales_path, self.signs_path)]
+        return sizes[0] // self.dimensions, sizes[1] // 4, sizes[2] // self.sign_bytes
+
+    def truncate(self, count):
+        """Drop rows past count, left behind by an append whose metadata never committed"""
+        for path, row_bytes in ((self.codes_path, self.dimensions), (self.scales_path, 4),
+                                (self.signs_path, self.sign_bytes)):
+            if os.path.exists(path) and os.path.getsize(path) > count * row_bytes:
+                with open(path, 'r+b') as f:
+                    f.truncate(count * row_bytes)
+        self._maps = None
+
+    def append(self, vectors):
+        """Append the quantized forms of already-normalized float32 vectors"""
+        codes, scales = quantize_int8(vectors)
+        for path, data in ((self.codes_path, codes), (self.scales_path, scales),
+                           (self.signs_path, pack_signs(vectors))):
+            with open(path, 'ab') as f:
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._maps = None
+
+    def rebuild(self, matrix, start=0, block_rows=65536):
+        """
+        Rewrite rows from start on from the float32 matrix: the rows added since the index was
+        last used, or every row (start=0) for stores written before the index existed
+        """
+        self.truncate(start)
+        for first in range(start, matrix.shape[0], block_rows):
+            self.append(np.asarray(matrix[first:first + block_rows]))
+
+    def maps(self, count):
+        """Memory maps of (codes, scales, signs) covering count rows"""
+        if self._maps is None or self._maps[0].shape[0] != count:
+            self._maps = (
+                np.memmap(self.codes_path, dtype=np.int8, mode='r', shape=(count, self.dimensions)),
+                np.memmap(self.scales_path, dtype=np.float32, mode='r', shape=(count,)),
+                np.memmap(self.signs_path, dtype=np.uint8, mode='r', shape=(count, self.sign_bytes)),
+            )
+        return self._maps
+
+    def block_scores(self, quantization, query, start, end, count):
+        """
+        Approximate scores for rows [start, end), higher is better: int8 dot products with the
+        query, or negated Hamming distance between sign bits
+        """
+        codes, scales, signs = self.maps(count)
+        if quantization == "int8":
+            return int8_scores(codes[start:end], scales[start:end], query)
+        return -hamming_distances(signs[start:end], pack_signs(query)).astype(np.float32)
+
+    def resident_bytes(self, quantization):
+        """Bytes per vector the candidate pass reads"""
+        return self.dimensions + 4 if quantization == "int8" else self.sign_bytes
+
+
+def recall_report(store, queries, k=10, oversample_factors=(1, 2, 4, 8, 16), quantizations=QUANTIZATIONS):
+    """
+    Compare quantized searches against exact float32 search on the same queries:
+    one row per (quantization, oversample) with recall@k, p50/p99 latency and bytes per vector
+    """
+    def timed(**options):
+        latencies = []
+        results = []
+        for query in queries:
+            start = time.perf_counter()
+            results.append([row["row_id"] for row in store.search(query, k=k, **options)])
+            latencies.append((time.perf_counter() - start) * 1000)
+        return results, latencies
+
+    exact, latencies = timed()
+    report = [{
+        'quantization': 'float32', 'oversample': None, 'recall_at_k': 1.0,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'bytes_per_vector': store.dimensions * 4,
+    }]
+    for quantization in quantizations:
+        for oversample in oversample_factors:
+            results, latencies = timed(quantization=quantization, oversample=oversample)
+            hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, exact))
+            report.append({
+                'quantization': quantization, 'oversample': oversample,
+                'recall_at_k': round(hits / max(sum(len(expected) for expected in exact), 1), 4),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+                'bytes_per_vector': store.quantized_index().resident_bytes(quantization),
+            })
+    return report
@@ -0,0 +1,240 @@
+# query_cache.py
+# Query-side cache: question embeddings and top-k retrieval results.
+#
+#   questions   (model, normalized question) -> embedding, so a repeated question skips the
+#               embedding call
+#   results     (scope, search parameters, normalized question) -> top-k results, so it also
+#               skips the search; scope is a document id, or "" for searches over every document
+#
+# Entries expire ttl_seconds after they are written and the least recently used are evicted
+# past max_entries. Results are stamped with their scope's generation: re-ingesting a document
+# (invalidate([document_id])) bumps that document's generation and the collection's, so exactly
+# the results that could hold its old chunks stop matching while other documents keep theirs.
+# The cache is a SQLite file, so one-shot processes (astraDBClient.py query) share it and see
+# the ingesting process's invalidations; ":memory:" keeps it private to one process.
+#
+# With semantic_threshold, a result lookup that misses on the exact question falls back to the
+# cached question (same scope and parameters) with the most similar embedding, if their cosine
+# similarity reaches the threshold. That needs the new question's embedding but not the search.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from embedding_cache import normalize_text
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_ENTRIES = 10000
+# Generation bumped by invalidate(None), which every stamp includes
+ALL_SCOPES = "*"
+
+
+def normalize_question(question):
+    """Case, whitespace and trailing punctuation do not make a different question"""
+    return normalize_text(question).casefold().rstrip("?!. ")
+
+
+def digest(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).digest()
+
+
+class QueryCache:
+    """TTL + LRU cache of question embeddings and search results, invalidated per document"""
+
+    def __init__(self, path=":memory:", ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 semantic_threshold=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                expires REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key BLOB PRIMARY KEY,
+                scope TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                vector BLOB,
+                results TEXT NOT NULL,
+                expires REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_scope ON results (scope, parameters, generation)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS generations (scope TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+        self.db.commit()
+
+    def generation(self, scope):
+        """Current stamp for results in scope; only ever increases"""
+        with self.lock:
+            return self._generation(scope)
+
+    def _generation(self, scope):
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(generation), 0) FROM generations WHERE scope IN (?, ?)", (scope, ALL_SCOPES)
+        ).fetchone()
+        return row[0]
+
+    def invalidate(self, document_ids=None):
+        """Forget results that may include these documents' chunks (every result for None)"""
+        scopes = [ALL_SCOPES] if document_ids is None else sorted({""} | {str(d) for d in document_ids if d})
+        with self.lock:
+            self.db.executemany(
+                "INSERT INTO generations (scope, generation) VALUES (?, 1) "
+                "ON CONFLICT (scope) DO UPDATE SET generation = generation + 1",
+                [(scope,) for scope in scopes])
+            self.db.commit()
+
+    def embedding(self, model, question, embed):
+        """The question's embedding, calling embed(question) only when it is not cached"""
+        import numpy as np
+        key = digest(model, normalize_question(question))
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT vector FROM questions WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is not None:
+                self.embedding_hits += 1
+                self.db.execute("UPDATE questions SET last_used = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                return np.frombuffer(row[0], dtype=np.float32)
+            self.embedding_misses += 1
+
+        vector = np.asarray(embed(question), dtype=np.float32)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO questions (key, vector, expires, last_used) VALUES (?, ?, ?, ?)",
+                            (key, vector.tobytes(), now + self.ttl_seconds, now))
+            self._evict("questions", now)
+            self.db.commit()
+        return vector
+
+    def search(self, scope, parameters, question, search, embed=None):
+        """
+        search(vector) through the cache, for results that depend on scope and the search
+        parameters (a string: mode, k, ...). embed(question) is only called after an exact miss;
+        its vector is used for the semantic lookup and passed to search (None without embed).
+        Results must be JSON-serializable.
+        """
+        normalized = normalize_question(question)
+        key = digest(scope, parameters, normalized)
+        now = time.time()
+        with self.lock:
+            # Stamped before searching: an ingest that lands during the search makes it stale
+            generation = self._generation(scope)
+            row = self.db.execute(
+                "SELECT results FROM results WHERE key = ? AND generation = ? AND expires > ?",
+                (key, generation, now)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                return json.loads(row[0])
+
+        vector = None if embed is None else embed(question)
+        if vector is not None and self.semantic_threshold is not None:
+            found = self._similar(scope, parameters, generation, vector, now)
+            if found is not None:
+                return found
+        with self.lock:
+            self.misses += 1
+
+        results = search(vector)
+        blob = None if vector is None else normalized_vector(vector).tobytes()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, scope, parameters, generation, vector, results, expires, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, parameters, generation, blob, json.dumps(results), now + self.ttl_seconds, now))
+            self._evict("results", now)
+            self.db.commit()
+        return results
+
+    def _similar(self, scope, parameters, generation, vector, now):
+        """Results of the most similar cached question at or above semantic_threshold"""
+        import numpy as np
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, vector, results FROM results "
+                "WHERE scope = ? AND parameters = ? AND generation = ? AND expires > ? AND vector IS NOT NULL",
+                (scope, parameters, generation, now)).fetchall()
+            query = normalized_vector(vector)
+            rows = [row for row in rows if len(row[1]) == query.nbytes]
+            if not rows:
+                return None
+            similarities = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.semantic_threshold:
+                return None
+            self.semantic_hits += 1
+            self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, rows[best][0]))
+            self.db.commit()
+            return json.loads(rows[best][2])
+
+    def _evict(self, table, now):
+        """Drop expired rows, then the least recently used past max_entries"""
+        self.db.execute(f"DELETE FROM {table} WHERE expires <= ?", (now,))
+        excess = self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.db.execute(f"DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY last_used LIMIT ?)",
+                            (excess,))
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'embedding_hits': self.embedding_hits,
+                'embedding_misses': self.embedding_misses,
+            }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def normalized_vector(vector):
+    import numpy as np
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def cache_from_env(path):
+    """QueryCache at path configured by QUERY_CACHE_TTL, QUERY_CACHE_MAX_ENTRIES and QUERY_CACHE_SEMANTIC_THRESHOLD"""
+    threshold = os.getenv("QUERY_CACHE_SEMANTIC_THRESHOLD")
+    return QueryCache(path,
+                      ttl_seconds=float(os.getenv("QUERY_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                      max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                      semantic_threshold=float(threshold) if threshold else None)
+
+
+def invalidate_documents(document_ids=None):
+    """
+    Invalidate the shared query cache at QUERY_CACHE_PATH after writing these documents' chunks;
+    a no-op when no cache is configured
+    """
+    path = os.getenv("QUERY_CACHE_PATH")
+    if path:
+        import connection_pool
+        connection_pool.query_cache(path).invalidate(document_ids)
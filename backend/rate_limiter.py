@@ -0,0 +1,255 @@
+# rate_limiter.py
+# Admission control and retries for calls to a rate-limited remote service (the embeddings API,
+# AstraDB writes).
+#
+#   limiter = RateLimiter("embeddings", requests_per_second=50, tokens_per_second=80000, max_concurrency=8)
+#   response = limiter.call(lambda: client.embeddings.create(...), tokens=estimated_tokens,
+#                           retryable=(RateLimitError, APIConnectionError))
+#
+# Each call waits for
+#   - token buckets: one for requests and, optionally, one for a second quota such as input
+#     tokens per minute; both refill continuously and may go into debt, so a large request is
+#     admitted and the requests after it wait for the refill
+#   - a concurrency slot, whose number adapts AIMD-style: +1 per limit's worth of successes,
+#     halved on throttling (at most once per round trip: only requests that started after the
+#     last decrease can trigger the next), trimmed by 10% when latency climbs past
+#     latency_tolerance times the best recent latency
+# Retryable errors (given per call, so the client library is only imported by its caller) are
+# retried up to max_retries times after a full-jitter exponential backoff
+# (or the server's Retry-After), with the slot released while waiting.
+
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's HTTP response, if it has one"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilled bucket of `rate` tokens per second holding at most `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1.0):
+        """Take amount tokens, going into debt if needed; returns the seconds to wait before using them"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight; see the module comment"""
+
+    def __init__(self, initial, minimum=1, maximum=None, decrease=0.5, latency_tolerance=None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(initial, self.maximum))
+        self.in_flight = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        # (loop, future) of coroutines waiting in acquire_async, woken from any thread
+        self.async_waiters = []
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self._limit))
+
+    def try_acquire(self):
+        with self.condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits on a future that release() resolves, not by polling"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self.async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except BaseException:
+                with self.condition:
+                    if (loop, waiter) in self.async_waiters:
+                        self.async_waiters.remove((loop, waiter))
+                    else:
+                        # Woken and cancelled at once: hand the wake-up to the next waiter
+                        self._wake_async(1)
+                raise
+
+    def _wake_async(self, count=None):
+        """Resolve the oldest count async waiters (all for None); call holding the condition"""
+        woken = self.async_waiters[:count]
+        del self.async_waiters[:len(woken)]
+        for loop, waiter in woken:
+            loop.call_soon_threadsafe(_resolve, waiter)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+            self._wake_async(1)
+
+    def on_success(self, latency=None):
+        with self.condition:
+            if latency is not None and self.latency_tolerance:
+                # The baseline follows the best latency, creeping up 1% per sample so it can
+                # recover when the service gets slower for good
+                self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.01)
+                if latency > self.latency_tolerance * self.baseline:
+                    self._limit = max(self.minimum, self._limit * 0.9)
+                    return
+            self._limit = min(self.maximum, self._limit + 1.0 / max(self._limit, 1.0))
+            self.condition.notify_all()
+            self._wake_async()
+
+    def on_throttle(self, started):
+        """A request that started at `started` (time.monotonic) was throttled"""
+        with self.condition:
+            if started < self.last_decrease:
+                # Already answered by a decrease made after this request went out
+                return
+            self._limit = max(self.minimum, self._limit * self.decrease)
+            self.last_decrease = time.monotonic()
+
+
+class RateLimiter:
+    """Token buckets, adaptive concurrency and jittered retries for one service"""
+
+    def __init__(self, name, requests_per_second=None, tokens_per_second=None, burst_seconds=1.0,
+                 max_concurrency=4, min_concurrency=1, throttled=None, max_retries=5,
+                 base_delay=0.5, max_delay=30.0, latency_tolerance=None, metrics=None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second, requests_per_second * burst_seconds) \
+            if requests_per_second else None
+        self.tokens = TokenBucket(tokens_per_second, tokens_per_second * burst_seconds) \
+            if tokens_per_second else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency, max_concurrency,
+                                               latency_tolerance=latency_tolerance)
+        # throttled(error) says which retryable errors mean "slow down" (by default all of them)
+        self.throttled = throttled or (lambda error: True)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics
+
+    def admission_delay(self, tokens=0):
+        """Reserve budget for one request; returns how long to wait before sending it"""
+        delay = self.requests.reserve(1) if self.requests is not None else 0.0
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if self.metrics is not None and delay:
+            self.metrics.observe('rate_limit_wait_seconds', delay, service=self.name)
+        return delay
+
+    def retry_delay(self, error, attempt):
+        return retry_after(error) or backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def record_failure(self, error, started, retryable):
+        """Feed a failed attempt to the concurrency limit; returns whether it was throttling"""
+        throttled = isinstance(error, retryable) and self.throttled(error)
+        if throttled:
+            self.concurrency.on_throttle(started)
+            if self.metrics is not None:
+                self.metrics.increment('throttled_requests_total', service=self.name)
+        return throttled
+
+    @contextmanager
+    def slot(self):
+        self.concurrency.acquire()
+        try:
+            yield
+        finally:
+            self.concurrency.release()
+
+    def call(self, function, tokens=0, retryable=(), on_retry=None):
+        """
+        function() under the limits, retried on the `retryable` error types; raises the last
+        error once retries run out. on_retry(error, attempt) runs before each retry
+        """
+        attempt = 0
+        while True:
+            time.sleep(self.admission_delay(tokens))
+            with self.slot():
+                started = time.monotonic()
+                try:
+                    result = function()
+                except Exception as e:
+                    self.record_failure(e, started, retryable)
+                    if not isinstance(e, retryable) or attempt >= self.max_retries:
+                        raise
+                    error = e
+                else:
+                    self.concurrency.on_success(time.monotonic() - started)
+                    return result
+            if on_retry is not None:
+                on_retry(error, attempt)
+            time.sleep(self.retry_delay(error, attempt))
+            attempt += 1
+
+    async def call_async(self, function, tokens=0, retryable=(), on_retry=None):
+        """call() for a coroutine function; waiting yields to the event loop"""
+        import asyncio
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.admission_delay(tokens))
+            await self.concurrency.acquire_async()
+            try:
+                started = time.monotonic()
+                try:
+                    result = await function()
+                except Exception as e:
+                    self.record_failure(e, started, retryable)
+                    if not isinstance(e, retryable) or attempt >= self.max_retries:
+                        raise
+                    error = e
+                else:
+                    self.concurrency.on_success(time.monotonic() - started)
+                    return result
+            finally:
+                self.concurrency.release()
+            if on_retry is not None:
+                on_retry(error, attempt)
+            await asyncio.sleep(self.retry_delay(error, attempt))
+            attempt += 1
@@ -5,7 +5,8 @@ import multer from "multer";
 import cors from "cors";
 import fs from "fs";
 import path from "path";
-import { exec } from "child_process";
+import { exec, spawn } from "child_process";
+import readline from "readline";
 import { fileURLToPath } from "url";
 import pkg from "pdfjs-dist";
 import { v4 as uuidv4 } from 'uuid';
@@ -24,6 +25,9 @@ const OLLAMA_BASE_URL = process.env.OLLAMA_BASE_URL || 'http://localhost:11434';
 const OLLAMA_MODEL = process.env.OLLAMA_MODEL || 'llama2';
 const CHROMA_PATH = process.env.CHROMA_PATH || './chroma_db';
 const PORT = process.env.PORT || 3001;
+// Questions on chunked documents get the top-k most similar chunks, within a character budget
+const RETRIEVAL_TOP_K = parseInt(process.env.RETRIEVAL_TOP_K || '6', 10);
+const RETRIEVAL_CONTEXT_LENGTH = parseInt(process.env.RETRIEVAL_CONTEXT_LENGTH || '4000', 10);
 
 const app = express();
 
@@ -48,10 +52,12 @@ const upload = multer({ dest: uploadsDir });
 
 // Simple in-memory vector store (replaces ChromaDB for simplicity)
 const vectorStore = {
-  documents: new Map(), // documentId -> { text, metadata, embeddings }
+  documents: new Map(), // documentId -> { text, metadata, embeddings, chunks }
+  chunkVectors: new Map(), // documentId -> decoded Float32Array per chunk (not persisted)
   
-  async add(id, text, metadata, embeddings) {
-    this.documents.set(id, { text, metadata, embeddings });
+  async add(id, text, metadata, embeddings, chunks = null) {
+    this.documents.set(id, { text, metadata, embeddings, chunks });
+    this.chunkVectors.delete(id);
     // Persist to disk for durability
     await this.save();
   },
@@ -60,6 +66,16 @@ const vectorStore = {
     return this.documents.get(id);
   },
   
+  // Decode a document's base64 float32 chunk vectors once and keep them in memory
+  getChunkVectors(id) {
+    if (!this.chunkVectors.has(id)) {
+      const doc = this.documents.get(id);
+      const vectors = (doc?.chunks || []).map(chunk => decodeVector(chunk.vector));
+      this.chunkVectors.set(id, vectors);
+    }
+    return this.chunkVectors.get(id);
+  },
+  
   async getAll() {
     return Array.from(this.documents.entries()).map(([id, data]) => ({
       id,
@@ -86,13 +102,29 @@ const vectorStore = {
   }
 };
 
+function decodeVector(base64) {
+  const bytes = Buffer.from(base64, 'base64');
+  // Copy into a fresh buffer so the Float32Array view is 4-byte aligned
+  return new Float32Array(new Uint8Array(bytes).buffer);
+}
+
+function cosineSimilarity(a, b) {
+  let dot = 0, normA = 0, normB = 0;
+  for (let i = 0; i < a.length; i++) {
+    dot += a[i] * b[i];
+    normA += a[i] * a[i];
+    normB += b[i] * b[i];
+  }
+  return normA && normB ? dot / Math.sqrt(normA * normB) : 0;
+}
+
 async function initializeVectorStore() {
   await vectorStore.load();
   console.log('✅ Vector store initialized');
 }
 
-// Extract text from PDF using pdfjs-dist
-async function extractTextWithPdfjs(filePath) {
+// Extract text from PDF using pdfjs-dist, one string per page
+async function extractPagesWithPdfjs(filePath) {
   try {
     const data = new Uint8Array(await fs.promises.readFile(filePath));
     const pdf = await getDocument({ 
@@ -100,44 +132,151 @@ async function extractTextWithPdfjs(filePath) {
       standardFontDataUrl: 'node_modules/pdfjs-dist/standard_fonts/' 
     }).promise;
 
-    let fullText = "";
+    const pages = [];
     for (let i = 1; i <= pdf.numPages; i++) {
       const page = await pdf.getPage(i);
       const content = await page.getTextContent();
-      const strings = content.items.map(item => item.str).join(" ");
-      fullText += strings + "\n";
+      pages.push(content.items.map(item => item.str).join(" "));
     }
 
-    return fullText;
+    return pages;
   } catch (error) {
     console.error("Error extracting text from PDF:", error);
     throw error;
   }
 }
 
-// Generate embeddings using Python script
-function generateEmbeddings(textFilePath) {
-  return new Promise((resolve, reject) => {
-    const pythonScript = process.env.EMBEDDING_SCRIPT_PATH || path.join(__dirname, 'embedding_generator.py');
-    
-    exec(`python "${pythonScript}" "${textFilePath}"`, (err, stdout, stderr) => {
-      if (err) {
-        console.error(`❌ Error generating embeddings:\n${stderr}`);
-        reject(new Error("Failed to generate embeddings"));
-        return;
-      }
+const EMBEDDING_SCRIPT_PATH = process.env.EMBEDDING_SCRIPT_PATH || path.join(__dirname, 'embedding_generator.py');
+const PYTHON_BIN = process.env.PYTHON_BIN || 'python';
+const EMBEDDING_WORKER_ENABLED = process.env.EMBEDDING_WORKER !== '0';
 
-      try {
-        const embeddings = JSON.parse(stdout);
-        resolve(embeddings);
-      } catch (parseErr) {
-        console.error("❌ Failed to parse embeddings JSON:", parseErr);
-        reject(new Error("Invalid embeddings format"));
-      }
+// Persistent embedding worker: loads the model once and batches concurrent requests.
+// Requests and responses are newline-delimited JSON over the worker's stdin/stdout.
+const embeddingWorker = {
+  proc: null,
+  ready: null,
+  pending: new Map(), // request id -> { resolve, reject }
+  nextId: 1,
+
+  start() {
+    if (this.ready) return this.ready;
+
+    const proc = spawn(PYTHON_BIN, [EMBEDDING_SCRIPT_PATH, '--serve'], {
+      stdio: ['pipe', 'pipe', 'inherit']
     });
+    this.proc = proc;
+
+    this.ready = new Promise((resolve, reject) => {
+      const lines = readline.createInterface({ input: proc.stdout });
+      lines.on('line', (line) => {
+        let message;
+        try {
+          message = JSON.parse(line);
+        } catch (parseErr) {
+          console.error("❌ Invalid message from embedding worker:", line);
+          return;
+        }
+        if (message.ready) {
+          console.log(`✅ Embedding worker ready (${message.model})`);
+          resolve();
+          return;
+        }
+        const request = this.pending.get(message.id);
+        if (!request) return;
+        this.pending.delete(message.id);
+        if (message.error) {
+          request.reject(new Error(message.error));
+        } else {
+          request.resolve(message.chunks ?? message.embedding);
+        }
+      });
+
+      proc.on('error', (err) => reject(err));
+      proc.on('exit', (code) => {
+        console.error(`⚠️ Embedding worker exited with code ${code}`);
+        reject(new Error("Embedding worker exited before becoming ready"));
+        for (const request of this.pending.values()) {
+          request.reject(new Error("Embedding worker exited"));
+        }
+        this.pending.clear();
+        this.proc = null;
+        this.ready = null;
+      });
+    });
+
+    return this.ready;
+  },
+
+  async request(payload) {
+    await this.start();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject });
+      this.proc.stdin.write(JSON.stringify({ id, ...payload }) + "\n");
+    });
+  }
+};
+
+// Generate per-chunk embeddings ({ start, end, page, vector }) for a page-delimited text file
+async function generateChunkEmbeddings(textFilePath) {
+  if (EMBEDDING_WORKER_ENABLED) {
+    try {
+      return await embeddingWorker.request({ path: textFilePath, chunked: true });
+    } catch (error) {
+      console.error("⚠️ Embedding worker failed, falling back to one-shot process:", error.message);
+    }
+  }
+
+  return new Promise((resolve, reject) => {
+    exec(`${PYTHON_BIN} "${EMBEDDING_SCRIPT_PATH}" "${textFilePath}" --chunked`,
+      { maxBuffer: 256 * 1024 * 1024 },
+      (err, stdout, stderr) => {
+        if (err) {
+          console.error(`❌ Error generating chunk embeddings:\n${stderr}`);
+          reject(new Error("Failed to generate embeddings"));
+          return;
+        }
+
+        try {
+          // One JSON object per line, one line per chunk
+          resolve(stdout.split("\n").filter(line => line.trim()).map(line => JSON.parse(line)));
+        } catch (parseErr) {
+          console.error("❌ Failed to parse chunk embeddings:", parseErr);
+          reject(new Error("Invalid embeddings format"));
+        }
+      });
   });
 }
 
+// Pick the topK chunks most similar to the question, up to maxLength characters of text
+async function retrieveContext(documentId, docData, question, topK, maxLength) {
+  if (!EMBEDDING_WORKER_ENABLED) {
+    throw new Error("Question embedding requires the embedding worker");
+  }
+  const queryVector = Float32Array.from(await embeddingWorker.request({ text: question }));
+  const vectors = vectorStore.getChunkVectors(documentId);
+
+  const ranked = docData.chunks
+    .map((chunk, i) => ({ chunk, score: cosineSimilarity(queryVector, vectors[i]) }))
+    .sort((a, b) => b.score - a.score);
+
+  const selected = [];
+  let length = 0;
+  for (const { chunk } of ranked) {
+    if (selected.length >= topK) break;
+    const size = chunk.end - chunk.start;
+    if (length + size > maxLength) continue;
+    selected.push(chunk);
+    length += size;
+  }
+
+  // Present the passages in reading order with their page numbers
+  return selected
+    .sort((a, b) => a.start - b.start)
+    .map(chunk => `[Page ${chunk.page}] ${docData.text.slice(chunk.start, chunk.end)}`)
+    .join("\n\n");
+}
+
 // Call Ollama API for chat completion
 async function callOllama(prompt) {
   try {
@@ -206,18 +345,20 @@ app.post("/api/upload", upload.single("paper"), async (req, res) => {
     console.log(`📄 Processing file: ${fileName}`);
 
     // Extract text from PDF
-    const extractedText = await extractTextWithPdfjs(filePath);
+    const pages = await extractPagesWithPdfjs(filePath);
+    const extractedText = pages.map(page => page + "\n").join("");
     
-    // Save text to temp file for embedding generation
+    // Save text to temp file for embedding generation. Pages end in a form feed instead of
+    // a newline so the embedder can number pages; offsets still line up with extractedText.
     const tempTextFilePath = path.join(uploadsDir, `${fileName}.txt`);
-    fs.writeFileSync(tempTextFilePath, extractedText);
+    fs.writeFileSync(tempTextFilePath, pages.map(page => page + "\f").join(""));
 
     console.log(`Generating embeddings...`);
     
-    // Generate embeddings
-    const embeddings = await generateEmbeddings(tempTextFilePath);
+    // Generate one embedding per overlapping chunk
+    const chunks = await generateChunkEmbeddings(tempTextFilePath);
     
-    console.log(`✅ Embeddings generated successfully`);
+    console.log(`✅ Embeddings generated successfully (${chunks.length} chunks)`);
 
     // Generate document ID
     const documentId = uuidv4().replace(/-/g, '');
@@ -227,7 +368,7 @@ app.post("/api/upload", upload.single("paper"), async (req, res) => {
       fileName: fileName,
       title: fileName,
       upload_date: new Date().toISOString()
-    }, embeddings);
+    }, null, chunks);
 
     console.log(`✅ Document stored with ID: ${documentId}`);
 
@@ -273,11 +414,24 @@ app.post("/api/chat", async (req, res) => {
     console.log(`📏 Document text length: ${documentText?.length || 0} characters`);
     console.log(`📄 First 200 chars of document: ${documentText?.slice(0, 200) || 'NO TEXT FOUND'}...`);
 
-    // Increase context length for more detailed answers (llama3.1:8b supports ~8k tokens)
+    // Documents without chunk vectors fall back to their prefix (llama3.1:8b supports ~8k tokens)
     const MAX_CONTEXT_LENGTH = 12000; // Increased from 4000 to 12000
-    const context = documentText.length > MAX_CONTEXT_LENGTH 
-      ? documentText.slice(0, MAX_CONTEXT_LENGTH) + "..."
-      : documentText;
+    let context = null;
+    // Whenever chunk vectors exist, only the passages relevant to the question go into the
+    // prompt, which keeps it small however long (or short) the document is
+    if (docData.chunks?.length) {
+      try {
+        context = await retrieveContext(documentId, docData, input, RETRIEVAL_TOP_K, RETRIEVAL_CONTEXT_LENGTH);
+        console.log(`🔎 Retrieved relevant chunks for the question`);
+      } catch (error) {
+        console.error("⚠️ Chunk retrieval failed, using document prefix:", error.message);
+      }
+    }
+    if (!context) {
+      context = documentText.length > MAX_CONTEXT_LENGTH 
+        ? documentText.slice(0, MAX_CONTEXT_LENGTH) + "..."
+        : documentText;
+    }
 
     console.log(`📋 Context length being sent to Ollama: ${context.length} characters`);
 
@@ -347,6 +501,12 @@ app.get("/api/papers", async (req, res) => {
 
 // Start server
 initializeVectorStore().then(() => {
+  if (EMBEDDING_WORKER_ENABLED) {
+    // Warm the worker so the first upload does not pay for the model load
+    embeddingWorker.start().catch(err => {
+      console.error("⚠️ Embedding worker unavailable, uploads will use one-shot processes:", err.message);
+    });
+  }
   app.listen(PORT, () => {
     console.log(`🚀 Server running at http://localhost:${PORT}`);
     console.log(`📦 Using Ollama model: ${OLLAMA_MODEL}`);
@@ -0,0 +1,229 @@
+# text_chunker.py
+# Recursive text chunker working on character offsets, a drop-in for LangChain's
+# RecursiveCharacterTextSplitter (same separators, chunk_size/chunk_overlap merging and
+# whitespace stripping, so it produces the same chunks).
+#
+# The text is cut into pieces at the coarsest separator present ("\n\n", then "\n", " ", and
+# single characters), pieces too long for a chunk are cut again at the next separator, and runs of
+# pieces are merged into chunks of at most chunk_size with up to chunk_overlap carried over.
+# Pieces are (start, end) offsets into the source, and since every piece keeps the separator it
+# starts with, a run of pieces is simply source[first.start:last.end]: nothing is copied or
+# joined until a chunk's text is sliced out.
+#
+# Length is measured in characters by default, or with any length_function (see token_length).
+# The splitter charges length_function(separator) per join and length_function("") when the
+# separator is empty, while pieces here keep their separators; the chunks are the same for
+# length functions that add up over concatenation closely enough and give 0 for "".
+
+import bisect
+import operator
+from itertools import accumulate
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+def token_length(model="text-embedding-3-small"):
+    """
+    Length function counting tokens with tiktoken (pinned in requirements.txt). Without it, or
+    when it cannot load the model's encoding (its files are downloaded on first use), chunks
+    are sized by an estimate instead and a warning says so; token-sized chunks then differ
+    from those of an installation with tiktoken
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception as e:
+        print(f"tiktoken unavailable ({e}); estimating chunk lengths at 4 characters per token")
+        # ~4 characters per token, rounded up; unlike estimate_tokens (a safe upper bound for
+        # request limits) it is 0 for "", which the splitter charges per character join
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class TextChunk:
+    """A chunk's text with its [start, end) offsets in the document and the page it starts on"""
+
+    __slots__ = ('text', 'start', 'end', 'page')
+
+    def __init__(self, text, start, end, page=None):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.page = page
+
+    def __repr__(self):
+        return f"TextChunk(start={self.start}, end={self.end}, page={self.page})"
+
+
+class PageChunkStream:
+    """
+    Chunks pages as they arrive. Each page is split together with the tail of the text that
+    starts at the previous page's last chunk, so chunks can cross page breaks; that last chunk
+    is only emitted once the following page (or finish) shows where it really ends.
+
+    The chunks are not always those of split_pages on the whole document: the separator
+    level is chosen on the buffered tail, so a tail without blank lines is cut at line breaks
+    even when the document has paragraph breaks elsewhere, and chunk boundaries differ from
+    there on. Matching the whole-document split would need every later page first. Chunk
+    texts, and so their fingerprints, therefore depend on whether a document was split
+    streaming or not; incremental ingestion always uses split_pages so its fingerprints
+    stay comparable.
+    """
+
+    def __init__(self, chunker):
+        self.chunker = chunker
+        self.page_starts = []
+        self.buffer = ""
+        # Document offset of buffer[0]
+        self.buffer_start = 0
+
+    def add(self, page_text):
+        """Chunks completed by this page"""
+        self.page_starts.append(self.buffer_start + len(self.buffer))
+        self.buffer += page_text
+        spans = self.chunker.split_spans(self.buffer)
+        if not spans:
+            return []
+        chunks = [self._chunk(start, end) for start, end in spans[:-1]]
+        carry_start = spans[-1][0]
+        self.buffer = self.buffer[carry_start:]
+        self.buffer_start += carry_start
+        return chunks
+
+    def finish(self):
+        """The chunks still held back after the last page"""
+        chunks = [self._chunk(start, end) for start, end in self.chunker.split_spans(self.buffer)]
+        self.buffer = ""
+        return chunks
+
+    def _chunk(self, start, end):
+        offset = self.buffer_start + start
+        return TextChunk(self.buffer[start:end], offset, self.buffer_start + end,
+                         bisect.bisect_right(self.page_starts, offset) or None)
+
+
+class TextChunker:
+    """Splits text into chunk offsets; see the module comment"""
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, length_function=None, separators=DEFAULT_SEPARATORS):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # None measures characters without slicing the text
+        self.length_function = length_function
+        self.separators = tuple(separators)
+
+    def split_spans(self, text, start=0, end=None):
+        """(start, end) offsets of the chunks of text[start:end]"""
+        spans = []
+        self._split(text, start, len(text) if end is None else end, 0, spans)
+        return spans
+
+    def split_text(self, text):
+        """Chunk texts, like RecursiveCharacterTextSplitter.split_text"""
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_pages(self, pages):
+        """TextChunks of the concatenated pages, with offsets into "".join(pages) and 1-based pages"""
+        text = "".join(pages)
+        page_starts = []
+        offset = 0
+        for page_text in pages:
+            page_starts.append(offset)
+            offset += len(page_text)
+        return [TextChunk(text[start:end], start, end, bisect.bisect_right(page_starts, start) or None)
+                for start, end in self.split_spans(text)]
+
+    def iter_page_chunks(self, pages):
+        """
+        Chunks of pages as they arrive, holding one page plus the tail of the previous one;
+        boundaries can differ from split_pages (see PageChunkStream)
+        """
+        stream = PageChunkStream(self)
+        for page_text in pages:
+            yield from stream.add(page_text)
+        yield from stream.finish()
+
+    def _split(self, text, start, end, level, spans):
+        separators = self.separators
+        # The first remaining separator that occurs; "" (single characters) always does
+        separator = separators[-1]
+        next_level = len(separators)
+        for i in range(level, len(separators)):
+            if separators[i] == "":
+                separator = ""
+                break
+            if text.find(separators[i], start, end) != -1:
+                separator = separators[i]
+                next_level = i + 1
+                break
+
+        bounds = self._piece_bounds(text, start, end, separator)
+        # Cumulative piece lengths; for characters that is just the offsets
+        if self.length_function is None:
+            prefix = bounds
+        else:
+            prefix = list(accumulate((self.length_function(text[piece_start:piece_end])
+                                      for piece_start, piece_end in zip(bounds, bounds[1:])), initial=0))
+
+        lengths = list(map(operator.sub, prefix[1:], prefix))
+        long_pieces = []
+        if lengths and max(lengths) >= self.chunk_size:
+            long_pieces = [i for i, length in enumerate(lengths) if length >= self.chunk_size]
+
+        first = 0
+        for i in long_pieces:
+            if i > first:
+                self._merge(text, bounds, prefix, first, i, spans)
+            if next_level >= len(separators):
+                # Nothing left to split on: the piece becomes an oversized chunk as it is
+                spans.append((bounds[i], bounds[i + 1]))
+            else:
+                self._split(text, bounds[i], bounds[i + 1], next_level, spans)
+            first = i + 1
+        if len(bounds) - 1 > first:
+            self._merge(text, bounds, prefix, first, len(bounds) - 1, spans)
+
+    @staticmethod
+    def _piece_bounds(text, start, end, separator):
+        """
+        Piece k of text[start:end] is [bounds[k], bounds[k + 1]); each piece but the first
+        starts with its separator
+        """
+        if separator == "":
+            return list(range(start, end + 1))
+        separator_length = len(separator)
+        lengths = [len(part) + separator_length for part in text[start:end].split(separator)]
+        lengths[0] -= separator_length
+        bounds = list(accumulate(lengths, initial=start))
+        # Text starting with the separator has an empty first piece
+        return bounds[1:] if lengths[0] == 0 else bounds
+
+    def _merge(self, text, bounds, prefix, first, last, spans):
+        """
+        Merge pieces [first, last) into chunks of at most chunk_size that overlap by up to
+        chunk_overlap. Each chunk extends as far as it fits; the next one starts at the first
+        piece whose tail (up to the end of the chunk) fits in the overlap with room for the
+        piece that did not fit, exactly where the splitter's piece-by-piece merge ends up
+        """
+        size = self.chunk_size
+        overlap = self.chunk_overlap
+        start = first
+        end = max(start + 1, bisect.bisect_right(prefix, prefix[start] + size, start, last + 1) - 1)
+        while True:
+            self._append_stripped(text, bounds[start], bounds[end], spans)
+            if end >= last:
+                return
+            limit = min(overlap, size - (prefix[end + 1] - prefix[end]))
+            start = end if limit < 0 else bisect.bisect_left(prefix, prefix[end] - limit, start, end + 1)
+            end = max(end + 1, bisect.bisect_right(prefix, prefix[start] + size, start, last + 1) - 1)
+
+    @staticmethod
+    def _append_stripped(text, start, end, spans):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
@@ -0,0 +1,65 @@
+# vector_io.py
+# Binary transport of embeddings between server.js and the storage scripts.
+#
+# Vectors travel through a file or a pipe (e.g. /dev/fd/3) instead of a JSON list on the
+# command line, so their size is not bounded by argv limits and nothing is printed or parsed
+# as decimal text:
+#   *.npy          NumPy array file, 2-D float32 (a 1-D array is a single vector)
+#   anything else  raw little-endian float32, row-major; the row width is the metadata's
+#                  "dimensions" (in Node: Buffer.from(float32Array.buffer))
+# Metadata (names, texts, chunk offsets) is one JSON object on stdin.
+
+import io
+import os
+import sys
+import json
+
+
+def read_vectors(path, dimensions=None):
+    """Read an (n, dimensions) float32 matrix from a .npy or raw float32 file or pipe"""
+    import numpy as np
+
+    # Pipes cannot be memory-mapped or seeked, so their bytes are read in one go
+    regular = os.path.isfile(path)
+    if path.endswith('.npy'):
+        if regular:
+            vectors = np.load(path)
+        else:
+            with open(path, 'rb') as f:
+                vectors = np.load(io.BytesIO(f.read()))
+    else:
+        if not dimensions:
+            raise ValueError("raw float32 vectors need \"dimensions\" in the metadata")
+        if regular:
+            vectors = np.fromfile(path, dtype='<f4')
+        else:
+            with open(path, 'rb') as f:
+                vectors = np.frombuffer(f.read(), dtype='<f4')
+        if vectors.size % dimensions:
+            raise ValueError(f"{vectors.size} floats do not divide into {dimensions}-dimensional rows")
+        vectors = vectors.reshape(-1, dimensions)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if dimensions and vectors.shape[1] != dimensions:
+        raise ValueError(f"Expected {dimensions}-dimensional vectors, got {vectors.shape[1]}")
+    return vectors
+
+
+def write_vectors(path, vectors):
+    """Write vectors in the format read_vectors expects for this path"""
+    import numpy as np
+    vectors = np.asarray(vectors, dtype='<f4')
+    if path.endswith('.npy'):
+        np.save(path, vectors)
+    else:
+        vectors.tofile(path)
+
+
+def read_metadata(stream=None):
+    """The JSON metadata object sent on stdin"""
+    metadata = json.load(stream or sys.stdin)
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be a JSON object")
+    return metadata